@@ -0,0 +1,179 @@
+"""
+asyncio interface to the evaluation and preview functions.
+
+Requests are run by a WorkerPool so that they do not block the event loop,
+threads are only used to wait for the workers. Because every request runs
+in a worker process, cancelling the task that awaits a request terminates
+the worker and so really stops the SymPy computation.
+
+    evaluator = AsyncEvaluator(max_concurrency=4)
+    result = await evaluator.evaluate(response, answer, params)
+    async for index, result in evaluator.as_completed(tasks):
+        ...
+    evaluator.close()
+
+evaluate_async and preview_async use a shared AsyncEvaluator that is created
+when it is first needed.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .worker_pool import WorkerPool
+except ImportError:
+    from worker_pool import WorkerPool
+
+
+class AsyncEvaluator:
+    """
+    Runs evaluation and preview requests for asyncio code.
+
+    Parameters
+    ----------
+    max_concurrency : int or None
+        Maximum number of requests that run at the same time, further
+        requests wait. If None the number of CPUs is used.
+    timeout : number or None
+        Timeout of each request in seconds, None for no timeout
+    max_requests : int or None
+        Number of requests after which a worker is replaced, see WorkerPool
+    """
+
+    def __init__(self, max_concurrency=None, timeout=None, max_requests=None):
+        if max_concurrency is None:
+            max_concurrency = os.cpu_count() or 1
+        self.max_concurrency = max_concurrency
+        self.pool = WorkerPool(max_concurrency, timeout, max_requests)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def _limit(self):
+        # Semaphores belong to the event loop they are created in
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run(self, command, body):
+        """
+        Input:
+            command : "eval" or "preview"
+            body    : dictionary with the response, answer and params
+        Output:
+            Result of the command, see WorkerPool.run for the exceptions
+            that can be raised.
+        """
+        async with self._limit():
+            cancel = threading.Event()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._executor, self.pool.run, command, body, None, cancel
+            )
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                cancel.set()
+                # The slot is only released once the worker is stopped
+                await asyncio.wait([future])
+                future.exception()
+                raise
+
+    async def evaluate(self, response, answer, params):
+        """
+        Coroutine version of evaluation_function.
+        """
+        body = {"response": response, "answer": answer, "params": params}
+        return await self.run("eval", body)
+
+    async def preview(self, response, params):
+        """
+        Coroutine version of preview_function.
+        """
+        return await self.run(
+            "preview", {"response": response, "params": params}
+        )
+
+    async def _indexed_evaluation(self, index, task):
+        if isinstance(task, dict):
+            task = (task["response"], task["answer"], task.get("params", {}))
+        try:
+            result = await self.evaluate(*task)
+        except Exception as e:
+            result = {"error": {"type": type(e).__name__, "message": str(e)}}
+        return index, result
+
+    async def as_completed(self, tasks):
+        """
+        Input:
+            tasks : iterable of (response, answer, params) tuples or
+                    dictionaries with the same keys
+        Output:
+            Asynchronous iterator of pairs (index, result) in the order the
+            evaluations finish, index is the position of the task in tasks.
+            If an evaluation raised an exception its result is a dictionary
+            with an "error" key, as in batch_evaluation_function.
+        Remark:
+            Evaluations that have not finished when the iteration is
+            stopped are cancelled.
+        """
+        futures = [
+            asyncio.ensure_future(self._indexed_evaluation(index, task))
+            for (index, task) in enumerate(tasks)
+        ]
+        try:
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            for future in futures:
+                future.cancel()
+            await asyncio.gather(*futures, return_exceptions=True)
+
+    def close(self):
+        """
+        Stops the workers, requests that are running are finished first.
+        """
+        self.pool.close()
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+        return False
+
+
+_default_evaluator = None
+_default_evaluator_lock = threading.Lock()
+
+
+def default_evaluator():
+    """
+    Returns the AsyncEvaluator used by evaluate_async and preview_async.
+    """
+    global _default_evaluator
+    with _default_evaluator_lock:
+        if _default_evaluator is None:
+            _default_evaluator = AsyncEvaluator()
+        return _default_evaluator
+
+
+async def evaluate_async(response, answer, params):
+    """
+    Coroutine version of evaluation_function that uses the default
+    AsyncEvaluator.
+    """
+    return await default_evaluator().evaluate(response, answer, params)
+
+
+async def preview_async(response, params):
+    """
+    Coroutine version of preview_function that uses the default
+    AsyncEvaluator.
+    """
+    return await default_evaluator().preview(response, params)
@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+try:
+    from . import worker_pool
+    from .async_evaluation import AsyncEvaluator
+    from .evaluation import evaluation_function
+    from .worker_pool_tests import (
+        process_running,
+        spawning_evaluation_function,
+        wait_for_pid,
+    )
+except ImportError:
+    import worker_pool
+    from async_evaluation import AsyncEvaluator
+    from evaluation import evaluation_function
+    from worker_pool_tests import (
+        process_running,
+        spawning_evaluation_function,
+        wait_for_pid,
+    )
+
+
+def slow_evaluation_function(response, answer, params):
+    time.sleep(float(response))
+    return {"is_correct": True, "response": response}
+
+
+class TestAsyncEvaluator(unittest.IsolatedAsyncioTestCase):
+    """
+    TestCase Class used to test the asyncio interface.
+    """
+
+    def patch_evaluation_function(self, function=slow_evaluation_function):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            self.skipTest("workers only use the patched function if forked")
+        patcher = mock.patch.object(
+            worker_pool, "evaluation_function", function
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_evaluator(self, max_concurrency):
+        evaluator = AsyncEvaluator(max_concurrency=max_concurrency)
+        self.addCleanup(evaluator.close)
+        return evaluator
+
+    async def test_evaluate_and_preview(self):
+        evaluator = self.create_evaluator(1)
+        result = await evaluator.evaluate("x+1", "1+x", {})
+        self.assertEqual(result, evaluation_function("x+1", "1+x", {}))
+        result = await evaluator.preview("x+1", {"is_latex": False})
+        self.assertEqual(result["preview"]["sympy"], "x + 1")
+
+    async def test_bounded_concurrency(self):
+        self.patch_evaluation_function()
+        evaluator = self.create_evaluator(2)
+        start = time.monotonic()
+        results = await asyncio.gather(
+            *[evaluator.evaluate("0.3", "x", {}) for _ in range(4)]
+        )
+        self.assertEqual(len(results), 4)
+        self.assertGreaterEqual(time.monotonic() - start, 0.6)
+
+    async def test_cancel_stops_computation(self):
+        self.patch_evaluation_function()
+        evaluator = self.create_evaluator(1)
+        task = asyncio.ensure_future(evaluator.evaluate("30", "x", {}))
+        await asyncio.sleep(0.2)
+        start = time.monotonic()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertLess(time.monotonic() - start, 5)
+        # The only worker was replaced and can be used again
+        result = await evaluator.evaluate("0", "x", {})
+        self.assertEqual(result["is_correct"], True)
+
+    async def test_cancel_stops_child_processes(self):
+        # Computations that the worker runs in child processes (e.g. for
+        # time budgets) are stopped with the worker
+        self.patch_evaluation_function(spawning_evaluation_function)
+        evaluator = self.create_evaluator(1)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "pid")
+        task = asyncio.ensure_future(evaluator.evaluate(path, "x", {}))
+        pid = await asyncio.get_running_loop().run_in_executor(
+            None, wait_for_pid, path
+        )
+        self.assertTrue(process_running(pid))
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        deadline = time.monotonic() + 5
+        while process_running(pid) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self.assertFalse(process_running(pid))
+
+    async def test_as_completed(self):
+        self.patch_evaluation_function()
+        evaluator = self.create_evaluator(2)
+        tasks = [("0.5", "x", {}), {"response": "0", "answer": "x"}]
+        indices = [
+            index async for (index, result) in evaluator.as_completed(tasks)
+        ]
+        self.assertEqual(indices, [1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
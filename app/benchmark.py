@@ -0,0 +1,347 @@
+"""
+Benchmark suite for the evaluation function.
+
+Runs a categorised corpus of (response, answer, params) cases and reports
+p50/p95/p99 latencies per category for warm runs (caches populated) and
+cold runs (all caches cleared before each case), together with the time
+spent in each stage of the evaluation as reported by return_timings.
+
+The results are written as JSON and can be compared to a stored baseline,
+the comparison fails if a category got slower than the baseline allows or
+if a case no longer gives the expected result:
+
+    python benchmark.py --output results.json --baseline benchmark_baseline.json
+
+Use --save-baseline to replace the stored baseline with the current results.
+
+The latencies in the baseline are absolute timings from the machine (and
+Python and SymPy versions) it was recorded on. Each run also times a fixed
+SymPy workload and the baseline is scaled by the ratio of the calibration
+times before comparing, which absorbs most of the difference in speed
+between machines. This is only an approximation, when the benchmark is
+used as a gate on a new machine or Python version the baseline should be
+regenerated there with --save-baseline.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import sympy
+from sympy.core.cache import clear_cache
+
+try:
+    from . import evaluation, expression_utilities
+except ImportError:
+    import evaluation
+    import expression_utilities
+
+# Time budget for cases that can take a very long time to evaluate
+ADVERSARIAL_TIME_BUDGET_MS = 2000
+
+relaxed = {"strict_syntax": False}
+latex = {"strict_syntax": False, "is_latex": True}
+adversarial = {"time_budget_ms": ADVERSARIAL_TIME_BUDGET_MS}
+
+# Each case is (response, answer, params, expected is_correct), cases with
+# expected None are not checked (e.g. cases that may run out of time)
+CORPUS = {
+    "polynomial": [
+        ("x**2 + 2*x + 1", "(x+1)**2", {}, True),
+        ("(x-1)*(x+1)", "x**2-1", {}, True),
+        ("2x^2+3xy-y", "y*(3x-1)+2x^2", relaxed, True),
+        ("x**2 + 2*x", "(x+1)**2", {}, False),
+        ("x**3 - 1", "(x-1)*(x**2+x+1)", {}, True),
+        ("x**3 + 1", "(x-1)*(x**2+x+1)", {}, False),
+    ],
+    "trig": [
+        ("sin(x)**2 + cos(x)**2", "1", {}, True),
+        ("2*sin(x)*cos(x)", "sin(2*x)", {}, True),
+        ("sin(x)", "cos(x)", {}, False),
+        ("tan(x)", "sin(x)/cos(x)", {}, True),
+        ("cos(2x)", "1-2sin(x)^2", relaxed, True),
+        ("cos(2x)", "1-sin(x)^2", relaxed, False),
+    ],
+    "exp_log": [
+        ("exp(x)*exp(y)", "exp(x+y)", {}, True),
+        ("log(x**2)", "2*log(x)", {}, False),
+        ("exp(log(x))", "x", {}, True),
+        ("exp(2x)", "exp(x)^2", relaxed, True),
+        ("e^x", "exp(x)", relaxed, False),
+    ],
+    "rational": [
+        ("1/(x+1) + 1/(x-1)", "2*x/(x**2-1)", {}, True),
+        ("(x**2-1)/(x-1)", "x+1", {}, True),
+        ("1/(x+1) + 1/(x-1)", "2/(x**2-1)", {}, False),
+        (
+            "-(ysin(x*y) + exp(y)) / (x*(exp(y) + sin(x*y)))",
+            "-(y*sin(x*y) + exp(y)) / (x*(exp(y) + sin(x*y)))",
+            relaxed,
+            False,
+        ),
+        (
+            "-(y*sin(x*y)+e^y)/(x*e^y+x*sin(x*y))",
+            "-(y*sin(x*y) + exp(y)) / (x*(exp(y) + sin(x*y)))",
+            relaxed,
+            False,
+        ),
+    ],
+    "equality": [
+        ("2*x**2 = 10*y**2+20", "x**2-5*y**2-10=0", relaxed, True),
+        ("x = y", "y - x = 0", relaxed, True),
+        ("x = 2y", "x - y = 0", relaxed, False),
+        ("x**2 + 1", "x**2 + 1 = 0", relaxed, False),
+    ],
+    "latex": [
+        (r"\frac{x+1}{x+2}", "(x+1)/(x+2)", latex, True),
+        (r"\sin{x\pi}", "sin(x*pi)", latex, True),
+        (r"\log_{10} x", "log(x, 10)", latex, True),
+        (r"x^{2}", "x^3", latex, False),
+    ],
+    "plus_minus": [
+        ("plus_minus x", "minus_plus x", relaxed, True),
+        (
+            "-minus_plus x**2 - plus_minus y**2",
+            "plus_minus x**2 + minus_plus y**2",
+            {},
+            True,
+        ),
+        (
+            "plus_minus x**2 - minus_plus y**2",
+            "plus_minus x**2 + minus_plus y**2",
+            {},
+            False,
+        ),
+    ],
+    "numerical": [
+        ("6.73", "sqrt(3)+5", {"numerical": True, "atol": 0.005}, True),
+        ("6.7", "sqrt(3)+5", {"numerical": True, "atol": 0.005}, False),
+        ("6.73", "sqrt(3)+5", {"numerical": True, "rtol": 0.0005}, True),
+        ("0.333", "1/3", {"numerical": True, "atol": 0.001}, True),
+    ],
+    "adversarial": [
+        ("(x+y+z+w)**12", "(w+x+y+z)**12 + 1", adversarial, None),
+        ("sin(x)**20", "(1-cos(x)**2)**10", adversarial, None),
+        ("x" + "+x" * 200, "201*x", adversarial, True),
+        ("((((x+1)**2+1)**2+1)**2+1)**2", "x", adversarial, False),
+    ],
+}
+
+
+def clear_caches():
+    """
+    Clears the caches of the evaluation function and of SymPy.
+    """
+    evaluation.result_cache.clear()
+    evaluation._compile_question.cache_clear()
+    expression_utilities.substitution_matcher.cache_clear()
+    clear_cache()
+
+
+def percentiles(durations):
+    """
+    Input:
+        durations : list of durations in seconds
+    Output:
+        Dictionary with the p50, p95 and p99 (nearest rank) durations and
+        the mean duration in milliseconds.
+    """
+    ordered = sorted(durations)
+    summary = {}
+    for p in (50, 95, 99):
+        rank = max(0, -(-p * len(ordered) // 100) - 1)
+        summary[f"p{p}"] = round(ordered[rank] * 1000, 3)
+    summary["mean"] = round(sum(ordered) / len(ordered) * 1000, 3)
+    return summary
+
+
+def calibrate(repeats=5):
+    """
+    Input:
+        repeats : number of runs of the calibration workload
+    Output:
+        Fastest time in milliseconds of a fixed SymPy workload (expansion,
+        cancellation and simplification with cold caches), used to compare
+        the speed of the machines that results were recorded on.
+    """
+    x, y = sympy.symbols("x y")
+    durations = []
+    for _ in range(repeats):
+        clear_cache()
+        start = time.perf_counter()
+        sympy.expand((x + y + 1) ** 12)
+        sympy.cancel((x**6 - y**6) / (x**2 - y**2))
+        sympy.simplify(sympy.sin(x) ** 2 + sympy.cos(x) ** 2 - 1)
+        durations.append(time.perf_counter() - start)
+    return _milliseconds([min(durations)])
+
+
+def _milliseconds(durations):
+    return round(sum(durations) * 1000, 3)
+
+
+def evaluate(response, answer, params):
+    # Results are never taken from the result cache, that would only
+    # measure the cache lookup
+    params = {**params, "result_cache": False, "return_timings": True}
+    start = time.perf_counter()
+    result = evaluation.evaluation_function(response, answer, params)
+    return time.perf_counter() - start, result
+
+
+def run_category(cases, repeats):
+    """
+    Input:
+        cases   : list of cases from CORPUS
+        repeats : number of warm runs of each case
+    Output:
+        Dictionary with the warm and cold latencies (percentiles and the
+        total of the median latency of each case), the average time in
+        each stage per case (in milliseconds) and the cases that did not
+        give the expected result.
+    """
+    warm = []
+    warm_medians = []
+    cold = []
+    stages = {}
+    mismatches = []
+    for response, answer, params, expected in cases:
+        clear_caches()
+        duration, result = evaluate(response, answer, params)
+        cold.append(duration)
+        if expected is not None and result["is_correct"] != expected:
+            mismatches.append(
+                {
+                    "response": response,
+                    "answer": answer,
+                    "expected": expected,
+                    "result": result["is_correct"],
+                }
+            )
+        durations = []
+        for _ in range(repeats):
+            duration, result = evaluate(response, answer, params)
+            durations.append(duration)
+            for stage, ms in result["timings"]["stages"].items():
+                stages[stage] = stages.get(stage, 0.0) + ms / repeats
+        warm += durations
+        warm_medians.append(sorted(durations)[len(durations) // 2])
+    return {
+        "warm": {**percentiles(warm), "total": _milliseconds(warm_medians)},
+        "cold": {**percentiles(cold), "total": _milliseconds(cold)},
+        "stages": {
+            stage: round(total / len(cases), 3)
+            for (stage, total) in stages.items()
+        },
+        "mismatches": mismatches,
+    }
+
+
+def run_benchmark(corpus=CORPUS, repeats=5):
+    """
+    Input:
+        corpus  : dictionary of categories of cases, see CORPUS
+        repeats : number of warm runs of each case
+    Output:
+        JSON serialisable dictionary with the results for each category.
+    """
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "sympy": sympy.__version__,
+            "repeats": repeats,
+            "calibration_ms": calibrate(),
+        },
+        "categories": {
+            category: run_category(cases, repeats)
+            for (category, cases) in corpus.items()
+        },
+    }
+
+
+def compare(results, baseline, tolerance=0.5, slack_ms=2.0):
+    """
+    Input:
+        results   : output of run_benchmark
+        baseline  : output of run_benchmark stored as baseline
+        tolerance : allowed relative increase of the latencies
+        slack_ms  : allowed absolute increase of the latencies, avoids
+                    failures caused by noise for very fast categories
+    Output:
+        List of descriptions of regressions, empty if there are none.
+    Remark:
+        If both results have a calibration time the baseline latencies are
+        scaled by the ratio of the calibration times.
+    """
+    current_speed = results.get("environment", {}).get("calibration_ms")
+    baseline_speed = baseline.get("environment", {}).get("calibration_ms")
+    scale = 1.0
+    if current_speed and baseline_speed:
+        scale = current_speed / baseline_speed
+    regressions = []
+    for category, current in results["categories"].items():
+        for case in current["mismatches"]:
+            regressions.append(
+                f"{category}: `{case['response']}` compared to "
+                f"`{case['answer']}` gave {case['result']}, "
+                f"expected {case['expected']}"
+            )
+        previous = baseline["categories"].get(category, None)
+        if previous is None:
+            continue
+        # Percentiles over cases with very different latencies are noisy,
+        # the total of the median latency of each case is used instead
+        for run in ("warm", "cold"):
+            expected = previous[run]["total"] * scale
+            limit = expected * (1 + tolerance) + slack_ms
+            if current[run]["total"] > limit:
+                regressions.append(
+                    f"{category}: {run} total is {current[run]['total']} ms,"
+                    f" baseline is {round(expected, 3)} ms"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline", help="baseline to compare with")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--categories", nargs="*", default=None)
+    args = parser.parse_args(argv)
+
+    corpus = CORPUS
+    if args.categories is not None:
+        corpus = {c: CORPUS[c] for c in args.categories}
+    results = run_benchmark(corpus, args.repeats)
+
+    for category, result in results["categories"].items():
+        print(
+            f"{category:12} warm p50 {result['warm']['p50']:9.2f} ms"
+            f"  p95 {result['warm']['p95']:9.2f} ms"
+            f"  cold p50 {result['cold']['p50']:9.2f} ms"
+            f"  total {result['warm']['total']:9.2f} ms"
+        )
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline is not None and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+    elif args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import unittest
+
+try:
+    from .benchmark import compare, percentiles, run_benchmark
+except ImportError:
+    from benchmark import compare, percentiles, run_benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    """
+    TestCase Class used to test the benchmark suite and regression check.
+    """
+
+    def test_percentiles(self):
+        summary = percentiles([k / 1000 for k in range(1, 101)])
+        self.assertEqual(summary["p50"], 50)
+        self.assertEqual(summary["p95"], 95)
+        self.assertEqual(summary["p99"], 99)
+        self.assertEqual(summary["mean"], 50.5)
+
+    def test_run_benchmark(self):
+        corpus = {
+            "example": [
+                ("x+1", "1+x", {}, True),
+                ("x+1", "x", {}, True),
+            ]
+        }
+        results = run_benchmark(corpus, repeats=2)
+        category = results["categories"]["example"]
+        self.assertEqual(
+            set(category.keys()), {"warm", "cold", "stages", "mismatches"}
+        )
+        self.assertGreater(category["stages"]["parse"], 0)
+        self.assertGreater(results["environment"]["calibration_ms"], 0)
+        self.assertEqual(len(category["mismatches"]), 1)
+
+    def test_compare(self):
+        def results(p50):
+            latencies = {"p50": p50, "p95": p50, "total": p50}
+            category = {"warm": latencies, "cold": latencies, "mismatches": []}
+            return {"categories": {"example": category}}
+
+        self.assertEqual(compare(results(10), results(10)), [])
+        self.assertEqual(compare(results(16), results(10)), [])
+        self.assertEqual(len(compare(results(30), results(10))), 2)
+
+    def test_compare_calibrated(self):
+        def results(total, calibration_ms):
+            latencies = {"p50": total, "p95": total, "total": total}
+            category = {"warm": latencies, "cold": latencies, "mismatches": []}
+            return {
+                "environment": {"calibration_ms": calibration_ms},
+                "categories": {"example": category},
+            }
+
+        # A machine that is twice as slow may take twice as long
+        self.assertEqual(compare(results(40, 20), results(20, 10)), [])
+        self.assertEqual(len(compare(results(40, 10), results(20, 10))), 2)
+        self.assertEqual(len(compare(results(40, 10), results(40, 20))), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
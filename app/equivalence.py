@@ -0,0 +1,488 @@
+"""
+Equivalence stages used by check_equality to decide if a response is equal
+to the answer, from the cheapest to the most expensive.
+
+Each stage is a function that takes the response and answer expressions,
+the CompiledQuestion for the answer and the TimeBudget of the evaluation,
+and returns True (equal), False (not equal) or None (undecided, the next
+stage is tried). A stage can also return a pair (result, details) where
+details is a dictionary that is added to the result of the evaluation,
+e.g. the route chosen by the route stage.
+
+Equations are compared by their residuals, lhs - rhs: a response equation
+is equivalent to the answer if the ratio of the residuals is constant. They
+have their own stages, see EQUATION_STAGES.
+
+Cheap stages run in the calling process, the expensive ones (route and
+simplify) run in a supervised child process when there is a time budget,
+see TimeBudget. Stages that expand the expressions run supervised if the
+expansion can be large, see INLINE_MAX_TERMS.
+
+Stages can also be raced: they are then run at the same time in separate
+processes and the first decisive result is used, see check_equivalence.
+"""
+
+import os
+import random
+from contextlib import closing
+
+from sympy import Poly, cancel, fraction, together
+
+try:
+    from .identity import (
+        DEFAULT_ERROR_PROBABILITY,
+        identity_test,
+        proportionality_test,
+    )
+    from .routing import GENERIC_ROUTES, ROUTES, choose_route, expanded_terms
+    from .sampling import (
+        CompiledExpression,
+        candidate_points,
+        numerically_different,
+        ratio_not_constant,
+        residuals,
+        sample_count,
+        sample_points,
+    )
+    from .time_budget import TimeBudget
+except ImportError:
+    from identity import (
+        DEFAULT_ERROR_PROBABILITY,
+        identity_test,
+        proportionality_test,
+    )
+    from routing import GENERIC_ROUTES, ROUTES, choose_route, expanded_terms
+    from sampling import (
+        CompiledExpression,
+        candidate_points,
+        numerically_different,
+        ratio_not_constant,
+        residuals,
+        sample_count,
+        sample_points,
+    )
+    from time_budget import TimeBudget
+
+# Stages are only raced on hosts with at least this many CPUs, otherwise
+# they run one after the other
+RACING_MIN_CPUS = 2
+
+
+# Largest product of the estimated numbers of terms of the expanded
+# response and answer (see expanded_terms) for which the stages that expand
+# them run in the calling process, larger ones run supervised since they can
+# take arbitrarily long, e.g. (x+y+z+w)**30
+INLINE_MAX_TERMS = 2000
+
+
+def _run_expanding(budget, stage, function, res, ans, *args):
+    # Runs a stage that expands res and ans or builds polynomials from them
+    if expanded_terms(res) * expanded_terms(ans) <= INLINE_MAX_TERMS:
+        return budget.run_inline(stage, function, res, ans, *args)
+    return budget.run(stage, function, res, ans, *args)
+
+
+def _structural_stage(res, ans, question, budget):
+    if res == ans:
+        return True
+    return None
+
+
+def _expand_difference(res, ans):
+    return (res - ans).expand()
+
+
+def _expand_stage(res, ans, question, budget):
+    if _run_expanding(budget, "expand", _expand_difference, res, ans) == 0:
+        return True
+    return None
+
+
+def _compare_polynomials(res, ans):
+    difference = res - ans
+    if difference.is_Rational:
+        return bool(difference == 0)
+    symbols = sorted(difference.free_symbols, key=str)
+    if len(symbols) == 0 or not difference.is_polynomial(*symbols):
+        return None
+    difference = Poly(difference, *symbols)
+    if difference.is_zero:
+        return True
+    # Comparison of polynomials is only exact for rational coefficients
+    if difference.domain.is_ZZ or difference.domain.is_QQ:
+        return False
+    return None
+
+
+def _polynomial_stage(res, ans, question, budget):
+    return _run_expanding(budget, "polynomial", _compare_polynomials, res, ans)
+
+
+def _rational_functions(res, ans):
+    # Returns the free symbols of res and ans if both are rational
+    # functions of them, otherwise None
+    symbols = sorted(res.free_symbols | ans.free_symbols, key=str)
+    if len(symbols) == 0:
+        return None
+    if not (
+        res.is_rational_function(*symbols)
+        and ans.is_rational_function(*symbols)
+    ):
+        return None
+    return symbols
+
+
+def _compare_rational_functions(res, ans):
+    symbols = _rational_functions(res, ans)
+    if symbols is None:
+        return None
+    # res == ans if and only if the cross products of the numerators and
+    # denominators are equal, which is decided by sparse polynomial
+    # arithmetic without cancelling common factors
+    res_numerator, res_denominator = fraction(together(res))
+    ans_numerator, ans_denominator = fraction(together(ans))
+    difference = Poly(res_numerator, *symbols) * Poly(
+        ans_denominator, *symbols
+    ) - Poly(ans_numerator, *symbols) * Poly(res_denominator, *symbols)
+    if difference.is_zero:
+        return True
+    if difference.domain.is_ZZ or difference.domain.is_QQ:
+        return False
+    return None
+
+
+def _rational_stage(res, ans, question, budget):
+    return _run_expanding(
+        budget, "rational", _compare_rational_functions, res, ans
+    )
+
+
+def _error_probability(question):
+    return float(
+        question.params.get(
+            "identity_error_probability", DEFAULT_ERROR_PROBABILITY
+        )
+    )
+
+
+def _identity_rng(res, ans, question):
+    # The same comparison always uses the same prime and points, so that
+    # its result is reproducible (and can be cached), while the prime
+    # cannot be known without the response
+    return random.Random(f"{question.fingerprint}:{res}:{ans}")
+
+
+def _identity_stage(res, ans, question, budget):
+    return budget.run_inline(
+        "identity",
+        identity_test,
+        res,
+        ans,
+        _error_probability(question),
+        _identity_rng(res, ans, question),
+    )
+
+
+def _cancel_difference(res, ans):
+    return cancel(together(res - ans))
+
+
+def _cancel_stage(res, ans, question, budget):
+    if _run_expanding(budget, "cancel", _cancel_difference, res, ans) == 0:
+        return True
+    return None
+
+
+def _complex_numbers(question):
+    return question.params.get("complexNumbers", False) is True
+
+
+def _sampling_stage(res, ans, question, budget):
+    if ans is question.decimals_expression():
+        compiled_ans = question.compiled_expression()
+    else:
+        compiled_ans = CompiledExpression(ans)
+    compiled_res = CompiledExpression(res)
+    count = sample_count(compiled_res, compiled_ans)
+    points = candidate_points(
+        set(compiled_res.symbols + compiled_ans.symbols),
+        count,
+        _complex_numbers(question),
+    )
+    budget.timings.count("sample_points", count)
+    if numerically_different(
+        compiled_res, compiled_ans, points, required=count
+    ):
+        return False
+    return None
+
+
+def _special_functions(question):
+    return question.params.get("specialFunctions", False) is True
+
+
+def _route_stage(res, ans, question, budget):
+    route = choose_route(
+        res, ans, _special_functions(question), _complex_numbers(question)
+    )
+    details = {"route": route}
+    if route in GENERIC_ROUTES:
+        return None, details
+    if budget.run("route_" + route, ROUTES[route], res - ans) == 0:
+        return True, details
+    return None, details
+
+
+def _difference_simplifies_to_zero(res, ans):
+    return bool((res - ans).simplify() == 0)
+
+
+def _simplify_stage(res, ans, question, budget):
+    budget.timings.count("simplify_calls")
+    return budget.run("simplify", _difference_simplifies_to_zero, res, ans)
+
+
+EQUIVALENCE_STAGES = {
+    "structural": _structural_stage,
+    "expand": _expand_stage,
+    "polynomial": _polynomial_stage,
+    "rational": _rational_stage,
+    "identity": _identity_stage,
+    "cancel": _cancel_stage,
+    "sampling": _sampling_stage,
+    "route": _route_stage,
+    "simplify": _simplify_stage,
+}
+
+DEFAULT_EQUIVALENCE_STAGES = (
+    "structural",
+    "expand",
+    "polynomial",
+    "rational",
+    "identity",
+    "cancel",
+    "sampling",
+    "route",
+    "simplify",
+)
+
+
+def _residual(equation):
+    return equation.args[0] - equation.args[1]
+
+
+def _residuals_are_proportional(res, ans):
+    res, ans = _residual(res), _residual(ans)
+    symbols = _rational_functions(res, ans)
+    if symbols is None:
+        return None
+    res_numerator, res_denominator = fraction(together(res))
+    ans_numerator, ans_denominator = fraction(together(ans))
+    # The ratio of the residuals is p/q, it is constant if and only if
+    # p and q are proportional, i.e. p*LC(q) = q*LC(p)
+    p = Poly(res_numerator, *symbols) * Poly(ans_denominator, *symbols)
+    q = Poly(res_denominator, *symbols) * Poly(ans_numerator, *symbols)
+    if q.is_zero:
+        return None
+    difference = p.mul_ground(q.LC()) - q.mul_ground(p.LC())
+    if difference.is_zero:
+        return True
+    if difference.domain.is_ZZ or difference.domain.is_QQ:
+        return False
+    return None
+
+
+def _equation_proportional_stage(res, ans, question, budget):
+    return _run_expanding(
+        budget, "equation_proportional", _residuals_are_proportional, res, ans
+    )
+
+
+def _equation_identity_stage(res, ans, question, budget):
+    return budget.run_inline(
+        "equation_identity",
+        proportionality_test,
+        _residual(res),
+        _residual(ans),
+        _error_probability(question),
+        _identity_rng(res, ans, question),
+    )
+
+
+def _equation_sampling_stage(res, ans, question, budget):
+    sides = [CompiledExpression(side) for side in res.args + ans.args]
+    points = sample_points(
+        set().union(*(side.symbols for side in sides)),
+        sample_count(*sides),
+        _complex_numbers(question),
+    )
+    budget.timings.count("sample_points", len(points))
+    res_residuals = residuals(sides[0], sides[1], points)
+    ans_residuals = residuals(sides[2], sides[3], points)
+    if ratio_not_constant(res_residuals, ans_residuals):
+        return False
+    return None
+
+
+def _ratio_is_constant(res, ans):
+    return bool((_residual(res) / _residual(ans)).simplify().is_constant())
+
+
+def _equation_simplify_stage(res, ans, question, budget):
+    budget.timings.count("simplify_calls")
+    return budget.run("equation_simplify", _ratio_is_constant, res, ans)
+
+
+EQUATION_STAGES = {
+    "proportional": _equation_proportional_stage,
+    "identity": _equation_identity_stage,
+    "sampling": _equation_sampling_stage,
+    "simplify": _equation_simplify_stage,
+}
+
+DEFAULT_EQUATION_STAGES = (
+    "proportional",
+    "identity",
+    "sampling",
+    "simplify",
+)
+
+
+def _split_details(result):
+    # Returns the pair (result, details) for the result of a stage
+    if isinstance(result, tuple):
+        return result
+    return result, {}
+
+
+def _run_unbudgeted(function, res, ans, question):
+    # Runs in a child process of the race, which is already supervised
+    return function(res, ans, question, TimeBudget())
+
+
+def _decisive(results, finished):
+    # True results are accepted at once, other results only when all
+    # earlier stages are finished and undecided, so that the outcome is
+    # the same as when the stages run one after the other.
+    for index, is_correct in enumerate(results):
+        if is_correct is not None:
+            return index
+        if not finished[index]:
+            break
+    for index, is_correct in enumerate(results):
+        if is_correct is True:
+            return index
+    return None
+
+
+def _race_stages(functions, stages, res, ans, question, budget):
+    tasks = [
+        (_run_unbudgeted, (functions[stage], res, ans, question))
+        for stage in stages
+    ]
+    results = [None] * len(stages)
+    finished = [False] * len(stages)
+    details = {}
+    error = None
+    with closing(budget.race("race", tasks)) as outcomes:
+        for index, kind, value in outcomes:
+            finished[index] = True
+            if kind == "error":
+                error = value if error is None else error
+                continue
+            results[index], stage_details = _split_details(value)
+            details.update(stage_details)
+            decisive = _decisive(results, finished)
+            if decisive is not None:
+                return results[decisive], stages[decisive], details
+    if error is not None:
+        raise error
+    return None, None, details
+
+
+def _run_stages(
+    functions, stages, prefix, res, ans, question, budget, race=()
+):
+    for stage in tuple(stages) + tuple(race):
+        if stage not in functions:
+            raise Exception(f"Unknown equivalence stage: {stage}")
+    racing = [stage for stage in stages if stage in race]
+    if len(racing) < 2 or (os.cpu_count() or 1) < RACING_MIN_CPUS:
+        racing = []
+    details = {}
+    for stage in stages:
+        if stage in racing:
+            if stage != racing[0]:
+                continue
+            with budget.timings.stage(prefix + "race"):
+                is_correct, stage, stage_details = _race_stages(
+                    functions, racing, res, ans, question, budget
+                )
+        else:
+            with budget.timings.stage(prefix + stage):
+                is_correct, stage_details = _split_details(
+                    functions[stage](res, ans, question, budget)
+                )
+        details.update(stage_details)
+        if is_correct is not None:
+            return is_correct, stage, details
+    return False, None, details
+
+
+def check_equivalence(res, ans, question, budget, stages=None, race=()):
+    """
+    Input:
+        res, ans : response and answer expressions
+        question : CompiledQuestion for the answer
+        budget   : TimeBudget for the evaluation, the duration of each
+                   stage is recorded as equivalence_<stage> in its timings
+        stages   : names of the stages to try, in order, if None
+                   DEFAULT_EQUIVALENCE_STAGES is used
+        race     : names of stages that are raced instead of run one after
+                   the other, see Remark
+    Output:
+        Triple (is_correct, stage, details) where stage is the name of the
+        stage that decided the comparison. If no stage was decisive the
+        response is considered incorrect and stage is None. details is a
+        dictionary with the details reported by the stages that finished,
+        e.g. the route if the route stage ran.
+    Remark:
+        The stages in race are started together, each in its own process,
+        when the first of them is reached, e.g. sampling (that can only
+        reject) and simplify (that is usually the only stage that can
+        accept hard cases). The first decisive result is used and the other
+        processes are stopped, the duration of the race is recorded as
+        equivalence_race. Racing is only done on hosts with at least
+        RACING_MIN_CPUS CPUs.
+    """
+    if stages is None:
+        stages = DEFAULT_EQUIVALENCE_STAGES
+    return _run_stages(
+        EQUIVALENCE_STAGES,
+        stages,
+        "equivalence_",
+        res,
+        ans,
+        question,
+        budget,
+        race,
+    )
+
+
+def check_equation_equivalence(res, ans, question, budget, stages=None):
+    """
+    Input:
+        res, ans : response and answer equations (SymPy Equality)
+        question : CompiledQuestion for the answer
+        budget   : TimeBudget for the evaluation, the duration of each
+                   stage is recorded as equation_<stage> in its timings
+        stages   : names of the stages to try, in order, if None
+                   DEFAULT_EQUATION_STAGES is used
+    Output:
+        Triple (is_correct, stage, details), see check_equivalence.
+    """
+    if stages is None:
+        stages = DEFAULT_EQUATION_STAGES
+    return _run_stages(
+        EQUATION_STAGES, stages, "equation_", res, ans, question, budget
+    )
@@ -1,32 +1,153 @@
-from sympy import Equality
+import copy
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from sympy import Basic, Equality
 from sympy.parsing.sympy_parser import T as parser_transformations
 from sympy.parsing.sympy_parser import parse_expr, split_symbols_custom
 
 try:
     from .expression_utilities import (
+        convert_absolute_notation,
         create_sympy_parsing_params,
+        input_symbol_substitutions,
         parse_expression,
-        preprocess_expression,
+        parse_symbol_assumptions,
         substitute,
+        sympy_parsing_transformations,
+    )
+    from .equivalence import check_equation_equivalence, check_equivalence
+    from .plus_minus import (
+        SIGN_MODES,
+        expand_signs,
+        has_plus_minus,
+        has_unary_signs,
+        is_correct_for_criteria,
+        rewrite_signs,
+        sign_branches,
+        sign_symbols,
     )
+    from .result_cache import ResultCache, normalise_response
+    from .numeric import numeric_comparison
+    from .prescreen import FloatExpression, clearly_different
+    from .sampling import (
+        MAX_SAMPLE_POINTS,
+        MIN_SAMPLE_POINTS,
+        CompiledExpression,
+        candidate_points,
+        sample_count,
+    )
+    from .time_budget import TimeBudget, TimeBudgetExceeded
+    from .timings import create_timings
 except ImportError:
     from expression_utilities import (
+        convert_absolute_notation,
         create_sympy_parsing_params,
+        input_symbol_substitutions,
         parse_expression,
-        preprocess_expression,
+        parse_symbol_assumptions,
         substitute,
+        sympy_parsing_transformations,
+    )
+    from equivalence import check_equation_equivalence, check_equivalence
+    from plus_minus import (
+        SIGN_MODES,
+        expand_signs,
+        has_plus_minus,
+        has_unary_signs,
+        is_correct_for_criteria,
+        rewrite_signs,
+        sign_branches,
+        sign_symbols,
     )
+    from result_cache import ResultCache, normalise_response
+    from numeric import numeric_comparison
+    from prescreen import FloatExpression, clearly_different
+    from sampling import (
+        MAX_SAMPLE_POINTS,
+        MIN_SAMPLE_POINTS,
+        CompiledExpression,
+        candidate_points,
+        sample_count,
+    )
+    from time_budget import TimeBudget, TimeBudgetExceeded
+    from timings import create_timings
 
 parse_error_warning = (
     lambda x: f"`{x}` could not be parsed as a valid mathematical expression. Ensure that correct codes for input symbols are used, correct notation is used, that the expression is unambiguous and that all parentheses are closed."
 )
 
+time_budget_warning = (
+    lambda x: f"The response could not be evaluated within the time budget ({x} ms)."
+)
+
+# Parameters that only affect how an evaluation is run, not the question
+RUNTIME_PARAMS = ("time_budget_ms", "result_cache", "return_timings")
+
+# Results of previous evaluations, shared with other processes on the same
+# host if EVALUATION_RESULT_CACHE_PATH is set, see ResultCache
+result_cache = ResultCache(
+    path=os.environ.get("EVALUATION_RESULT_CACHE_PATH", None)
+)
+
 
 def evaluation_function(response, answer, params) -> dict:
     """
     Function used to symbolically compare two expressions.
+    ---
+    If params["return_timings"] is true the result has a "timings" field
+    with the duration (in milliseconds) of each stage of the evaluation and
+    counters such as the number of sample points evaluated, see Timings.
     """
+    timings = create_timings(params)
+    with timings.stage("total"):
+        result = _cached_evaluation_function(response, answer, params, timings)
+    if timings.enabled:
+        result["timings"] = timings.as_dict()
+    return result
 
+
+def _cached_evaluation_function(response, answer, params, timings) -> dict:
+    cache_key = None
+    if (
+        params.get("result_cache", True)
+        and isinstance(response, str)
+        and isinstance(answer, str)
+    ):
+        with timings.stage("result_cache"):
+            fingerprint = question_fingerprint(answer, params)
+            if fingerprint is not None:
+                cache_key = fingerprint + ":" + normalise_response(response)
+                result = result_cache.get(cache_key)
+        if cache_key is not None and result is not None:
+            timings.count("result_cache_hits")
+            return result
+
+    budget = TimeBudget(params.get("time_budget_ms", None), timings)
+    try:
+        result = _evaluation_function(response, answer, params, budget)
+    except TimeBudgetExceeded as e:
+        return {
+            "is_correct": False,
+            "feedback": time_budget_warning(budget.time_budget_ms),
+            "timeout": {
+                "stage": e.stage,
+                "time_budget_ms": budget.time_budget_ms,
+            },
+        }
+
+    if cache_key is not None:
+        try:
+            result_cache.set(cache_key, result)
+        except (TypeError, ValueError):
+            # Result is not JSON serialisable
+            pass
+    return result
+
+
+def _evaluation_function(response, answer, params, budget) -> dict:
     params = params.copy()
 
     if "is_latex" in params and params["is_latex"]:
@@ -49,60 +170,162 @@ def evaluation_function(response, answer, params) -> dict:
         answer = answer.replace(params["minus_plus"], "minus_plus")
         response = response.replace(params["minus_plus"], "minus_plus")
 
-    if ("plus_minus" not in response + answer) and (
-        "minus_plus" not in response + answer
-    ):
-        return check_equality(response, answer, params)
-    else:
-        response_set = set()
-        if ("plus_minus" in response) or ("minus_plus" in response):
-            response_set.add(
-                response.replace("plus_minus", "+").replace("minus_plus", "-")
-            )
-            response_set.add(
-                response.replace("plus_minus", "-").replace("minus_plus", "+")
-            )
+    if not has_plus_minus(response + answer):
+        return check_equality(response, answer, params, budget=budget)
+    return check_plus_minus(response, answer, params, budget)
+
+
+def check_plus_minus(response, answer, params, budget) -> dict:
+    """
+    Compares a response and an answer where at least one contains the
+    plus_minus or minus_plus operator.
+
+    Both are parsed once with a sign symbol for the operators, the sign
+    combinations are created from the parsed expressions and each distinct
+    response branch is compared to the distinct answer branches. How the
+    matches are combined depends on params["multiple_answers_criteria"].
+
+    If params["plus_minus_signs"] is "independent" every operator has its
+    own sign, by default ("correlated") all operators of an expression
+    share one sign.
+    """
+    missing = _missing_input(response, answer)
+    if missing is not None:
+        return missing
+    signs = params.get("plus_minus_signs", "correlated")
+    if signs not in SIGN_MODES:
+        raise Exception(f"Unknown plus_minus_signs: {signs}")
+    independent = signs == "independent"
+    criteria = params["multiple_answers_criteria"]
+
+    answer = answer.strip()
+    with budget.timings.stage("compile_question"):
+        if has_unary_signs(answer):
+            answer_questions = [
+                compile_question(branch, params)
+                for branch in expand_signs(answer, independent)
+            ]
+            question = answer_questions[0]
+        else:
+            answer, answer_signs = rewrite_signs(answer, independent)
+            question = compile_question(answer, params)
+            answer_questions = [
+                question.branch(branch)
+                for branch in sign_branches(question.expression, answer_signs)
+            ]
+
+    # Parse each response branch once
+    original = response.strip()
+    latex = params.get("response_format", None) == "latex"
+    try:
+        if latex or has_unary_signs(original):
+            responses = [
+                _parse_response(branch, question, params, budget)
+                for branch in expand_signs(original, independent)
+            ]
         else:
-            response_set.add(response)
-        response_list = list(response_set)
-        answer_set = set()
-        if ("plus_minus" in answer) or ("minus_plus" in answer):
-            answer_set.add(
-                answer.replace("plus_minus", "+").replace("minus_plus", "-")
+            response, response_signs = rewrite_signs(original, independent)
+            res, response, remark = _parse_response(
+                response, question, params, budget, display=original
             )
-            answer_set.add(
-                answer.replace("plus_minus", "-").replace("minus_plus", "+")
+            responses = [
+                (branch, response, remark)
+                for branch in sign_branches(res, response_signs)
+            ]
+        interp = [
+            _render_response(*branch, params, budget) for branch in responses
+        ]
+    except _ResponseError as e:
+        budget.timings.count("comparisons")
+        return e.result
+
+    matches = {
+        "responses": [False] * len(responses),
+        "answers": [False] * len(answer_questions),
+    }
+    for i, (res, response, remark) in enumerate(responses):
+        for j, answer_question in enumerate(answer_questions):
+            # Comparisons that cannot change the result are skipped
+            if matches["responses"][i] and (
+                criteria == "all_responses" or matches["answers"][j]
+            ):
+                continue
+            if matches["answers"][j] and criteria == "all_answers":
+                continue
+            result = compare_response(
+                res, response, remark, {}, answer_question, params, budget
             )
-        else:
-            answer_set.add(answer)
-        answer_list = list(answer_set)
-        matches = {
-            "responses": [False] * len(response_list),
-            "answers": [False] * len(answer_list),
-        }
-        interp = ""
-        for i, response in enumerate(response_list):
-            result = None
-            for j, answer in enumerate(answer_list):
-                result = check_equality(response, answer, params)
-                if result["is_correct"]:
-                    matches["responses"][i] = True
-                    matches["answers"][j] = True
-            if interp == "":
-                interp = result["response_latex"]
-            else:
-                interp += ", " + result["response_latex"]
-        if params["multiple_answers_criteria"] == "all":
-            is_correct = all(matches["responses"]) and all(matches["answers"])
-        elif params["multiple_answers_criteria"] == "all_responses":
-            is_correct = all(matches["responses"])
-        elif params["multiple_answers_criteria"] == "all_answers":
-            is_correct = all(matches["answers"])
-        else:
-            raise SyntaxWarning(
-                f"Unknown multiple_answers_criteria: {params['multiple_answers_critera']}"
+            if result["is_correct"]:
+                matches["responses"][i] = True
+                matches["answers"][j] = True
+        if criteria != "all_answers" and not matches["responses"][i]:
+            # The response branch does not match any answer branch
+            break
+    is_correct = is_correct_for_criteria(matches, criteria)
+    return {
+        "is_correct": is_correct,
+        "response_latex": ", ".join(r["response_latex"] for r in interp),
+    }
+
+
+def batch_evaluation_function(tasks) -> list:
+    """
+    Function used to symbolically compare many responses to many answers.
+
+    Parameters
+    ----------
+    tasks : list
+        Tasks to evaluate, each task is either a (response, answer, params)
+        triple or a dictionary with the keys "response", "answer" and "params"
+
+    Returns
+    -------
+    results : list
+        Results in the same order as tasks, each result is what
+        evaluation_function returns for the task or, if the task is
+        malformed or evaluating it raised an exception, a dictionary with
+        an "error" key
+
+    Remark
+    ------
+    Tasks are grouped by question (answer and params) and the groups are
+    evaluated one at a time so that the answer-side work, see
+    CompiledQuestion, is done once per question.
+    """
+    results = [None] * len(tasks)
+    groups = {}
+    for index, task in enumerate(tasks):
+        try:
+            if isinstance(task, dict):
+                task = (
+                    task["response"],
+                    task["answer"],
+                    task.get("params", {}),
+                )
+            response, answer, params = task
+            params_key = question_key(params)
+            if params_key is None:
+                params_key = index
+            groups.setdefault((answer, params_key), []).append(
+                (index, response, answer, params)
             )
-        return {"is_correct": is_correct, "response_latex": interp}
+        except Exception as e:
+            # Malformed task, e.g. a missing key or an unhashable answer
+            results[index] = _batch_error(e)
+
+    for group in groups.values():
+        for index, response, answer, params in group:
+            try:
+                results[index] = evaluation_function(response, answer, params)
+            except Exception as e:
+                results[index] = _batch_error(e)
+    return results
+
+
+def _batch_error(exception):
+    return {
+        "error": {"type": type(exception).__name__, "message": str(exception)}
+    }
 
 
 # def RecpTrig(expr):
@@ -141,23 +364,55 @@ def Decimals(expr):
     -------
     expr : Updated expression
 
+    Remark
+    ------
+    Only the Float atoms are replaced, expressions without floats are
+    returned unchanged. Constant expressions with floats are still passed
+    to nsimplify so that e.g. 1.4142135623731 can be recognised as sqrt(2).
+
     Tests
     -----
     Checks if x*0.5 = x/2
     """
-    from sympy import nsimplify
+    from sympy import Float, nsimplify
+
+    floats = expr.atoms(Float)
+    if len(floats) == 0:
+        return expr
+    if len(expr.free_symbols) == 0:
+        return nsimplify(expr)
+    return expr.xreplace({f: _float_to_rational(f) for f in floats})
+
+
+def _float_to_rational(number):
+    """
+    Input:
+        number : sympy Float
+    Output:
+        Exact rational number for the Float. The string of a Float has as
+        many significant digits as its precision, if it ends in zeros the
+        decimal the user wrote is shorter and it is converted as it is,
+        otherwise the value might be a rounded result (e.g. 1/3.0) and the
+        conversion is done by nsimplify.
+    """
+    from sympy import Rational, nsimplify
 
-    expr = nsimplify(expr)
-    return expr
+    string = str(number)
+    mantissa = string.lower().split("e")[0]
+    digits = mantissa.lstrip("-").replace(".", "").lstrip("0")
+    if number.is_finite and digits.endswith("0"):
+        return Rational(string)
+    return nsimplify(number, rational=True)
 
 
 def Absolute(res, ans):
     """
     Accept || as another form of writing modulus of an expression.
     Function makes the input parseable by SymPy, SymPy only accepts Abs()
-    REMARK: this function cannot handle nested || and will raise a
-    SyntaxWarning if more than two | are present in the answer or the
-    response
+    REMARK: bars that could both open and close an absolute value are
+    ambiguous, see convert_absolute_notation. If there are more than two |
+    and some are ambiguous a remark is returned for the response and a
+    SyntaxWarning is raised for the answer.
 
     Parameters
     ----------
@@ -172,6 +427,8 @@ def Absolute(res, ans):
         Updated response input
     ans : string
         Updated answer input
+    remark : string
+        Ambiguity warning for the response, empty if there is none
 
     Tests
     -----
@@ -180,109 +437,11 @@ def Absolute(res, ans):
     Checks if giving |x|+|y| as answer raises an Exception
 
     """
-
-    # positions of the || values
     n_res = res.count("|")
-    if n_res == 2:
-        res = list(res)
-        res[res.index("|")] = "Abs("
-        res[res.index("|")] = ")"
-        res = "".join(res)
-    elif n_res > 0:
-        res_start_abs_pos = []
-        res_end_abs_pos = []
-        res_ambiguous_abs_pos = []
-
-        if res[0] == "|":
-            res_start_abs_pos.append(0)
-        for i in range(1, len(res) - 1):
-            if res[i] == "|":
-                if (res[i - 1].isalnum() or res[i - 1] in "()[]{}") and not (
-                    res[i + 1].isalnum() or res[i + 1] in "()[]{}"
-                ):
-                    res_end_abs_pos.append(i)
-                elif (res[i + 1].isalnum() or res[i + 1] in "()[]{}") and not (
-                    res[i - 1].isalnum() or res[i - 1] in "()[]{}"
-                ):
-                    res_start_abs_pos.append(i)
-                else:
-                    res_ambiguous_abs_pos.append(i)
-        if res[-1] == "|":
-            res_end_abs_pos.append(len(res) - 1)
-        res = list(res)
-        for i in res_start_abs_pos:
-            res[i] = "Abs("
-        for i in res_end_abs_pos:
-            res[i] = ")"
-        k = 0
-        prev_ambiguous = -1
-        for i in res_ambiguous_abs_pos:
-            prev_start = -1
-            for j in res_start_abs_pos:
-                if j < i:
-                    prev_start = j
-                else:
-                    break
-            prev_end = -1
-            for j in res_end_abs_pos:
-                if j < i:
-                    prev_end = j
-                else:
-                    break
-            if max(prev_start, prev_end, prev_ambiguous) == prev_end:
-                if res[i - 1].isalnum():
-                    res[i] = "*Abs("
-                else:
-                    res[i] = "Abs("
-            elif max(prev_start, prev_end, prev_ambiguous) == prev_ambiguous:
-                if k % 2 == 0:
-                    if res[i - 1].isalnum():
-                        res[i] = "*Abs("
-                    else:
-                        res[i] = "Abs("
-                else:
-                    res[i] = ")"
-                k += 1
-            else:
-                res[i] = ")"
-            prev_ambiguous = i
-        res = "".join(res)
-
     n_ans = ans.count("|")
-    if n_ans == 2:
-        ans = list(ans)
-        ans[ans.index("|")] = "Abs("
-        ans[ans.index("|")] = ")"
-        ans = "".join(ans)
-    elif n_ans > 0:
-        ans_start_abs_pos = []
-        ans_end_abs_pos = []
-        ans_ambiguous_abs_pos = []
-
-        if ans[0] == "|":
-            ans_start_abs_pos.append(0)
-        for i in range(1, len(ans) - 1):
-            if ans[i] == "|":
-                if (ans[i - 1].isalnum() or ans[i - 1] in "()[]{}") and not (
-                    ans[i + 1].isalnum() or ans[i + 1] in "()[]{}"
-                ):
-                    ans_end_abs_pos.append(i)
-                elif (ans[i + 1].isalnum() or ans[i + 1] in "()[]{}") and not (
-                    ans[i - 1].isalnum() or ans[i - 1] in "()[]{}"
-                ):
-                    ans_start_abs_pos.append(i)
-                else:
-                    ans_ambiguous_abs_pos.append(i)
-        if ans[-1] == "|":
-            ans_end_abs_pos.append(len(ans) - 1)
-        ans = list(ans)
-        for i in ans_start_abs_pos:
-            ans[i] = "Abs("
-        for i in ans_end_abs_pos:
-            ans[i] = ")"
-        ans = "".join(ans)
-
-    # Response
+    res, res_ambiguous = convert_absolute_notation(res)
+    ans, ans_ambiguous = convert_absolute_notation(ans)
+
     ambiguity_warning_answer = (
         "Notation in answer might be ambiguous, use Abs(.) instead of |.|"
     )
@@ -291,73 +450,296 @@ def Absolute(res, ans):
     )
 
     remark = ""
-    if n_ans > 2 and len(ans_ambiguous_abs_pos) > 0:
+    if n_ans > 2 and len(ans_ambiguous) > 0:
         raise SyntaxWarning(ambiguity_warning_answer, "ambiguityWith|")
-    if n_res > 2 and len(res_ambiguous_abs_pos) > 0:
+    if n_res > 2 and len(res_ambiguous) > 0:
         remark = ambiguity_warning_response
 
     return res, ans, remark
 
 
-def check_equality(response, answer, params) -> dict:
-    from latex2sympy2 import latex2sympy
-    from sympy import Symbol, expand, latex, pi, radsimp, simplify, trigsimp
+# Maximum number of compiled questions kept in memory, see compile_question
+COMPILED_QUESTION_CACHE_SIZE = 256
 
-    unsplittable_symbols = tuple() + (
-        params.get("plus_minus", "plus_minus"),
-        params.get("minus_plus", "minus_plus"),
-    )
+# Largest number of symbol combinations that answer values for the
+# pre-screen are kept for in a CompiledQuestion, see prescreen_values
+PRESCREEN_CACHE_SIZE = 16
+
+
+class CompiledQuestion:
+    """
+    Answer-side part of check_equality, i.e. everything that only depends on
+    the answer and the evaluation function parameters. It is computed once
+    and shared between all responses to the same question.
+
+    Attributes
+    ----------
+    answer : string
+        Preprocessed answer, i.e. after input symbol and || substitutions
+    fingerprint : string
+        Stable hash of the answer and parameters (None if not computable)
+    substitutions : list
+        Input symbol substitutions, see input_symbol_substitutions
+    parsing_params : dict
+        Parsing parameters shared by answer and response, see parse_expression
+    transformations : tuple
+        SymPy parser transformations used for answer and response
+    symbol_dict : dict
+        Symbols used when parsing, including symbol assumptions
+    expression : SymPy expression
+        Parsed answer
+    """
+
+    def __init__(self, answer, params, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.params = params
 
+        unsplittable_symbols = tuple() + (
+            params.get("plus_minus", "plus_minus"),
+            params.get("minus_plus", "minus_plus"),
+        )
+
+        self.substitutions = input_symbol_substitutions(params)
+        if len(self.substitutions) > 0:
+            answer = substitute(answer, self.substitutions)
+
+        parsing_params = create_sympy_parsing_params(
+            params, unsplittable_symbols=unsplittable_symbols
+        )
+        parsing_params["extra_transformations"] = parser_transformations[
+            9
+        ]  # Add conversion of equal signs
+
+        if "symbol_assumptions" in params.keys():
+            parsing_params["symbol_dict"].update(
+                parse_symbol_assumptions(params["symbol_assumptions"])
+            )
+
+        # Sign symbols of plus_minus and minus_plus, see plus_minus
+        parsing_params["symbol_dict"].update(sign_symbols(answer))
+
+        self.transformations = sympy_parsing_transformations(parsing_params)
+        parsing_params["transformations"] = self.transformations
+        self.parsing_params = parsing_params
+        self.symbol_dict = parsing_params["symbol_dict"]
+
+        _, answer, _ = Absolute("", answer)
+        self.answer = answer
+
+        try:
+            self.expression = parse_expression(answer, parsing_params)
+        except Exception as e:
+            raise Exception("SymPy was unable to parse the answer.") from e
+
+        self._decimals_expression = None
+        self._compiled_expression = None
+        self._float_expression = None
+        self._prescreen_values = {}
+        self._branches = {}
+
+    def branch(self, expression):
+        """
+        Returns a CompiledQuestion that shares everything with this one
+        except that the answer is the given expression, used for the sign
+        combinations of answers with plus_minus, see plus_minus.
+        """
+        if expression not in self._branches:
+            branch = copy.copy(self)
+            branch.expression = expression
+            branch._decimals_expression = None
+            branch._compiled_expression = None
+            branch._float_expression = False
+            branch._prescreen_values = {}
+            branch._branches = {}
+            self._branches[expression] = branch
+        return self._branches[expression]
+
+    def decimals_expression(self):
+        """
+        Parsed answer with decimals turned into rational form, see Decimals.
+        """
+        if self._decimals_expression is None:
+            try:
+                self._decimals_expression = Decimals(self.expression)
+            except (SyntaxError, TypeError) as e:
+                raise Exception("SymPy was unable to parse the answer.") from e
+        return self._decimals_expression
+
+    def compiled_expression(self):
+        """
+        Parsed answer, with decimals in rational form, compiled for
+        numerical sampling, see CompiledExpression.
+        """
+        if self._compiled_expression is None:
+            self._compiled_expression = CompiledExpression(
+                self.decimals_expression()
+            )
+        return self._compiled_expression
+
+    def float_expression(self):
+        """
+        Answer compiled for the pre-screen, see FloatExpression, or None
+        if the answer cannot be evaluated that way.
+        """
+        if self._float_expression is None:
+            self._float_expression = False
+            if not isinstance(self.expression, Equality):
+                try:
+                    self._float_expression = FloatExpression(
+                        self.answer, self.parsing_params
+                    )
+                except Exception:
+                    pass
+        return self._float_expression or None
+
+    def prescreen_values(self, symbols):
+        """
+        Input:
+            symbols : tuple of the symbols of the response and the answer,
+                      sorted by name
+        Output:
+            Triple (points, answer values, number of points to compare at)
+            for the pre-screen, see clearly_different.
+        """
+        if symbols not in self._prescreen_values:
+            count = max(
+                sample_count(self.compiled_expression()),
+                min(MAX_SAMPLE_POINTS, MIN_SAMPLE_POINTS + 2 * len(symbols)),
+            )
+            points = candidate_points(
+                symbols,
+                count,
+                self.params.get("complexNumbers", False) is True,
+            )
+            ans = self.float_expression()
+            values = [ans.evaluate(point) for point in points]
+            if len(self._prescreen_values) >= PRESCREEN_CACHE_SIZE:
+                self._prescreen_values.clear()
+            self._prescreen_values[symbols] = (points, values, count)
+        return self._prescreen_values[symbols]
+
+
+def question_key(params):
+    """
+    Returns a canonical string representation of params that can be used to
+    identify a question, or None if params cannot be serialised.
+    """
+    params = {k: v for (k, v) in params.items() if k not in RUNTIME_PARAMS}
+    try:
+        return json.dumps(params, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+
+
+def compile_question(answer, params) -> CompiledQuestion:
+    """
+    Returns the CompiledQuestion for the given answer and params. Compiled
+    questions are kept in a bounded LRU cache keyed by the answer and a
+    canonical representation of params so that the answer-side work in
+    check_equality is only done once per question.
+    """
+    params_key = question_key(params)
+    if params_key is None:
+        return CompiledQuestion(answer, params)
+    return _compile_question(answer, params_key)
+
+
+def question_fingerprint(answer, params):
+    """
+    Returns a stable hash of answer and params that identifies a question,
+    or None if params cannot be serialised.
+    """
+    params_key = question_key(params)
+    if params_key is None:
+        return None
+    return _fingerprint(answer, params_key)
+
+
+def _fingerprint(answer, params_key):
+    return hashlib.sha256(
+        json.dumps([answer, params_key]).encode("utf-8")
+    ).hexdigest()
+
+
+@lru_cache(maxsize=COMPILED_QUESTION_CACHE_SIZE)
+def _compile_question(answer, params_key):
+    fingerprint = _fingerprint(answer, params_key)
+    return CompiledQuestion(answer, json.loads(params_key), fingerprint)
+
+
+def response_interpretation(res, params, budget):
+    """
+    Input:
+        res    : parsed response
+        params : evaluation function parameter dictionary
+        budget : TimeBudget for the evaluation
+    Output:
+        Dictionary with the LaTeX and string representations of the response.
+    Remark:
+        By default the response is rendered in the canonical form SymPy
+        creates when parsing. The (more expensive) simplified form is only
+        computed if params["response_rendering"] is "simplified".
+    """
+    from sympy import latex
+
+    if params.get("response_rendering", "canonical") == "simplified":
+        budget.timings.count("simplify_calls")
+        res = budget.run("response_simplify", res.simplify)
+    return {"response_latex": latex(res), "response_simplified": str(res)}
+
+
+class _ResponseError(Exception):
+    # Raised when the response cannot be interpreted, result is the
+    # result that is returned for the response
+    def __init__(self, result):
+        super().__init__(result.get("feedback", ""))
+        self.result = result
+
+
+def _missing_input(response, answer):
+    # Returns the result for a missing response, None if both are given
     if not isinstance(answer, str):
         raise Exception("No answer was given.")
     if not isinstance(response, str):
         return {"is_correct": False, "feedback": "No response submitted."}
-
-    answer = answer.strip()
-    response = response.strip()
-    if len(answer) == 0:
+    if len(answer.strip()) == 0:
         raise Exception("No answer was given.")
-    if len(response) == 0:
+    if len(response.strip()) == 0:
         return {"is_correct": False, "feedback": "No response submitted."}
+    return None
 
-    answer, response = preprocess_expression([answer, response], params)
-    parsing_params = create_sympy_parsing_params(
-        params, unsplittable_symbols=unsplittable_symbols
+
+def _parse_response(response, question, params, budget, display=None):
+    """
+    Input:
+        response : response string
+        question : CompiledQuestion for the answer
+        params   : evaluation function parameter dictionary
+        budget   : TimeBudget for the evaluation
+        display  : response shown in the feedback if it cannot be parsed,
+                   if None the preprocessed response is shown
+    Output:
+        Triple (parsed response, preprocessed response string, remark)
+    Remark:
+        Raises _ResponseError if the response cannot be parsed.
+    """
+    response, remark = _preprocess_response(response, question, params, budget)
+    return _parse_preprocessed_response(
+        response, remark, question, params, budget, display
     )
-    parsing_params["extra_transformations"] = parser_transformations[
-        9
-    ]  # Add conversion of equal signs
-
-    if "symbol_assumptions" in params.keys():
-        symbol_assumptions_strings = params["symbol_assumptions"]
-        symbol_assumptions = []
-        index = symbol_assumptions_strings.find("(")
-        while index > -1:
-            index_match = find_matching_parenthesis(
-                symbol_assumptions_strings, index
-            )
-            try:
-                symbol_assumption = eval(
-                    symbol_assumptions_strings[index + 1 : index_match]
-                )
-                symbol_assumptions.append(symbol_assumption)
-            except (SyntaxError, TypeError) as e:
-                raise Exception(
-                    "List of symbol assumptions not written correctly."
-                )
-            index = symbol_assumptions_strings.find("(", index_match + 1)
-        for sym, ass in symbol_assumptions:
-            try:
-                parsing_params["symbol_dict"].update(
-                    {sym: eval("Symbol('" + sym + "'," + ass + "=True)")}
-                )
-            except Exception as e:
-                raise Exception(
-                    f"Assumption {ass} for symbol {sym} caused a problem."
-                )
+
+
+def _preprocess_response(response, question, params, budget):
+    # Returns the response after input symbol and || substitutions, and
+    # remarks about the response
+    timings = budget.timings
+    if len(question.substitutions) > 0:
+        with timings.stage("substitute"):
+            response = substitute(response, question.substitutions)
 
     # Dealing with special cases that aren't accepted by SymPy
-    response, answer, remark = Absolute(response, answer)
+    with timings.stage("absolute"):
+        response, _, remark = Absolute(response, "")
 
     if params.get("strict_syntax", True):
         if "^" in response:
@@ -366,28 +748,152 @@ def check_equality(response, answer, params) -> dict:
                 separator
                 + "Note that `^` cannot be used to denote exponentiation, use `**` instead."
             )
+    return response, remark
+
 
-    # Safely try to parse answer and response into symbolic expressions
+def _parse_preprocessed_response(
+    response, remark, question, params, budget, display=None
+):
+    # Parses a response returned by _preprocess_response, see _parse_response
+    from latex2sympy2 import latex2sympy
+
+    timings = budget.timings
+    parsing_params = question.parsing_params
+
+    # Safely try to parse the response into a symbolic expression
     try:
         if params.get("response_format", None) == "latex":
-            response = str(latex2sympy(response))
-        res = parse_expression(response, parsing_params).simplify()
-    except Exception as e:
-        separator = "" if len(remark) == 0 else "\n"
+            with timings.stage("latex2sympy"):
+                response = str(latex2sympy(response))
+        signs = sign_symbols(response)
+        if len(signs) > 0:
+            parsing_params = {
+                **parsing_params,
+                "symbol_dict": {**parsing_params["symbol_dict"], **signs},
+            }
+        with timings.stage("parse"):
+            res = parse_expression(response, parsing_params)
+        if not isinstance(res, Basic):
+            raise Exception("The response is not an expression.")
+    except TimeBudgetExceeded:
+        raise
+    except Exception:
+        if display is None:
+            display = response
+        raise _ResponseError(_parse_error_result(display, remark))
+    return res, response, remark
+
+
+def _parse_error_result(response, remark):
+    separator = "" if len(remark) == 0 else "\n"
+    return {
+        "is_correct": False,
+        "feedback": parse_error_warning(response) + separator + remark,
+    }
+
+
+def _render_response(res, response, remark, params, budget):
+    # Adds how res was interpreted to the result
+    try:
+        with budget.timings.stage("response_rendering"):
+            return response_interpretation(res, params, budget)
+    except TimeBudgetExceeded:
+        raise
+    except Exception:
+        raise _ResponseError(_parse_error_result(response, remark))
+
+
+def _prescreen(response, question, params):
+    """
+    Input:
+        response : preprocessed response string
+        question : CompiledQuestion for the answer
+        params   : evaluation function parameter dictionary
+    Output:
+        True if the response is clearly different from the answer when
+        both are evaluated with Python floats, see clearly_different.
+    Remark:
+        The pre-screen is skipped (i.e. False is returned) for LaTeX
+        responses, numerical comparisons, equations and responses or
+        answers that cannot be evaluated with FloatExpression.
+    """
+    if params.get("response_format", None) == "latex":
+        return False
+    if (
+        params.get("numerical", False)
+        or params.get("rtol", False)
+        or params.get("atol", False)
+    ):
+        return False
+    ans = question.float_expression()
+    if ans is None:
+        return False
+    try:
+        res = FloatExpression(response, question.parsing_params)
+    except Exception:
+        return False
+    symbols = tuple(sorted(set(res.symbols) | set(ans.symbols), key=str))
+    points, values, count = question.prescreen_values(symbols)
+    return clearly_different(res, points, values, count)
+
+
+def check_equality(response, answer, params, budget=None) -> dict:
+    missing = _missing_input(response, answer)
+    if missing is not None:
+        return missing
+    answer = answer.strip()
+    response = response.strip()
+
+    if budget is None:
+        budget = TimeBudget()
+    with budget.timings.stage("compile_question"):
+        question = compile_question(answer, params)
+    try:
+        response, remark = _preprocess_response(
+            response, question, params, budget
+        )
+        different = False
+        if params.get("prescreen", True):
+            with budget.timings.stage("prescreen"):
+                different = _prescreen(response, question, params)
+        res, response, remark = _parse_preprocessed_response(
+            response, remark, question, params, budget
+        )
+        interp = _render_response(res, response, remark, params, budget)
+    except _ResponseError as e:
+        budget.timings.count("comparisons")
+        return e.result
+    if different:
+        budget.timings.count("comparisons")
+        feedback = {} if remark == "" else {"feedback": remark}
         return {
             "is_correct": False,
-            "feedback": parse_error_warning(response) + separator + remark,
+            "level": "prescreen",
+            **feedback,
+            **interp,
         }
+    return compare_response(
+        res, response, remark, interp, question, params, budget
+    )
 
-    try:
-        ans = parse_expression(answer, parsing_params)
-    except Exception as e:
-        raise Exception(
-            "SymPy was unable to parse the answer." + remark,
-        ) from e
 
-    # Add how res was interpreted to the response
-    interp = {"response_latex": latex(res), "response_simplified": str(res)}
+def compare_response(res, response, remark, interp, question, params, budget):
+    """
+    Input:
+        res      : parsed response
+        response : preprocessed response string, used in feedback
+        remark   : remarks about the response that are added to feedback
+        interp   : rendering of the response, see response_interpretation
+        question : CompiledQuestion for the answer
+        params   : evaluation function parameter dictionary
+        budget   : TimeBudget for the evaluation
+    Output:
+        Result of the comparison of the response with the answer.
+    """
+    timings = budget.timings
+    timings.count("comparisons")
+
+    ans = question.expression
 
     feedback = {}
 
@@ -414,20 +920,27 @@ def check_equality(response, answer, params) -> dict:
         return
 
     if isinstance(res, Equality) and isinstance(ans, Equality):
-        is_correct = (
-            ((res.args[0] - res.args[1]) / (ans.args[0] - ans.args[1]))
-            .simplify()
-            .is_constant()
+        is_correct, stage, details = check_equation_equivalence(
+            res, ans, question, budget, params.get("equation_stages", None)
         )
         if remark != "":
             feedback = {"feedback": remark}
-        return {"is_correct": is_correct, **feedback, **interp}
+        if stage is None:
+            return {"is_correct": False, **details, **feedback, **interp}
+        return {
+            "is_correct": is_correct,
+            "level": stage,
+            **details,
+            **feedback,
+            **interp,
+        }
         return
 
     # Dealing with special cases
     try:
         #        res = RecpTrig(res)
-        res = Decimals(res)
+        with timings.stage("decimals"):
+            res = Decimals(res)
     except Exception:
         separator = "" if len(remark) == 0 else "\n"
         return {
@@ -435,143 +948,51 @@ def check_equality(response, answer, params) -> dict:
             "feedback": parse_error_warning(response) + separator + remark,
         }
 
-    try:
-        #        ans = RecpTrig(ans)
-        ans = Decimals(ans)
-    except (SyntaxError, TypeError) as e:
-        raise Exception("SymPy was unable to parse the answer.") from e
-
-    error_below_atol = False
-    error_below_rtol = False
+    #    ans = RecpTrig(ans)
+    with timings.stage("decimals"):
+        ans = question.decimals_expression()
 
     if (
         params.get("numerical", False)
         or params.get("rtol", False)
         or params.get("atol", False)
     ):
-        # REMARK: 'pi' should be a reserve symbols but is sometimes not treated as one, possibly because of input symbols
-        # The two lines below this comments fixes the issue but a more robust solution should be found for cases where there
-        # are other reserved symbols.
-        ans = ans.subs(Symbol("pi"), float(pi))
-        res = res.subs(Symbol("pi"), float(pi))
-        if res.is_constant() and ans.is_constant():
-            if "atol" in params.keys():
-                error_below_atol = bool(
-                    abs(float(ans - res)) < float(params["atol"])
-                )
-            else:
-                error_below_atol = True
-            if "rtol" in params.keys():
-                rtol = float(params["rtol"])
-                error_below_rtol = bool(
-                    float(abs(((ans - res) / ans).simplify())) < rtol
-                )
-            else:
-                error_below_rtol = True
-        if error_below_atol and error_below_rtol:
-            return {
-                "is_correct": True,
-                "level": "0",
-                "feedback": "The response is numerically equal to the answer."
-                + separator
-                + remark,
-                **interp,
-            }
+        with timings.stage("numerical"):
+            if budget.run_inline(
+                "numerical",
+                numeric_comparison,
+                res,
+                ans,
+                params.get("atol", None),
+                params.get("rtol", None),
+            ):
+                return {
+                    "is_correct": True,
+                    "level": "0",
+                    "feedback": "The response is numerically equal to the answer."
+                    + separator
+                    + remark,
+                    **interp,
+                }
 
     # Going from the simplest to complex tranformations available in sympy, check equality
     # https://github.com/sympy/sympy/wiki/Faq#why-does-sympy-say-that-two-equal-expressions-are-unequal
-    #    is_correct = bool(res.expand() == ans.expand())
-    #    if is_correct:
-    #        if remark != "":
-    #            feedback = {"feedback": remark}
-    #        return {
-    #            "is_correct": True,
-    #            "level": "1",
-    #            **feedback,
-    #            **interp
-    #        }
-    #
-    #    is_correct = bool(res.simplify() == ans.simplify())
-    #    if is_correct:
-    #        if remark != "":
-    #            feedback = {"feedback": remark}
-    #        return {
-    #            "is_correct": True,
-    #            "level": "2",
-    #            **feedback,
-    #            **interp
-    #        }
-    #
-    #    # Looks for trig identities
-    #    is_correct = bool(res.trigsimp() == ans.trigsimp())
-    #    if is_correct:
-    #        if remark != "":
-    #            feedback = {"feedback": remark}
-    #        return {
-    #            "is_correct": True,
-    #            "level": "3",
-    #            **feedback,
-    #            **interp
-    #        }
-
-    # Numerical sampling to quickly cases where the answer and response is different
-    n = 10
-    a = 0
-    b = 1
-    for k in range(0, n):
-        num_ans = float(
-            abs(
-                ans.subs(
-                    [
-                        (s, a + (b - a) * (k + 1) / (n + 1))
-                        for s in ans.free_symbols
-                    ]
-                )
-            )
-        )
-        num_res = float(
-            abs(
-                res.subs(
-                    [
-                        (s, a + (b - a) * (k + 1) / (n + 1))
-                        for s in res.free_symbols
-                    ]
-                )
-            )
-        )
-        ratio = 0
-        try:
-            ratio = abs(1 - num_ans / num_res)
-        except Exception:
-            try:
-                ratio = abs(1 - num_res / num_ans)
-            except Exception:
-                continue
-        if ratio > 1e-14:
-            if remark != "":
-                feedback = {"feedback": remark}
-            return {"is_correct": False, **feedback, **interp}
-
-    # Symbolic comparison
-    is_correct = bool((res - ans).simplify() == 0)
-    if is_correct:
-        if remark != "":
-            feedback = {"feedback": remark}
-        return {"is_correct": True, "level": "4", **feedback, **interp}
-
+    is_correct, stage, details = check_equivalence(
+        res,
+        ans,
+        question,
+        budget,
+        params.get("equivalence_stages", None),
+        params.get("race_stages", ()),
+    )
     if remark != "":
         feedback = {"feedback": remark}
-    return {"is_correct": False, **feedback, **interp}
-
-
-def find_matching_parenthesis(string, index):
-    depth = 0
-    for k in range(index, len(string)):
-        if string[k] == "(":
-            depth += 1
-            continue
-        if string[k] == ")":
-            depth += -1
-            if depth == 0:
-                return k
-    return -1
+    if stage is None:
+        return {"is_correct": False, **details, **feedback, **interp}
+    return {
+        "is_correct": is_correct,
+        "level": stage,
+        **details,
+        **feedback,
+        **interp,
+    }
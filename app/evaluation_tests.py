@@ -1,9 +1,25 @@
+import time
 import unittest
+from unittest import mock
 
 try:
-    from .evaluation import evaluation_function, parse_error_warning
+    from . import equivalence
+    from .evaluation import (
+        batch_evaluation_function,
+        compile_question,
+        evaluation_function,
+        parse_error_warning,
+        result_cache,
+    )
 except ImportError:
-    from evaluation import evaluation_function, parse_error_warning
+    import equivalence
+    from evaluation import (
+        batch_evaluation_function,
+        compile_question,
+        evaluation_function,
+        parse_error_warning,
+        result_cache,
+    )
 
 
 class TestEvaluationFunction(unittest.TestCase):
@@ -162,6 +178,21 @@ class TestEvaluationFunction(unittest.TestCase):
 
         self.assertEqual_input_variations(response, answer, params, True)
 
+    def test_decimals_are_converted_exactly(self):
+        params = {"strict_syntax": False}
+        cases = [
+            ("0.25*x+1.5", "x/4+3/2", True),
+            ("x/3.0", "x/3", True),
+            ("x/7.0", "x/7", True),
+            ("0.3*x", "x/3", False),
+            ("1e-3*x+100.0", "x/1000+100", True),
+            ("x**0.5", "sqrt(x)", True),
+        ]
+        for response, answer, value in cases:
+            with self.subTest(response=response, answer=answer):
+                result = evaluation_function(response, answer, params)
+                self.assertEqual(result["is_correct"], value)
+
     def test_absolute_correct(self):
         response = "|x|+y"
         answer = "Abs(x)+y"
@@ -347,6 +378,59 @@ class TestEvaluationFunction(unittest.TestCase):
 
         self.assertEqual_input_variations(response, answer, params, False)
 
+    def test_plus_minus_after_operator(self):
+        # The sign only applies to the operand that follows it
+        params = {"strict_syntax": False}
+        self.assertEqual_input_variations(
+            "2/plus_minus x", "plus_minus 2/x", params, True
+        )
+        params["multiple_answers_criteria"] = "all_answers"
+        self.assertEqual_input_variations(
+            "x**plus_minus 2", "x**2", params, True
+        )
+        self.assertEqual_input_variations(
+            "x**2", "x**plus_minus 2", params, False
+        )
+
+    def test_plus_minus_quadratic_formula(self):
+        response = "(-b minus_plus sqrt(b^2-4ac))/(2a)"
+        answer = "(-b plus_minus sqrt(b**2-4*a*c))/(2*a)"
+        params = {"strict_syntax": False}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], True)
+        self.assertEqual(len(result["response_latex"].split(", ")), 2)
+
+    def test_plus_minus_independent_signs(self):
+        response = "x - y"
+        answer = "plus_minus x plus_minus y"
+        params = {
+            "multiple_answers_criteria": "all_responses",
+            "strict_syntax": False,
+        }
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], False)
+        params["plus_minus_signs"] = "independent"
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], True)
+        params["plus_minus_signs"] = "some"
+        self.assertRaises(
+            Exception, evaluation_function, response, answer, params
+        )
+
+    def test_plus_minus_equation(self):
+        response = "plus_minus x = 2"
+        answer = "x = plus_minus 2"
+        params = {"strict_syntax": False}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], True)
+
+    def test_plus_minus_unparseable_response(self):
+        response = "x plus_minus"
+        answer = "plus_minus x"
+        result = evaluation_function(response, answer, {})
+        self.assertEqual(result["is_correct"], False)
+        self.assertIn("`x plus_minus`", result["feedback"])
+
     def test_simplified_in_correct_response(self):
         response = "a*x + b"
         answer = "b + a*x"
@@ -689,6 +773,304 @@ class TestEvaluationFunction(unittest.TestCase):
             result = evaluation_function(response, answer, params)
             self.assertEqual(result["is_correct"], True)
 
+    def test_compiled_question_is_reused(self):
+        answer = "2*x**2 + alpha"
+        params = {"strict_syntax": False, "symbols": [["alpha", ["a"]]]}
+        question = compile_question(answer, params)
+        self.assertIs(compile_question(answer, params), question)
+        self.assertIsNot(
+            compile_question(answer, {"strict_syntax": True}), question
+        )
+        responses = {"2x^2+a": True, "2*x**2 + alpha": True, "x**2 + a": False}
+        for response, value in responses.items():
+            with self.subTest(response=response):
+                result = evaluation_function(response, answer, params)
+                self.assertEqual(result["is_correct"], value)
+
+    def test_batch_evaluation(self):
+        params = {"strict_syntax": False}
+        tasks = [
+            ("2x+2", "2*(x+1)", params),
+            ("sin(x)", "cos(x)", params),
+            {"response": "x+1", "answer": "1+x", "params": {}},
+            ("2*x+2", "2*(x+1)", params),
+            ("3*x", "3x", {}),
+            ("plus_minus x", "minus_plus x", params),
+        ]
+        results = batch_evaluation_function(tasks)
+        self.assertEqual(len(results), len(tasks))
+        for k in [0, 1, 3, 5]:
+            self.assertEqual(results[k], evaluation_function(*tasks[k]))
+        self.assertEqual(results[2], evaluation_function("x+1", "1+x", {}))
+        self.assertIn("error", results[4])
+
+    def test_batch_evaluation_malformed_tasks(self):
+        params = {"strict_syntax": False}
+        tasks = [
+            ("2x+2", "2*(x+1)", params),
+            {"response": "x+1", "params": {}},
+            ("x", "x"),
+            ("x", ["x"], params),
+            ("x", "x", {"symbols": {1, 2}}),
+            ("sin(x)", "cos(x)", params),
+        ]
+        results = batch_evaluation_function(tasks)
+        self.assertEqual(len(results), len(tasks))
+        for k in [0, 5]:
+            self.assertEqual(results[k], evaluation_function(*tasks[k]))
+        self.assertEqual(results[1]["error"]["type"], "KeyError")
+        self.assertEqual(results[2]["error"]["type"], "ValueError")
+        self.assertEqual(results[3]["error"]["type"], "TypeError")
+        self.assertIn("error", results[4])
+
+    def test_time_budget(self):
+        response = "sin(x)**2 + cos(x)**2"
+        answer = "1"
+        result = evaluation_function(
+            response, answer, {"time_budget_ms": 10000}
+        )
+        self.assertEqual(result["is_correct"], True)
+        self.assertNotIn("timeout", result)
+        params = {"time_budget_ms": 0, "result_cache": False}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], False)
+        self.assertEqual(result["timeout"]["stage"], "expand")
+        params.update({"response_rendering": "simplified"})
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], False)
+        self.assertEqual(result["timeout"]["stage"], "response_simplify")
+        # Expanding this takes much longer than the budget, so the expand
+        # stage runs supervised and is stopped
+        params = {"time_budget_ms": 1000, "result_cache": False}
+        start = time.monotonic()
+        result = evaluation_function(
+            "(x+y+z+w)**30*(sin(x)**2+cos(x)**2)", "(x+y+z+w)**30", params
+        )
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(result["timeout"]["stage"], "expand")
+
+    def test_response_rendering(self):
+        response = "sin(x)**2 + cos(x)**2"
+        answer = "1"
+        result = evaluation_function(response, answer, {})
+        self.assertEqual(
+            result["response_simplified"], "sin(x)**2 + cos(x)**2"
+        )
+        params = {"response_rendering": "simplified"}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["response_latex"], "1")
+        self.assertEqual(result["response_simplified"], "1")
+
+    def test_return_timings(self):
+        response = "cosh(x)**2 - sinh(x)**2"
+        answer = "1"
+        result = evaluation_function(response, answer, {})
+        self.assertNotIn("timings", result)
+        params = {"return_timings": True, "result_cache": False}
+        result = evaluation_function(response, answer, params)
+        stages = result["timings"]["stages"]
+        for stage in ["total", "parse", "decimals", "equivalence_simplify"]:
+            self.assertIn(stage, stages)
+        self.assertGreaterEqual(stages["total"], stages["parse"])
+        self.assertGreater(result["timings"]["counts"]["sample_points"], 0)
+        self.assertEqual(result["timings"]["counts"]["simplify_calls"], 1)
+
+    def test_equivalence_stage_is_reported(self):
+        params = {"strict_syntax": False, "prescreen": False}
+        cases = [
+            ("x+1", "1+x", True, "structural"),
+            ("(x+1)**2", "x**2+2x+1", True, "expand"),
+            ("x**2+2x", "x**2+2x+1", False, "polynomial"),
+            ("x+1", "(x**2-1)/(x-1)", True, "rational"),
+            ("1/(x+1)+1/(x-1)", "2/(x**2-1)", False, "rational"),
+            ("exp(x)+1", "(exp(2x)-1)/(exp(x)-1)", True, "identity"),
+            ("1/(exp(x)-1)", "(exp(x)+1)/(exp(2x)-1)", True, "identity"),
+            ("sin(x)", "cos(x)", False, "sampling"),
+            ("sin(x)**2", "1-cos(x)**2", True, "route"),
+            ("cosh(x)**2", "1+sinh(x)**2", True, "simplify"),
+        ]
+        for response, answer, value, level in cases:
+            with self.subTest(response=response, answer=answer):
+                result = evaluation_function(response, answer, params)
+                self.assertEqual(result["is_correct"], value)
+                self.assertEqual(result["level"], level)
+
+    def test_prescreen(self):
+        params = {
+            "strict_syntax": False,
+            "return_timings": True,
+            "result_cache": False,
+        }
+        cases = [
+            ("sin(x)", "cos(x)", "prescreen"),
+            ("x**2+2x", "x**2+2x+1", "prescreen"),
+            ("x^2", "x**3", "prescreen"),
+            (
+                "(x-y)**6",
+                "x**6-6x**5y+15x**4y**2-20x**3y**3+15x**2y**4-6xy**5+y**6",
+                "expand",
+            ),
+        ]
+        for response, answer, level in cases:
+            with self.subTest(response=response, answer=answer):
+                result = evaluation_function(response, answer, params)
+                self.assertEqual(result["is_correct"], level == "expand")
+                self.assertEqual(result["level"], level)
+                self.assertIn("response_latex", result)
+                self.assertIn("prescreen", result["timings"]["stages"])
+        # Responses that cannot be parsed are reported as such
+        result = evaluation_function("x^2", "x**3", {"strict_syntax": True})
+        self.assertNotIn("level", result)
+        self.assertIn("could not be parsed", result["feedback"])
+        # The pre-screen is skipped for equations and when disabled
+        result = evaluation_function("x = 1", "x = 2", params)
+        self.assertNotEqual(result.get("level"), "prescreen")
+        params["prescreen"] = False
+        result = evaluation_function("sin(x)", "cos(x)", params)
+        self.assertEqual(result["level"], "sampling")
+        self.assertNotIn("prescreen", result["timings"]["stages"])
+
+    def test_route_is_reported(self):
+        params = {"strict_syntax": False}
+        cases = [
+            ("tan(x)", "sin(x)/cos(x)", {}, "route", "trig"),
+            ("cosh(x)**2", "1+sinh(x)**2", {}, "simplify", "generic"),
+            (
+                "gamma(x+1)",
+                "x*gamma(x)",
+                {"specialFunctions": True},
+                "route",
+                "special",
+            ),
+        ]
+        for response, answer, extra, level, route in cases:
+            with self.subTest(response=response, answer=answer):
+                result = evaluation_function(
+                    response, answer, {**params, **extra}
+                )
+                self.assertEqual(result["is_correct"], True)
+                self.assertEqual(result["level"], level)
+                self.assertEqual(result["route"], route)
+        # The route is only reported if the route stage ran
+        for response, answer in [("x+1", "1+x"), ("log(8)", "3log(2)")]:
+            with self.subTest(response=response, answer=answer):
+                result = evaluation_function(response, answer, params)
+                self.assertEqual(result["is_correct"], True)
+                self.assertNotIn("route", result)
+
+    def test_equation_stage_is_reported(self):
+        params = {"strict_syntax": False}
+        cases = [
+            ("2x**2 = 10y**2+20", "x**2-5y**2-10=0", True, "proportional"),
+            ("x = 2y", "x - y = 0", False, "proportional"),
+            ("exp(x) = y", "2exp(x) - 2y = 0", True, "identity"),
+            ("sin(x) = y", "cos(x) = y", False, "sampling"),
+            ("sin(x)**2 = y", "1 - cos(x)**2 = y", True, "simplify"),
+        ]
+        for response, answer, value, level in cases:
+            with self.subTest(response=response, answer=answer):
+                result = evaluation_function(response, answer, params)
+                self.assertEqual(result["is_correct"], value)
+                self.assertEqual(result["level"], level)
+        # Symbols are sampled independently, so sampling also rejects
+        # equations that only differ when the symbols have different values
+        params["equation_stages"] = ["sampling"]
+        result = evaluation_function("x = 2y", "x - y = 0", params)
+        self.assertEqual(result["is_correct"], False)
+        self.assertEqual(result["level"], "sampling")
+        result = evaluation_function("x = 2y", "2x - 4y = 0", params)
+        self.assertEqual(result["is_correct"], False)
+        self.assertNotIn("level", result)
+
+    def test_configured_equivalence_stages(self):
+        response = "sin(x)**2"
+        answer = "1-cos(x)**2"
+        params = {"equivalence_stages": ["structural", "expand"]}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], False)
+        self.assertNotIn("level", result)
+        params = {"equivalence_stages": ["sampling", "simplify"]}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], True)
+        self.assertEqual(result["level"], "simplify")
+        params = {"equivalence_stages": ["structural", "cancel"]}
+        result = evaluation_function("x+1", "(x**2-1)/(x-1)", params)
+        self.assertEqual(result["is_correct"], True)
+        self.assertEqual(result["level"], "cancel")
+        params = {"equivalence_stages": ["guess"]}
+        self.assertRaises(
+            Exception, evaluation_function, response, answer, params
+        )
+
+    def test_raced_stages(self):
+        params = {
+            "race_stages": ["sampling", "route", "simplify"],
+            "prescreen": False,
+            "return_timings": True,
+            "result_cache": False,
+        }
+        cases = [
+            ("sin(x)", "cos(x)", False, "sampling"),
+            ("sin(x)**2", "1-cos(x)**2", True, "route"),
+            ("cosh(x)**2", "1+sinh(x)**2", True, "simplify"),
+        ]
+        with mock.patch.object(equivalence, "RACING_MIN_CPUS", 1):
+            for response, answer, value, level in cases:
+                with self.subTest(response=response, answer=answer):
+                    result = evaluation_function(response, answer, params)
+                    self.assertEqual(result["is_correct"], value)
+                    self.assertEqual(result["level"], level)
+                    stages = result["timings"]["stages"]
+                    self.assertIn("equivalence_race", stages)
+                    self.assertNotIn("equivalence_simplify", stages)
+        with mock.patch.object(equivalence, "RACING_MIN_CPUS", 10**6):
+            result = evaluation_function("sin(x)", "cos(x)", params)
+            self.assertNotIn("equivalence_race", result["timings"]["stages"])
+            self.assertEqual(result["level"], "sampling")
+        params = {"race_stages": ["sampling", "guess"], "prescreen": False}
+        self.assertRaises(
+            Exception, evaluation_function, "sin(x)", "cos(x)", params
+        )
+
+    def test_identity_coefficient_multiple_of_prime(self):
+        params = {"prescreen": False, "result_cache": False}
+        for answer, response in [
+            ("exp(x) = y", "exp(x) = 1152921504606846883*y + y"),
+            ("exp(x)", "exp(x)*(1152921504606846883+1)"),
+        ]:
+            with self.subTest(response=response):
+                for _ in range(3):
+                    result = evaluation_function(response, answer, params)
+                    self.assertEqual(result["is_correct"], False)
+
+    def test_identity_error_probability(self):
+        response = "1/(exp(x)-1)"
+        answer = "(exp(x)+1)/(exp(2*x)-1)"
+        params = {"identity_error_probability": 1e-30}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], True)
+        self.assertEqual(result["level"], "identity")
+        # The error probability cannot be reached, so the identity
+        # test is not decisive
+        params = {"identity_error_probability": 0}
+        result = evaluation_function(response, answer, params)
+        self.assertEqual(result["is_correct"], True)
+        self.assertEqual(result["level"], "cancel")
+
+    def test_result_cache(self):
+        answer = "x**2 - 1"
+        params = {"strict_syntax": False, "time_budget_ms": 10000}
+        result = evaluation_function("(x-1)(x+1)", answer, params)
+        hits = result_cache.stats()["hits"]
+        params["time_budget_ms"] = 20000
+        cached = evaluation_function("  (x-1)(x+1) ", answer, params)
+        self.assertEqual(cached, result)
+        self.assertEqual(result_cache.stats()["hits"], hits + 1)
+        params["result_cache"] = False
+        uncached = evaluation_function("(x-1)(x+1)", answer, params)
+        self.assertEqual(uncached, result)
+        self.assertEqual(result_cache.stats()["hits"], hits + 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,378 @@
+"""
+Parser that builds SymPy expressions directly from response and answer
+strings instead of generating Python code and evaluating it like
+sympy.parsing.sympy_parser.parse_expr does.
+
+The parser accepts the same grammar as parse_expr configured with the
+transformations from sympy_parsing_transformations, i.e. numbers, names,
+function calls, the operators + - * / ** ^ and at most one = (converted
+to an Eq). If strict_syntax is False names are split into single
+characters and implicit multiplication is used.
+
+Input that the parser does not handle exactly like parse_expr (keywords,
+strings, brackets, comparisons, ...) raises UnsupportedExpression so that
+the caller can fall back to parse_expr.
+"""
+
+import builtins
+import keyword
+import operator
+import re
+import tokenize as python_tokenize
+import types
+from functools import lru_cache
+
+from sympy import Basic, Eq, Float, Function, Integer, Number, Symbol
+from sympy.assumptions.ask import AssumptionKeys
+
+
+class UnsupportedExpression(Exception):
+    """
+    Raised when an expression uses syntax that the parser does not support.
+    """
+
+
+@lru_cache(maxsize=1)
+def sympy_global_dict():
+    """
+    Returns the global namespace that parse_expr uses by default. It is
+    built once instead of on every call to parse_expr, callers that pass
+    it to parse_expr should pass a copy since eval adds to it.
+    """
+    global_dict = {}
+    exec("from sympy import *", global_dict)
+    for name, obj in vars(builtins).items():
+        if isinstance(obj, types.BuiltinFunctionType):
+            global_dict[name] = obj
+    global_dict["max"] = global_dict["Max"]
+    global_dict["min"] = global_dict["Min"]
+    return global_dict
+
+
+# Same number syntax as the Python tokenizer used by parse_expr
+_number_pattern = re.compile(python_tokenize.Number)
+_digits = "0123456789"
+_name_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_operators = ("**", "*", "/", "+", "-", "^", "(", ")", ",", "=")
+
+
+def tokenize(expr):
+    """
+    Input:
+        expr : string
+    Output:
+        List of tokens, each token is a pair (kind, text) where kind is
+        "number", "name" or "op".
+    """
+    tokens = []
+    index = 0
+    while index < len(expr):
+        character = expr[index]
+        if character in " \t":
+            index += 1
+        elif character in _digits or (
+            character == "."
+            and index + 1 < len(expr)
+            and expr[index + 1] in _digits
+        ):
+            text = _number_pattern.match(expr, index).group()
+            index += len(text)
+            # Imaginary, hexadecimal, octal and binary numbers, numbers
+            # with underscores and numbers directly followed by another
+            # number are left to parse_expr
+            if any(c in text for c in "jJxXoObB_"):
+                raise UnsupportedExpression(text)
+            following = expr[index : index + 1]
+            if following != "" and following in _digits + ".":
+                raise UnsupportedExpression(text + following)
+            tokens.append(("number", text))
+        elif character.isascii() and (character.isalpha() or character == "_"):
+            text = _name_pattern.match(expr, index).group()
+            index += len(text)
+            if keyword.iskeyword(text):
+                raise UnsupportedExpression(text)
+            tokens.append(("name", text))
+        else:
+            for op in _operators:
+                if expr.startswith(op, index):
+                    break
+            else:
+                raise UnsupportedExpression(character)
+            index += len(op)
+            # Python tokenizes //, == and augmented assignments as single
+            # operators, they are not part of the supported grammar
+            following = expr[index : index + 1]
+            if (following == "=" and op not in "(),") or (
+                op == "/" and following == "/"
+            ):
+                raise UnsupportedExpression(op + following)
+            tokens.append(("op", op))
+    return tokens
+
+
+def _is_callable(obj):
+    return callable(obj) and not isinstance(obj, Symbol)
+
+
+def _lookup(name, local_dict, global_dict):
+    if name in local_dict:
+        return local_dict[name]
+    obj = global_dict[name]
+    if not (isinstance(obj, Basic) or callable(obj)):
+        raise UnsupportedExpression(name)
+    return obj
+
+
+def _resolve_name(name, next_token, parsing_params, global_dict):
+    # Follows the auto_symbol and split_symbols_custom transformations
+    local_dict = parsing_params.get("symbol_dict", {})
+    strict_syntax = parsing_params.get("strict_syntax", False)
+    unsplittable_symbols = parsing_params.get("unsplittable_symbols", ())
+    if name in local_dict:
+        return [("name", local_dict[name])]
+    if name in global_dict:
+        obj = global_dict[name]
+        if isinstance(obj, (AssumptionKeys, Basic, type)) or callable(obj):
+            return [("name", obj)]
+    if strict_syntax or name in unsplittable_symbols:
+        if next_token == ("op", "(") and strict_syntax:
+            return [("function", Function(name))]
+        return [("value", Symbol(name))]
+    resolved = []
+    index = 0
+    while index < len(name):
+        character = name[index]
+        if character.isdigit():
+            end = index + 1
+            while end < len(name) and name[end].isdigit():
+                end += 1
+            resolved.append(("value", Number(name[index:end])))
+            index = end
+            continue
+        if character in local_dict or character in global_dict:
+            resolved.append(
+                ("name", _lookup(character, local_dict, global_dict))
+            )
+        else:
+            resolved.append(("value", Symbol(character)))
+        index += 1
+    return resolved
+
+
+def _ends_factor(token):
+    kind, value = token
+    return (
+        kind == "value"
+        or token == ("op", ")")
+        or (kind == "name" and not _is_callable(value))
+    )
+
+
+def _starts_factor(token):
+    return token[0] in ("value", "name") or token == ("op", "(")
+
+
+def resolve(tokens, parsing_params, global_dict):
+    """
+    Input:
+        tokens         : list of tokens created by tokenize
+        parsing_params : dictionary that contains parsing parameters
+        global_dict    : namespace used to look up names that are not
+                         in the symbol dictionary of parsing_params
+    Output:
+        List of tokens where numbers and names have been replaced by
+        ("value", expr) for numbers and symbols, ("name", obj) for objects
+        from the namespaces and ("function", f) for undefined functions.
+        If strict_syntax is False, multiplication operators are inserted
+        where implicit multiplication is used.
+    """
+    strict_syntax = parsing_params.get("strict_syntax", False)
+    resolved = []
+    for k, (kind, text) in enumerate(tokens):
+        if kind == "number":
+            if any(c in text for c in ".eE"):
+                resolved.append(("value", Float(text)))
+            else:
+                resolved.append(("value", Integer(int(text))))
+        elif kind == "name":
+            next_token = tokens[k + 1] if k + 1 < len(tokens) else None
+            resolved += _resolve_name(
+                text, next_token, parsing_params, global_dict
+            )
+        elif text == "^":
+            if strict_syntax:
+                raise UnsupportedExpression(text)
+            resolved.append(("op", "**"))
+        else:
+            resolved.append((kind, text))
+    if strict_syntax:
+        return resolved
+    multiplied = []
+    for token in resolved:
+        if (
+            len(multiplied) > 0
+            and _ends_factor(multiplied[-1])
+            and _starts_factor(token)
+        ):
+            multiplied.append(("op", "*"))
+        multiplied.append(token)
+    return multiplied
+
+
+class _Parser:
+    """
+    Precedence climbing parser for resolved tokens, the precedence and
+    associativity of the operators are the same as in Python.
+
+    The syntax tree consists of tuples, ("value", expr) for leaves,
+    ("call", f, [arguments]) for function calls, (op, operand) for the
+    unary operators "neg" and "pos" and (op, left, right) for the binary
+    operators "add", "sub", "mul", "div", "pow" and "eq".
+    """
+
+    binary_operators = {
+        "+": "add",
+        "-": "sub",
+        "*": "mul",
+        "/": "div",
+    }
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self):
+        if self.index < len(self.tokens):
+            return self.tokens[self.index]
+        return None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise UnsupportedExpression("unexpected end of expression")
+        self.index += 1
+        return token
+
+    def expect(self, op):
+        token = self.take()
+        if token != ("op", op):
+            raise UnsupportedExpression(f"expected `{op}`")
+
+    def equation(self):
+        left = self.sum()
+        if self.peek() == ("op", "="):
+            self.take()
+            left = ("eq", left, self.sum())
+        if self.peek() is not None:
+            raise UnsupportedExpression("unexpected token")
+        return left
+
+    def sum(self):
+        left = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op = self.binary_operators[self.take()[1]]
+            left = (op, left, self.term())
+        return left
+
+    def term(self):
+        left = self.factor()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            op = self.binary_operators[self.take()[1]]
+            left = (op, left, self.factor())
+        return left
+
+    def factor(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return ("neg", self.factor())
+        if self.peek() == ("op", "+"):
+            self.take()
+            return ("pos", self.factor())
+        return self.power()
+
+    def power(self):
+        base = self.primary()
+        if self.peek() == ("op", "**"):
+            self.take()
+            return ("pow", base, self.factor())
+        return base
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "value":
+            return ("value", value)
+        if (kind, value) == ("op", "("):
+            inner = self.sum()
+            self.expect(")")
+            return inner
+        if kind == "function" or (kind == "name" and _is_callable(value)):
+            self.expect("(")
+            arguments = []
+            if self.peek() != ("op", ")"):
+                arguments.append(self.sum())
+                while self.peek() == ("op", ","):
+                    self.take()
+                    arguments.append(self.sum())
+            self.expect(")")
+            return ("call", value, arguments)
+        if kind == "name":
+            return ("value", value)
+        raise UnsupportedExpression("unexpected token")
+
+
+_unary_operators = {"neg": operator.neg, "pos": operator.pos}
+_binary_operators = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mul": operator.mul,
+    "div": operator.truediv,
+    "pow": operator.pow,
+    "eq": Eq,
+}
+
+
+def parse_tree(expr, parsing_params):
+    """
+    Input:
+        expr           : string to be parsed
+        parsing_params : dictionary that contains parsing parameters
+    Output:
+        Syntax tree for expr, see _Parser for a description of the nodes.
+    """
+    global_dict = sympy_global_dict()
+    tokens = resolve(tokenize(expr), parsing_params, global_dict)
+    return _Parser(tokens).equation()
+
+
+def tree_to_sympy(node):
+    """
+    Input:
+        node : syntax tree created by parse_tree
+    Output:
+        SymPy expression for the syntax tree
+    """
+    kind = node[0]
+    if kind == "value":
+        return node[1]
+    if kind == "call":
+        return node[1](*[tree_to_sympy(x) for x in node[2]])
+    if kind in _unary_operators:
+        return _unary_operators[kind](tree_to_sympy(node[1]))
+    return _binary_operators[kind](
+        tree_to_sympy(node[1]), tree_to_sympy(node[2])
+    )
+
+
+def parse_native(expr, parsing_params):
+    """
+    Input:
+        expr           : string to be parsed into a sympy expression
+        parsing_params : dictionary that contains parsing parameters
+    Output:
+        sympy expression created by parsing expr, the same expression as
+        parse_expression would create using parse_expr.
+    Remark:
+        Raises UnsupportedExpression if expr uses syntax that the parser
+        does not support.
+    """
+    return tree_to_sympy(parse_tree(expr, parsing_params))
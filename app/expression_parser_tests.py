@@ -0,0 +1,172 @@
+import unittest
+from unittest import mock
+
+from sympy import Eq, Function, Integer, Symbol, sin
+from sympy.parsing.sympy_parser import T as parser_transformations
+
+try:
+    from . import evaluation_tests
+    from .expression_parser import (
+        UnsupportedExpression,
+        parse_native,
+        tokenize,
+    )
+    from .expression_utilities import (
+        create_sympy_parsing_params,
+        parse_expression,
+    )
+except ImportError:
+    import evaluation_tests
+    from expression_parser import (
+        UnsupportedExpression,
+        parse_native,
+        tokenize,
+    )
+    from expression_utilities import (
+        create_sympy_parsing_params,
+        parse_expression,
+    )
+
+x = Symbol("x")
+y = Symbol("y")
+
+# Expressions taken from the evaluation function tests
+corpus = [
+    "2*x**2 = 10*y**2+20",
+    "x**2 - 5*y**2 - 10 = 0",
+    "cos(x)**2 + sin(x)**2 + y",
+    "1/(x+1)",
+    "(x+1)*(x-1)",
+    "x**2-1",
+    "sqrt(5)",
+    "1.0+ 2.0*x + 3.0*x**2",
+    "pi*x/(3*y)",
+    "exp(x)*exp(y)",
+    "log(x*y)",
+    "-0.4*x/(y - 3) + 1.2/(y - 3)",
+    "Abs(x-1)",
+    "plus_minus x",
+    "x plus_minus y",
+    "2x^2 + 3xy",
+    "(x+1)(x-1)",
+    "sin(x)cos(x)",
+    "2(x+y)",
+    "xy = yx",
+    "a+b2c",
+    "E^x + I*x",
+    "gamma(x) + beta",
+    "-x**-2",
+    "2^-x^2",
+    "0.5e-3x + .25",
+]
+
+
+def parsing_params(strict_syntax, **params):
+    params = {
+        "strict_syntax": strict_syntax,
+        "symbols": [["plus_minus", []]],
+        **params,
+    }
+    parsing_params = create_sympy_parsing_params(params)
+    parsing_params["extra_transformations"] = parser_transformations[9]
+    return parsing_params
+
+
+class TestExpressionParser(unittest.TestCase):
+    """
+    TestCase Class used to test the native expression parser.
+    """
+
+    def assertSameAsParseExpr(self, expr, parsing_params):
+        try:
+            expected = parse_expression(expr, parsing_params)
+        except Exception:
+            return
+        try:
+            parsed = parse_native(expr, parsing_params)
+        except UnsupportedExpression:
+            return
+        self.assertEqual(parsed, expected, msg=expr)
+        self.assertEqual(type(parsed), type(expected), msg=expr)
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("2x^2 +0.5*y2"),
+            [
+                ("number", "2"),
+                ("name", "x"),
+                ("op", "^"),
+                ("number", "2"),
+                ("op", "+"),
+                ("number", "0.5"),
+                ("op", "*"),
+                ("name", "y2"),
+            ],
+        )
+
+    def test_strict_syntax(self):
+        params = parsing_params(True)
+        self.assertEqual(parse_native("2*x**2", params), 2 * x**2)
+        self.assertEqual(parse_native("sin(x)", params), sin(x))
+        self.assertEqual(parse_native("f(x)", params), Function("f")(x))
+        self.assertEqual(parse_native("xy", params), Symbol("xy"))
+        self.assertEqual(parse_native("-x**2", params), -(x**2))
+        self.assertEqual(parse_native("x = 1", params), Eq(x, 1))
+        for expr in ["x^2", "2x", "x(y)(x)", "x == y", "[x]", "x//y"]:
+            with self.assertRaises(UnsupportedExpression, msg=expr):
+                parse_native(expr, params)
+
+    def test_relaxed_syntax(self):
+        params = parsing_params(False)
+        self.assertEqual(parse_native("2x^2", params), 2 * x**2)
+        self.assertEqual(parse_native("xy", params), x * y)
+        self.assertEqual(parse_native("x(y+1)", params), x * (y + 1))
+        self.assertEqual(parse_native("sin(x)y", params), sin(x) * y)
+        self.assertEqual(parse_native("x12", params), 12 * x)
+        self.assertEqual(
+            parse_native("x plus_minus y", params),
+            x * Symbol("plus_minus") * y,
+        )
+        self.assertEqual(parse_native("2 = xy", params), Eq(Integer(2), x * y))
+
+    def test_parse_expression_falls_back_to_parse_expr(self):
+        params = parsing_params(True, parser="native")
+        self.assertEqual(parse_expression("x if 1 else y", params), x)
+        self.assertEqual(parse_expression("2*x**2", params), 2 * x**2)
+
+    def test_same_as_parse_expr(self):
+        for strict_syntax in [True, False]:
+            for special in [True, False]:
+                params = parsing_params(
+                    strict_syntax,
+                    specialFunctions=special,
+                    complexNumbers=special,
+                )
+                for expr in corpus:
+                    self.assertSameAsParseExpr(expr, params)
+
+
+class TestEvaluationFunctionWithNativeParser(
+    evaluation_tests.TestEvaluationFunction
+):
+    """
+    Runs the evaluation function tests with the native parser to check
+    that it gives the same results as parse_expr.
+    """
+
+    def setUp(self):
+        evaluation_function = evaluation_tests.evaluation_function
+
+        def native_evaluation_function(response, answer, params):
+            params = {**params, "parser": "native"}
+            return evaluation_function(response, answer, params)
+
+        patcher = mock.patch.object(
+            evaluation_tests, "evaluation_function", native_evaluation_function
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,7 @@
+import re
+from functools import lru_cache
+
+
 # -------- String Manipulation Utilities
 def preprocess_expression(exprs, params):
     """
@@ -13,6 +17,25 @@ def preprocess_expression(exprs, params):
     if isinstance(exprs, str):
         exprs = [exprs]
 
+    substitutions = input_symbol_substitutions(params)
+    if len(substitutions) > 0:
+        for k in range(0, len(exprs)):
+            exprs[k] = substitute(exprs[k], substitutions)
+
+    return exprs
+
+
+def input_symbol_substitutions(params):
+    """
+    Input:
+        params : Evaluation function parameter dictionary
+    Output:
+        List of pairs of strings, the left element is an input symbol code or one of
+        its alternatives and the right element is the corresponding input symbol code.
+    Remark:
+        The list is sorted so that longer alternatives takes precedence, see substitute.
+    """
+    substitutions = []
     if "symbols" in params.keys():
         input_symbols = params["symbols"]
         input_symbols_to_remove = []
@@ -32,7 +55,6 @@ def preprocess_expression(exprs, params):
             del input_symbols[k][1][i]
         for k in input_symbols_to_remove:
             del input_symbols[k]
-        substitutions = []
         for input_symbol in params["symbols"]:
             substitutions.append((input_symbol[0], input_symbol[0]))
             for alternative in input_symbol[1]:
@@ -40,10 +62,7 @@ def preprocess_expression(exprs, params):
                     substitutions.append((alternative, input_symbol[0]))
         substitutions.sort(key=lambda x: -len(x[0]))
 
-        for k in range(0, len(exprs)):
-            exprs[k] = substitute(exprs[k], substitutions)
-
-    return exprs
+    return substitutions
 
 
 def substitute(string, substitutions):
@@ -62,40 +81,24 @@ def substitute(string, substitutions):
         Examples:
             substitute("abc bc c", [("abc","p"), ("bc","q"), ("c","r")])
             returns: "p q r"
-            substitute("abc bc c", [("c","r"), ("bc","q"), ("abc","p")])
-            returns: "abr br r"
+            substitute("abcab", [("ab","p"), ("abc","q")])
+            returns: "pcp"
+            substitute("abcab", [("abc","q"), ("ab","p")])
+            returns: "qp"
             substitute("p bc c", [("p","abc"), ("bc","q"), ("c","r")])
-            returns: "abc q c"
-            substitute("p bc c", [("c","r"), ("bc","q"), ("p","abc")])
-            returns: "abc br r"
+            returns: "abc q r"
     """
     if isinstance(string, str):
         string = [string]
 
     # Perform substitutions
+    matcher = substitution_matcher(tuple(tuple(x) for x in substitutions))
     new_string = []
     for part in string:
         if not isinstance(part, str):
             new_string.append(part)
         else:
-            index = 0
-            string_buffer = ""
-            while index < len(part):
-                matched_start = False
-                for k, pair in enumerate(substitutions):
-                    if part.startswith(pair[0], index):
-                        matched_start = True
-                        if len(string_buffer) > 0:
-                            new_string.append(string_buffer)
-                            string_buffer = ""
-                        new_string.append(k)
-                        index += len(pair[0])
-                        break
-                if not matched_start:
-                    string_buffer += part[index]
-                    index += 1
-            if len(string_buffer) > 0:
-                new_string.append(string_buffer)
+            new_string += matcher.split(part)
 
     for k, elem in enumerate(new_string):
         if isinstance(elem, int):
@@ -104,12 +107,259 @@ def substitute(string, substitutions):
     return "".join(new_string)
 
 
+class SubstitutionMatcher:
+    """
+    Trie of the left elements of a list of substitutions, used by substitute
+    to find which substitution to make at each position of a string in time
+    proportional to the length of the longest match instead of the number
+    of substitutions.
+    """
+
+    def __init__(self, substitutions):
+        self.substitutions = substitutions
+        self._trie = {}
+        for k, pair in enumerate(substitutions):
+            if len(pair[0]) == 0:
+                continue
+            node = self._trie
+            for character in pair[0]:
+                node = node.setdefault(character, {})
+            # None marks the end of a left element, if the same left
+            # element occurs more than once the first occurence is used
+            node.setdefault(None, k)
+
+    def match(self, string, index):
+        """
+        Input:
+            string : a string
+            index  : position in string
+        Output:
+            Index of the first substitution (in the input order) whose left
+            element occurs in string at the given position, None if there
+            is no such substitution.
+        """
+        node = self._trie
+        matched = None
+        while index < len(string):
+            node = node.get(string[index], None)
+            if node is None:
+                break
+            index += 1
+            k = node.get(None, None)
+            if k is not None and (matched is None or k < matched):
+                matched = k
+        return matched
+
+    def split(self, string):
+        """
+        Input:
+            string : a string
+        Output:
+            List where each substring that should be substituted has been
+            replaced by the index of the substitution, the remaining parts
+            of the string are kept as strings.
+        """
+        parts = []
+        start = 0
+        index = 0
+        while index < len(string):
+            k = self.match(string, index)
+            if k is None:
+                index += 1
+                continue
+            if index > start:
+                parts.append(string[start:index])
+            parts.append(k)
+            index += len(self.substitutions[k][0])
+            start = index
+        if len(string) > start:
+            parts.append(string[start:])
+        return parts
+
+
+@lru_cache(maxsize=256)
+def substitution_matcher(substitutions):
+    """
+    Input:
+        substitutions : a tuple of pairs of strings
+    Output:
+        SubstitutionMatcher for substitutions, matchers are cached so that
+        each one is only built once per set of substitutions.
+    """
+    return SubstitutionMatcher(substitutions)
+
+
+def _is_operand_character(character):
+    return character.isalnum() or character in "()[]{}"
+
+
+def convert_absolute_notation(string):
+    """
+    Input:
+        string : string that may use |.| for absolute values
+    Output:
+        Pair (converted string, ambiguous bars). In the converted string
+        every | is replaced by Abs( or ). Ambiguous bars is a list of
+        pairs (position, "start" or "end") with the position of each bar
+        that could open or close an absolute value and how it was
+        interpreted.
+    Remark:
+        A bar opens an absolute value if it is the first character or
+        only the character after it is part of an operand, and closes one
+        if it is the last character or only the character before it is
+        part of an operand. Any other bar is ambiguous: it opens an
+        absolute value if the previous bar closed one (or if there is no
+        previous bar) and closes one if the previous bar opened one. A run
+        of ambiguous bars alternately opens and closes absolute values.
+        The string is only traversed once.
+    """
+    bars = [index for (index, c) in enumerate(string) if c == "|"]
+    if len(bars) == 0:
+        return string, []
+    if len(bars) == 2:
+        start, end = bars
+        return (
+            string[:start]
+            + "Abs("
+            + string[start + 1 : end]
+            + ")"
+            + string[end + 1 :],
+            [],
+        )
+    parts = []
+    ambiguous = []
+    previous_kind = None
+    ambiguous_runs = 0
+    last = len(string) - 1
+    copied = 0
+    for index in bars:
+        if index == last:
+            kind = "end"
+        elif index == 0:
+            kind = "start"
+        else:
+            before = _is_operand_character(string[index - 1])
+            after = _is_operand_character(string[index + 1])
+            if before and not after:
+                kind = "end"
+            elif after and not before:
+                kind = "start"
+            else:
+                kind = "ambiguous"
+        resolution = kind
+        if kind == "ambiguous":
+            if previous_kind in (None, "end"):
+                resolution = "start"
+            elif previous_kind == "ambiguous":
+                resolution = "start" if ambiguous_runs % 2 == 0 else "end"
+                ambiguous_runs += 1
+            else:
+                resolution = "end"
+            ambiguous.append((index, resolution))
+        previous_kind = kind
+        parts.append(string[copied:index])
+        if resolution == "end":
+            parts.append(")")
+        elif kind == "ambiguous" and string[index - 1].isalnum():
+            parts.append("*Abs(")
+        else:
+            parts.append("Abs(")
+        copied = index + 1
+    parts.append(string[copied:])
+    return "".join(parts), ambiguous
+
+
 # -------- (Sympy) Expression Parsing Utilities
 
 from sympy import Symbol
 from sympy.parsing.sympy_parser import T as parser_transformations
 from sympy.parsing.sympy_parser import parse_expr, split_symbols_custom
 
+try:
+    from .expression_parser import parse_native, parse_tree, sympy_global_dict
+except ImportError:
+    from expression_parser import parse_native, parse_tree, sympy_global_dict
+
+
+# A symbol assumption is a pair of quoted strings, e.g. ('x','positive')
+_SYMBOL_ASSUMPTION = re.compile(
+    r"""\(\s*(['"])([^'"]+)\1\s*,\s*(['"])([^'"]*)\3\s*\)"""
+)
+_SYMBOL_ASSUMPTION_SEPARATOR = re.compile(r"[\s,;\[\]]*")
+
+# Assumptions SymPy defines for symbols, Symbol accepts any keyword so
+# unknown assumptions have to be rejected before the Symbol is created
+SYMBOL_ASSUMPTIONS = frozenset(
+    [
+        "algebraic",
+        "antihermitian",
+        "commutative",
+        "complex",
+        "composite",
+        "even",
+        "extended_negative",
+        "extended_nonnegative",
+        "extended_nonpositive",
+        "extended_nonzero",
+        "extended_positive",
+        "extended_real",
+        "finite",
+        "hermitian",
+        "imaginary",
+        "infinite",
+        "integer",
+        "irrational",
+        "negative",
+        "noninteger",
+        "nonnegative",
+        "nonpositive",
+        "nonzero",
+        "odd",
+        "polar",
+        "positive",
+        "prime",
+        "rational",
+        "real",
+        "transcendental",
+        "zero",
+    ]
+)
+
+
+@lru_cache(maxsize=256)
+def parse_symbol_assumptions(string):
+    """
+    Input:
+        string : symbol assumptions, i.e. pairs of a symbol name and a
+                 SymPy assumption, e.g. "('x','positive') ('n','integer')"
+    Output:
+        Tuple of pairs (name, Symbol with the assumption)
+    Remark:
+        Raises an Exception if the string is not a list of such pairs or
+        if an assumption is not known to SymPy.
+    """
+    if not isinstance(string, str):
+        raise Exception("List of symbol assumptions not written correctly.")
+    symbols = []
+    index = 0
+    while True:
+        index = _SYMBOL_ASSUMPTION_SEPARATOR.match(string, index).end()
+        if index == len(string):
+            break
+        match = _SYMBOL_ASSUMPTION.match(string, index)
+        if match is None:
+            raise Exception(
+                "List of symbol assumptions not written correctly."
+            )
+        name, assumption = match.group(2), match.group(4)
+        if assumption not in SYMBOL_ASSUMPTIONS:
+            raise Exception(
+                f"Assumption {assumption} for symbol {name} caused a problem."
+            )
+        symbols.append((name, Symbol(name, **{assumption: True})))
+        index = match.end()
+    return tuple(symbols)
+
 
 def create_sympy_parsing_params(params, unsplittable_symbols=tuple()):
     """
@@ -167,28 +417,23 @@ def create_sympy_parsing_params(params, unsplittable_symbols=tuple()):
         "strict_syntax": strict_syntax,
         "symbol_dict": symbol_dict,
         "extra_transformations": tuple(),
+        "parser": params.get("parser", "sympy"),
     }
 
     return parsing_params
 
 
-def parse_expression(expr, parsing_params):
+def sympy_parsing_transformations(parsing_params):
     """
     Input:
-        expr           : string to be parsed into a sympy expression
         parsing_params : dictionary that contains parsing parameters
     Output:
-        sympy expression created by parsing expr configured according
+        tuple of sympy parser transformations configured according
         to the parameters in parsing_params
     """
     strict_syntax = parsing_params.get("strict_syntax", False)
     extra_transformations = parsing_params.get("extra_transformations", ())
     unsplittable_symbols = parsing_params.get("unsplittable_symbols", ())
-    symbol_dict = parsing_params.get("symbol_dict", {})
-    separate_unsplittable_symbols = [
-        (x, x + " ") for x in unsplittable_symbols
-    ]
-    expr = substitute(expr, separate_unsplittable_symbols)
     if strict_syntax:
         transformations = parser_transformations[0:4] + extra_transformations
     else:
@@ -206,6 +451,62 @@ def parse_expression(expr, parsing_params):
             + (split_symbols_custom(lambda x: x not in unsplittable_symbols),)
             + parser_transformations[8]
         )
+    return transformations
+
+
+def _separate_unsplittable_symbols(expr, parsing_params):
+    unsplittable_symbols = parsing_params.get("unsplittable_symbols", ())
+    separate_unsplittable_symbols = [
+        (x, x + " ") for x in unsplittable_symbols
+    ]
+    return substitute(expr, separate_unsplittable_symbols)
+
+
+def parse_expression_tree(expr, parsing_params):
+    """
+    Input:
+        expr           : string to be parsed
+        parsing_params : dictionary that contains parsing parameters
+    Output:
+        Syntax tree for expr created by parse_tree, with the same handling
+        of unsplittable symbols as parse_expression.
+    Remark:
+        Raises UnsupportedExpression if expr uses syntax that the native
+        parser does not support.
+    """
+    return parse_tree(
+        _separate_unsplittable_symbols(expr, parsing_params), parsing_params
+    )
+
+
+def parse_expression(expr, parsing_params):
+    """
+    Input:
+        expr           : string to be parsed into a sympy expression
+        parsing_params : dictionary that contains parsing parameters
+    Output:
+        sympy expression created by parsing expr configured according
+        to the parameters in parsing_params
+    Remark:
+        If parsing_params contains precomputed transformations they are
+        used instead of creating new ones from the parsing parameters.
+        If parsing_params["parser"] is "native" the expression is parsed
+        with parse_native, expressions that parse_native does not support
+        (or fails to parse) are parsed with parse_expr instead.
+    """
+    symbol_dict = parsing_params.get("symbol_dict", {})
+    expr = _separate_unsplittable_symbols(expr, parsing_params)
+    if parsing_params.get("parser", "sympy") == "native":
+        try:
+            return parse_native(expr, parsing_params)
+        except Exception:
+            pass
+    transformations = parsing_params.get("transformations", None)
+    if transformations is None:
+        transformations = sympy_parsing_transformations(parsing_params)
     return parse_expr(
-        expr, transformations=transformations, local_dict=symbol_dict
+        expr,
+        transformations=transformations,
+        local_dict=symbol_dict,
+        global_dict=dict(sympy_global_dict()),
     )
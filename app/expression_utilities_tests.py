@@ -0,0 +1,134 @@
+import unittest
+
+try:
+    from .expression_utilities import (
+        SYMBOL_ASSUMPTIONS,
+        SubstitutionMatcher,
+        convert_absolute_notation,
+        parse_symbol_assumptions,
+        substitute,
+        substitution_matcher,
+    )
+except ImportError:
+    from expression_utilities import (
+        SYMBOL_ASSUMPTIONS,
+        SubstitutionMatcher,
+        convert_absolute_notation,
+        parse_symbol_assumptions,
+        substitute,
+        substitution_matcher,
+    )
+
+
+class TestSubstitute(unittest.TestCase):
+    """
+    TestCase Class used to test the string substitution utilities.
+    """
+
+    def test_substitutions_in_input_order(self):
+        substitutions = [("abc", "p"), ("bc", "q"), ("c", "r")]
+        self.assertEqual(substitute("abc bc c", substitutions), "p q r")
+        substitutions = [("ab", "p"), ("abc", "q")]
+        self.assertEqual(substitute("abcab", substitutions), "pcp")
+        substitutions = [("abc", "q"), ("ab", "p")]
+        self.assertEqual(substitute("abcab", substitutions), "qp")
+
+    def test_substituted_text_is_not_rescanned(self):
+        substitutions = [("p", "abc"), ("bc", "q"), ("c", "r")]
+        self.assertEqual(substitute("p bc c", substitutions), "abc q r")
+        substitutions = [("alpha", "alpha"), ("a", "alpha")]
+        self.assertEqual(substitute("a*alpha", substitutions), "alpha*alpha")
+
+    def test_list_input(self):
+        substitutions = [("x", "y")]
+        self.assertEqual(substitute(["x+", 0, "x"], substitutions), "y+yy")
+
+    def test_empty_left_elements_are_ignored(self):
+        self.assertEqual(substitute("ab", [("", "x"), ("b", "c")]), "ac")
+
+    def test_matcher(self):
+        matcher = SubstitutionMatcher((("ab", "p"), ("abc", "q"), ("b", "r")))
+        self.assertEqual(matcher.match("xabc", 1), 0)
+        self.assertEqual(matcher.match("xabc", 2), 2)
+        self.assertIsNone(matcher.match("xabc", 0))
+        self.assertEqual(matcher.split("xabcb"), ["x", 0, "c", 2])
+
+    def test_matchers_are_cached(self):
+        substitutions = (("ab", "p"), ("b", "r"))
+        self.assertIs(
+            substitution_matcher(substitutions),
+            substitution_matcher(substitutions),
+        )
+
+
+class TestAbsoluteNotation(unittest.TestCase):
+    """
+    TestCase Class used to test the conversion of |.| to Abs(.).
+    """
+
+    def test_unambiguous_bars(self):
+        self.assertEqual(convert_absolute_notation("x+y"), ("x+y", []))
+        self.assertEqual(convert_absolute_notation("|x|+y"), ("Abs(x)+y", []))
+        self.assertEqual(
+            convert_absolute_notation("|x+|y||"), ("Abs(x+Abs(y))", [])
+        )
+
+    def test_ambiguous_bars(self):
+        self.assertEqual(
+            convert_absolute_notation("a|x|+|y|"),
+            ("a*Abs(x)+Abs(y)", [(1, "start")]),
+        )
+        self.assertEqual(
+            convert_absolute_notation("|a+b|c+d|e+f|"),
+            ("Abs(a+b)c+d*Abs(e+f)", [(4, "end"), (8, "start")]),
+        )
+
+    def test_many_bars(self):
+        string = "+".join(["|x|"] * 2000)
+        converted, ambiguous = convert_absolute_notation(string)
+        self.assertEqual(converted, "+".join(["Abs(x)"] * 2000))
+        self.assertEqual(ambiguous, [])
+
+
+class TestSymbolAssumptions(unittest.TestCase):
+    """
+    TestCase Class used to test the parsing of symbol assumptions.
+    """
+
+    def test_parse_symbol_assumptions(self):
+        symbols = dict(parse_symbol_assumptions("('x','positive')"))
+        self.assertEqual(list(symbols.keys()), ["x"])
+        self.assertTrue(symbols["x"].is_positive)
+        symbols = dict(
+            parse_symbol_assumptions("[('n', \"integer\"), ('v','real')]")
+        )
+        self.assertTrue(symbols["n"].is_integer)
+        self.assertTrue(symbols["v"].is_real)
+        self.assertEqual(parse_symbol_assumptions(""), ())
+
+    def test_known_symbol_assumptions(self):
+        for assumption in sorted(SYMBOL_ASSUMPTIONS):
+            with self.subTest(assumption=assumption):
+                string = f"('x','{assumption}')"
+                ((name, symbol),) = parse_symbol_assumptions(string)
+                self.assertIs(getattr(symbol, f"is_{assumption}"), True)
+
+    def test_invalid_symbol_assumptions(self):
+        invalid = [
+            "('x','positive'",
+            "('x', positive)",
+            "('x','positive') + 1",
+            "(__import__('os').getcwd(),'real')",
+        ]
+        for string in invalid:
+            with self.subTest(string=string):
+                self.assertRaises(Exception, parse_symbol_assumptions, string)
+        with self.assertRaises(Exception) as cm:
+            parse_symbol_assumptions("('x','big')")
+        self.assertEqual(
+            str(cm.exception), "Assumption big for symbol x caused a problem."
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,286 @@
+"""
+Probabilistic identity test of SymPy expressions by exact evaluation at
+random points of a finite field (Schwartz-Zippel lemma).
+
+Both expressions are evaluated modulo a random large prime at random
+points.
+Symbols are the variables of the field, and every subexpression that is
+not built from sums, products and powers (functions, constants such as pi,
+floats) is treated as an independent variable as well. Powers with a
+symbolic or fractional exponent are written as integer powers of such
+variables, e.g. exp(2*x + y) = exp(x)**2 * exp(y) and x**(3/2) = sqrt(x)**3.
+
+If the expressions are equal as rational functions of these variables they
+have the same value at every point where they are defined. Otherwise they
+have the same value at a random point with probability at most
+degree/prime, so a few points decide the comparison with a negligible,
+configurable, error probability. The prime is drawn at random for every
+test, a fixed prime could divide a coefficient of the difference of the
+expressions, which then vanishes and different expressions would be
+considered equal for every choice of the points.
+
+Expressions that are only equal because of relations between the variables
+(e.g. sin(x)**2 + cos(x)**2 = 1) cannot be recognised as equal, they are
+left to the symbolic comparisons. Different values only show that the
+expressions are different if all variables are symbols, i.e. if both
+expressions are rational functions with rational coefficients.
+"""
+
+import math
+import random
+
+from sympy import Add, S, exp, isprime
+
+# Range of the primes that are drawn for each test, see random_prime
+PRIME_RANGE = (2**61, 2**62)
+
+DEFAULT_ERROR_PROBABILITY = 1e-12
+
+# Largest number of points where an expression is not defined (e.g.
+# because a denominator is zero) before the test gives up
+MAX_UNDEFINED_POINTS = 3
+
+_UNSUPPORTED = (S.Infinity, S.NegativeInfinity, S.ComplexInfinity, S.NaN)
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class _Undefined(ArithmeticError):
+    pass
+
+
+class _Translation:
+    # Translates SymPy expressions into trees of tuples
+    #   ("number", p, q), ("variable", key), ("add", children),
+    #   ("mul", children), ("pow", child, integer exponent)
+    # Equal subexpressions are translated to the same node.
+
+    def __init__(self):
+        self.nodes = {}
+        self.only_symbols = True
+
+    def variable(self, key):
+        if not getattr(key, "is_Symbol", False):
+            self.only_symbols = False
+        return ("variable", key)
+
+    def power(self, base, exponent):
+        factors = []
+        for term in Add.make_args(exponent):
+            coefficient, rest = term.as_coeff_Mul()
+            if not coefficient.is_Rational:
+                factors.append(self.variable((base, term, 1)))
+            elif rest == 1 and coefficient.q == 1:
+                factors.append(("pow", self.node(base), coefficient.p))
+            else:
+                # base**(p*rest/q) = (base**(rest/q))**p
+                variable = self.variable((base, rest, coefficient.q))
+                factors.append(("pow", variable, coefficient.p))
+        if len(factors) == 1:
+            return factors[0]
+        return ("mul", tuple(factors))
+
+    def node(self, expr):
+        if expr in self.nodes:
+            return self.nodes[expr]
+        if expr in _UNSUPPORTED:
+            raise _Unsupported()
+        if expr.is_Rational:
+            node = ("number", expr.p, expr.q)
+        elif expr.is_Symbol:
+            node = self.variable(expr)
+        elif expr.is_Add:
+            node = ("add", tuple(self.node(arg) for arg in expr.args))
+        elif expr.is_Mul:
+            node = ("mul", tuple(self.node(arg) for arg in expr.args))
+        elif expr is S.Exp1:
+            node = self.variable((S.Exp1, S.One, 1))
+        elif expr.is_Pow or isinstance(expr, exp):
+            node = self.power(*expr.as_base_exp())
+        else:
+            node = self.variable(expr)
+        self.nodes[expr] = node
+        return node
+
+
+def _degree(node, degrees):
+    # Bounds for the degrees of the numerator and denominator of the
+    # rational function represented by the node
+    if id(node) in degrees:
+        return degrees[id(node)]
+    kind = node[0]
+    if kind == "number":
+        degree = (0, 0)
+    elif kind == "variable":
+        degree = (1, 0)
+    elif kind == "pow":
+        numerator, denominator = _degree(node[1], degrees)
+        if node[2] < 0:
+            numerator, denominator = denominator, numerator
+        degree = (abs(node[2]) * numerator, abs(node[2]) * denominator)
+    else:
+        children = [_degree(child, degrees) for child in node[1]]
+        denominator = sum(d for (n, d) in children)
+        if kind == "add":
+            numerator = max(n for (n, d) in children) + denominator
+        else:
+            numerator = sum(n for (n, d) in children)
+        degree = (numerator, denominator)
+    degrees[id(node)] = degree
+    return degree
+
+
+def _evaluate(node, prime, point, rng, values):
+    if id(node) in values:
+        return values[id(node)]
+    kind = node[0]
+    if kind == "number":
+        if node[2] % prime == 0:
+            raise _Undefined()
+        value = node[1] * pow(node[2], -1, prime) % prime
+    elif kind == "variable":
+        if node[1] not in point:
+            point[node[1]] = rng.randrange(1, prime)
+        value = point[node[1]]
+    elif kind == "pow":
+        value = _evaluate(node[1], prime, point, rng, values)
+        exponent = node[2]
+        if exponent < 0:
+            if value == 0:
+                raise _Undefined()
+            value = pow(value, -1, prime)
+            exponent = -exponent
+        value = pow(value, exponent, prime)
+    else:
+        children = [
+            _evaluate(child, prime, point, rng, values) for child in node[1]
+        ]
+        if kind == "add":
+            value = sum(children) % prime
+        else:
+            value = 1
+            for child in children:
+                value = value * child % prime
+    values[id(node)] = value
+    return value
+
+
+def random_prime(rng):
+    """
+    Returns a prime drawn uniformly at random from PRIME_RANGE.
+    """
+    while True:
+        candidate = rng.randrange(*PRIME_RANGE) | 1
+        if isprime(candidate):
+            return candidate
+
+
+def required_points(degree, error_probability, prime=PRIME_RANGE[0]):
+    """
+    Input:
+        degree            : bound for the degree of the numerator of the
+                            difference of the compared expressions
+        error_probability : largest accepted probability that different
+                            expressions are considered equal
+        prime             : size of the field
+    Output:
+        Number of random points needed, None if the degree is so large
+        that the error probability cannot be reached.
+    """
+    if degree == 0:
+        return 1
+    if degree >= prime or error_probability <= 0:
+        return None
+    return max(
+        1, math.ceil(math.log(error_probability) / math.log(degree / prime))
+    )
+
+
+def _compare(res, ans, error_probability, rng, proportional):
+    if rng is None:
+        rng = random.Random()
+    translation = _Translation()
+    try:
+        res_node = translation.node(res)
+        ans_node = translation.node(ans)
+    except _Unsupported:
+        return None
+    degrees = {}
+    res_degree = _degree(res_node, degrees)
+    ans_degree = _degree(ans_node, degrees)
+    degree = max(res_degree[0] + ans_degree[1], ans_degree[0] + res_degree[1])
+    points = required_points(degree, error_probability)
+    if points is None:
+        return None
+    prime = random_prime(rng)
+    # For proportionality the ratio is taken from the first point and
+    # the other points check that res = ratio * ans
+    ratio = None if proportional else 1
+    undefined = 0
+    while points > 0:
+        point = {}
+        values = {}
+        try:
+            res_value = _evaluate(res_node, prime, point, rng, values)
+            ans_value = _evaluate(ans_node, prime, point, rng, values)
+            if ratio is None:
+                if ans_value == 0:
+                    raise _Undefined()
+                ratio = res_value * pow(ans_value, -1, prime) % prime
+                continue
+        except _Undefined:
+            undefined += 1
+            if undefined > MAX_UNDEFINED_POINTS:
+                return None
+            continue
+        if res_value != ratio * ans_value % prime:
+            if translation.only_symbols:
+                return False
+            return None
+        points -= 1
+    return True
+
+
+def identity_test(
+    res, ans, error_probability=DEFAULT_ERROR_PROBABILITY, rng=None
+):
+    """
+    Input:
+        res, ans          : SymPy expressions
+        error_probability : largest accepted probability that different
+                            expressions are considered equal
+        rng               : random.Random used to draw the prime and the
+                            points, if None a new unseeded one is used.
+                            Seeding it (e.g. from the compared expressions)
+                            makes the result reproducible.
+    Output:
+        True if res and ans are equal (with probability at least
+        1 - error_probability), False if they are different and None if
+        the test was not decisive.
+    Remark:
+        False is only returned when it is certain, i.e. when both
+        expressions are rational functions with rational coefficients.
+    """
+    return _compare(res, ans, error_probability, rng, False)
+
+
+def proportionality_test(
+    res, ans, error_probability=DEFAULT_ERROR_PROBABILITY, rng=None
+):
+    """
+    Input:
+        res, ans          : SymPy expressions, ans not identically zero
+        error_probability : largest accepted probability that expressions
+                            that are not proportional are considered
+                            proportional
+        rng               : see identity_test
+    Output:
+        True if res is a constant multiple of ans (with probability at
+        least 1 - error_probability), False if it is not and None if the
+        test was not decisive.
+    Remark:
+        As for identity_test, False is only returned when it is certain.
+    """
+    return _compare(res, ans, error_probability, rng, True)
@@ -0,0 +1,119 @@
+import random
+import unittest
+
+from sympy import E, Float, Integer, Symbol, cos, exp, expand, isprime, oo
+from sympy import sin, sqrt
+
+try:
+    from .identity import (
+        identity_test,
+        proportionality_test,
+        random_prime,
+        required_points,
+    )
+except ImportError:
+    from identity import (
+        identity_test,
+        proportionality_test,
+        random_prime,
+        required_points,
+    )
+
+x = Symbol("x")
+y = Symbol("y")
+
+
+class TestIdentity(unittest.TestCase):
+    """
+    TestCase Class used to test the probabilistic identity test by
+    evaluation in a finite field.
+    """
+
+    def test_rational_functions(self):
+        rng = random.Random(0)
+        cases = [
+            ((x + 1) ** 2, x**2 + 2 * x + 1, True),
+            ((x + 1) ** 2, x**2 + 2 * x, False),
+            (1 / (x + 1) + 1 / (x - 1), 2 * x / (x**2 - 1), True),
+            (1 / (x + 1) + 1 / (x - 1), 2 / (x**2 - 1), False),
+            ((x + y) ** 12, expand((x + y) ** 12), True),
+            ((x + y) ** 12, expand((x + y) ** 12) + 1, False),
+        ]
+        for res, ans, value in cases:
+            with self.subTest(res=res, ans=ans):
+                self.assertEqual(identity_test(res, ans, rng=rng), value)
+
+    def test_functions_are_treated_as_variables(self):
+        rng = random.Random(0)
+        cases = [
+            (exp(x) * exp(y), exp(x + y), True),
+            (E * exp(x), exp(x + 1), True),
+            (2**x * 2**y, 2 ** (x + y), True),
+            (x * sqrt(x), sqrt(x) ** 3, True),
+            ((sin(x) + 1) ** 2, sin(x) ** 2 + 2 * sin(x) + 1, True),
+            # Relations between functions are not known, so equal
+            # expressions may be undecided and different expressions
+            # are never rejected
+            (sin(x) ** 2, 1 - cos(x) ** 2, None),
+            (sin(x), cos(x), None),
+        ]
+        for res, ans, value in cases:
+            with self.subTest(res=res, ans=ans):
+                self.assertEqual(identity_test(res, ans, rng=rng), value)
+
+    def test_proportionality(self):
+        rng = random.Random(0)
+        cases = [
+            (2 * x**2 - 10 * y**2 - 20, x**2 - 5 * y**2 - 10, True),
+            (x - 2 * y, x - y, False),
+            (1 / x - 1 / y, (y - x) / (x * y), True),
+            (exp(x) - y, 3 * y - 3 * exp(x), True),
+            (sin(x) - y, cos(x) - y, None),
+        ]
+        for res, ans, value in cases:
+            with self.subTest(res=res, ans=ans):
+                self.assertEqual(
+                    proportionality_test(res, ans, rng=rng), value
+                )
+
+    def test_coefficients_divisible_by_prime(self):
+        # Coefficients that are multiples of a fixed prime used to vanish
+        # in the finite field, so different expressions were accepted
+        primes = (2**60 - 93, 2**61 - 1, 2**62 - 57, 2**63 - 25, 2**64 - 59)
+        rng = random.Random(0)
+        for prime in primes:
+            with self.subTest(prime=prime):
+                coefficient = Integer(prime + 1)
+                self.assertFalse(identity_test(coefficient * y, y, rng=rng))
+                self.assertIsNone(
+                    identity_test(coefficient * exp(x), exp(x), rng=rng)
+                )
+                self.assertIsNone(
+                    proportionality_test(
+                        exp(x) - coefficient * y, exp(x) - y, rng=rng
+                    )
+                )
+
+    def test_random_prime(self):
+        primes = {random_prime(random.Random(seed)) for seed in range(5)}
+        self.assertEqual(len(primes), 5)
+        for prime in primes:
+            self.assertTrue(isprime(prime))
+        self.assertEqual(
+            random_prime(random.Random(1)), random_prime(random.Random(1))
+        )
+
+    def test_unsupported_expressions(self):
+        self.assertIsNone(identity_test(oo, oo))
+        self.assertIsNone(identity_test(Float(0.5) * x, x / 2))
+
+    def test_required_points(self):
+        self.assertEqual(required_points(0, 1e-12), 1)
+        self.assertEqual(required_points(101, 1e-12, prime=101), None)
+        self.assertEqual(required_points(1, 0), None)
+        self.assertEqual(required_points(1, 1e-12, prime=101), 6)
+        self.assertEqual(required_points(1, 1e-30, prime=101), 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
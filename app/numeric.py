@@ -0,0 +1,152 @@
+"""
+Numerical comparison of constant expressions with absolute and relative
+tolerances, used when the numerical, atol or rtol parameters are set.
+
+Both sides are evaluated with evalf at a fixed number of digits and the
+tolerances are checked on the values, no symbolic simplification is done.
+If the difference is so close to the tolerance that rounding errors could
+change the outcome the evaluation is repeated with more digits.
+"""
+
+import mpmath
+from sympy import Catalan, EulerGamma, GoldenRatio, Symbol, pi
+
+# Constants that can be parsed as symbols, e.g. when they are input
+# symbols, but that stand for their value in a numerical comparison.
+# E and I are not included since they are parsed as symbols on purpose
+# (unless complex numbers are enabled, in which case I is parsed as the
+# imaginary unit).
+RESERVED_CONSTANTS = {
+    "pi": pi,
+    "EulerGamma": EulerGamma,
+    "GoldenRatio": GoldenRatio,
+    "Catalan": Catalan,
+}
+
+# Numbers of digits used for the evaluation, later entries are only used
+# when the result is too close to a tolerance to be decided.
+PRECISIONS = (15, 30, 60, 120)
+
+
+def substitute_constants(expr):
+    """
+    Returns expr with the symbols named as a reserved constant replaced by
+    that constant.
+    """
+    substitutions = {
+        symbol: RESERVED_CONSTANTS[symbol.name]
+        for symbol in expr.free_symbols
+        if isinstance(symbol, Symbol) and symbol.name in RESERVED_CONSTANTS
+    }
+    if len(substitutions) == 0:
+        return expr
+    return expr.xreplace(substitutions)
+
+
+def is_numeric(expr):
+    """
+    Returns True if expr has no free symbols once the reserved constants
+    have been substituted, i.e. if it can be compared numerically.
+    """
+    return all(
+        isinstance(symbol, Symbol) and symbol.name in RESERVED_CONSTANTS
+        for symbol in expr.free_symbols
+    )
+
+
+def _to_mpmath(number):
+    if number.is_Float:
+        return mpmath.mpf(number._mpf_)
+    if number.is_Rational:
+        return mpmath.mpf(number.p) / number.q
+    return None
+
+
+def evaluate(expr, digits):
+    """
+    Input:
+        expr   : expression without free symbols
+        digits : number of significant digits
+    Output:
+        Value of expr as an mpmath complex number, or None if expr
+        does not evaluate to a finite number.
+    """
+    real, imaginary = expr.evalf(digits).as_real_imag()
+    real, imaginary = _to_mpmath(real), _to_mpmath(imaginary)
+    if real is None or imaginary is None:
+        return None
+    return mpmath.mpc(real, imaginary)
+
+
+def _within_tolerance(error, tolerance, uncertainty):
+    """
+    Returns True or False if error is certainly below or above tolerance
+    given the uncertainty in error, and None otherwise.
+    """
+    if error + uncertainty < tolerance:
+        return True
+    if error - uncertainty >= tolerance:
+        return False
+    return None
+
+
+def _compare(res, ans, atol, rtol, digits):
+    with mpmath.workdps(digits + 5):
+        res_value = evaluate(res, digits)
+        ans_value = evaluate(ans, digits)
+        if res_value is None or ans_value is None:
+            return False
+        difference = abs(ans_value - res_value)
+        # Bound on the rounding error of the difference
+        uncertainty = (abs(ans_value) + abs(res_value)) * mpmath.mpf(10) ** (
+            1 - digits
+        )
+        decisions = []
+        if atol is not None:
+            decisions.append(_within_tolerance(difference, atol, uncertainty))
+        if rtol is not None:
+            if ans_value == 0:
+                decisions.append(difference == 0)
+            else:
+                decisions.append(
+                    _within_tolerance(
+                        difference / abs(ans_value),
+                        rtol,
+                        uncertainty / abs(ans_value),
+                    )
+                )
+    if False in decisions:
+        return False
+    if None in decisions:
+        return None
+    return True
+
+
+def numeric_comparison(res, ans, atol=None, rtol=None):
+    """
+    Input:
+        res  : response expression
+        ans  : answer expression
+        atol : absolute tolerance or None
+        rtol : relative tolerance or None
+    Output:
+        True if both expressions are numbers (see is_numeric) and their
+        difference is within the given tolerances, False otherwise.
+        Tolerances that are None are not checked.
+    Remark:
+        A difference that is still within the rounding error of a
+        tolerance at the highest precision is taken to be equal to the
+        tolerance, i.e. not below it.
+    """
+    if not (is_numeric(res) and is_numeric(ans)):
+        return False
+    res, ans = substitute_constants(res), substitute_constants(ans)
+    if atol is not None:
+        atol = mpmath.mpf(atol)
+    if rtol is not None:
+        rtol = mpmath.mpf(rtol)
+    for digits in PRECISIONS:
+        result = _compare(res, ans, atol, rtol, digits)
+        if result is not None:
+            return result
+    return False
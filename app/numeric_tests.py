@@ -0,0 +1,59 @@
+import unittest
+
+from sympy import I, Integer, Rational, Symbol, oo, pi, sqrt, zoo
+
+try:
+    from .numeric import evaluate, is_numeric, numeric_comparison
+except ImportError:
+    from numeric import evaluate, is_numeric, numeric_comparison
+
+x = Symbol("x")
+
+
+class TestNumeric(unittest.TestCase):
+    """
+    TestCase Class used to test the numerical comparison of constant
+    expressions with absolute and relative tolerances.
+    """
+
+    def test_is_numeric(self):
+        self.assertTrue(is_numeric(sqrt(3) + 5))
+        self.assertTrue(is_numeric(Symbol("pi") / 2))
+        self.assertFalse(is_numeric(x + 1))
+
+    def test_evaluate(self):
+        self.assertAlmostEqual(float(evaluate(sqrt(2), 15).real), 2**0.5)
+        self.assertEqual(evaluate(1 + 2 * I, 15).imag, 2)
+        self.assertIsNone(evaluate(zoo, 15))
+        self.assertIsNone(evaluate(oo, 15))
+
+    def test_tolerances(self):
+        cases = [
+            (Rational(673, 100), sqrt(3) + 5, 0.005, None, True),
+            (Rational(67, 10), sqrt(3) + 5, 0.005, None, False),
+            (Rational(673, 100), sqrt(3) + 5, None, 0.0005, True),
+            (Rational(67, 10), sqrt(3) + 5, None, 0.0005, False),
+            (Rational(314, 100), Symbol("pi"), None, 0.001, True),
+            (Rational(314, 100), pi, 0.01, 0.001, True),
+            (Rational(314, 100), pi, 0.001, 0.001, False),
+            (x, sqrt(3), 1, 1, False),
+            (Rational(1, 1000), Integer(0), None, 0.1, False),
+            (Integer(0), Integer(0), None, 0.1, True),
+        ]
+        for res, ans, atol, rtol, value in cases:
+            with self.subTest(res=res, ans=ans, atol=atol, rtol=rtol):
+                self.assertEqual(
+                    numeric_comparison(res, ans, atol, rtol), value
+                )
+
+    def test_tolerance_boundary(self):
+        # The difference is exactly the tolerance, which is only
+        # detected after the precision has been increased
+        self.assertFalse(numeric_comparison(sqrt(2) + 1, sqrt(2), 1))
+        self.assertTrue(
+            numeric_comparison(sqrt(2) + 1 - Rational(1, 10**20), sqrt(2), 1)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
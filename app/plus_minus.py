@@ -0,0 +1,167 @@
+"""
+Expansion of the plus_minus and minus_plus operators.
+
+Strings with these operators are rewritten so that they can be parsed once:
+every operator becomes a multiplication with a sign symbol,
+
+    x plus_minus y  ->  x +_pm0* y
+    x minus_plus y  ->  x -_pm0* y
+
+The sign combinations (branches) are then created from the parsed
+expression by substituting 1 and -1 for the sign symbols. Operators that
+follow *, /, ** or ^ are the sign of the next operand only (e.g. in
+x**plus_minus 2), strings with such operators are branched before parsing
+instead, see has_unary_signs. By default all
+operators in an expression share one sign, as in a plus_minus b minus_plus c
+which has two branches. With independent signs every operator has its own
+sign, an expression with k operators then has 2**k branches.
+"""
+
+import itertools
+import re
+
+from sympy import Integer, Symbol
+
+PLUS_MINUS = "plus_minus"
+MINUS_PLUS = "minus_plus"
+
+SIGN_MODES = ("correlated", "independent")
+
+# Prefix of the names of the sign symbols
+SIGN_PREFIX = "_pm"
+
+# Largest number of independent signs, i.e. of branches 2**MAX_SIGNS
+MAX_SIGNS = 8
+
+_OPERATOR = re.compile(f"{PLUS_MINUS}|{MINUS_PLUS}")
+_UNARY_OPERATOR = re.compile(rf"[*/^]\s*({PLUS_MINUS}|{MINUS_PLUS})")
+_SIGN_NAME = re.compile(re.escape(SIGN_PREFIX) + r"\d+")
+_OPPOSITE = {"+": "-", "-": "+"}
+
+
+def has_plus_minus(string):
+    """
+    Returns True if the string contains a plus_minus or minus_plus operator.
+    """
+    return _OPERATOR.search(string) is not None
+
+
+def has_unary_signs(string):
+    """
+    Returns True if a plus_minus or minus_plus operator directly follows
+    *, /, ** or ^. There it is the sign of the next operand only, e.g. in
+    2/plus_minus x, which cannot be rewritten as a multiplication with a
+    sign symbol, see rewrite_signs. Such strings are branched with
+    expand_signs instead.
+    """
+    return _UNARY_OPERATOR.search(string) is not None
+
+
+def rewrite_signs(string, independent=False):
+    """
+    Input:
+        string      : string that may contain plus_minus and minus_plus
+        independent : if True every operator gets its own sign symbol,
+                      otherwise all operators share one sign symbol
+    Output:
+        Pair (rewritten string, names of the sign symbols in order).
+    """
+    names = []
+
+    def replace(match):
+        if independent or len(names) == 0:
+            names.append(f"{SIGN_PREFIX}{len(names)}")
+        operator = "+" if match.group(0) == PLUS_MINUS else "-"
+        return f"{operator}{names[-1]}*"
+
+    string = _OPERATOR.sub(replace, string)
+    if len(names) > MAX_SIGNS:
+        raise Exception(
+            f"At most {MAX_SIGNS} independent {PLUS_MINUS} and "
+            f"{MINUS_PLUS} operators are supported."
+        )
+    return string, names
+
+
+def sign_symbols(string):
+    """
+    Returns a dictionary with the sign symbols used in a rewritten string,
+    to be added to the symbols used when parsing it.
+    """
+    return {name: Symbol(name) for name in _SIGN_NAME.findall(string)}
+
+
+def sign_combinations(names):
+    """
+    Returns a list of dictionaries that map the sign symbols with the given
+    names to 1 or -1, one for each combination of signs, starting with all
+    signs positive.
+    """
+    symbols = [Symbol(name) for name in names]
+    return [
+        dict(zip(symbols, signs))
+        for signs in itertools.product(
+            (Integer(1), Integer(-1)), repeat=len(names)
+        )
+    ]
+
+
+def sign_branches(expr, names):
+    """
+    Input:
+        expr  : parsed expression that contains sign symbols
+        names : names of the sign symbols, see rewrite_signs
+    Output:
+        List of the distinct expressions obtained by substituting each
+        combination of signs in expr.
+    """
+    branches = []
+    for combination in sign_combinations(names):
+        branch = expr.xreplace(combination)
+        if branch not in branches:
+            branches.append(branch)
+    return branches
+
+
+def expand_signs(string, independent=False):
+    """
+    Input:
+        string      : string that may contain plus_minus and minus_plus
+        independent : see rewrite_signs
+    Output:
+        List of the distinct strings obtained by replacing the operators
+        with + and - for each combination of signs. Used for input that is
+        not parsed by parse_expression, e.g. LaTeX.
+    """
+    string, names = rewrite_signs(string, independent)
+    strings = []
+    for combination in sign_combinations(names):
+        branch = string
+        for symbol, sign in combination.items():
+            # +_pm0* becomes + or -, -_pm0* becomes - or +
+            for operator in "+-":
+                branch = branch.replace(
+                    f"{operator}{symbol.name}*",
+                    operator if sign == 1 else _OPPOSITE[operator],
+                )
+        if branch not in strings:
+            strings.append(branch)
+    return strings
+
+
+def is_correct_for_criteria(matches, criteria):
+    """
+    Input:
+        matches  : dictionary with lists "responses" and "answers" that
+                   tell which branches matched a branch of the other side
+        criteria : "all", "all_responses" or "all_answers"
+    Output:
+        True if the matches satisfy the criteria.
+    """
+    if criteria == "all":
+        return all(matches["responses"]) and all(matches["answers"])
+    elif criteria == "all_responses":
+        return all(matches["responses"])
+    elif criteria == "all_answers":
+        return all(matches["answers"])
+    raise SyntaxWarning(f"Unknown multiple_answers_criteria: {criteria}")
@@ -0,0 +1,96 @@
+import unittest
+
+from sympy import Symbol, sqrt
+
+try:
+    from .plus_minus import (
+        expand_signs,
+        has_plus_minus,
+        has_unary_signs,
+        is_correct_for_criteria,
+        rewrite_signs,
+        sign_branches,
+        sign_symbols,
+    )
+except ImportError:
+    from plus_minus import (
+        expand_signs,
+        has_plus_minus,
+        has_unary_signs,
+        is_correct_for_criteria,
+        rewrite_signs,
+        sign_branches,
+        sign_symbols,
+    )
+
+x = Symbol("x")
+y = Symbol("y")
+s0 = Symbol("_pm0")
+s1 = Symbol("_pm1")
+
+
+class TestPlusMinus(unittest.TestCase):
+    """
+    TestCase Class used to test the expansion of the plus_minus and
+    minus_plus operators.
+    """
+
+    def test_has_plus_minus(self):
+        self.assertTrue(has_plus_minus("x plus_minus y"))
+        self.assertTrue(has_plus_minus("minus_plus y"))
+        self.assertFalse(has_plus_minus("x + y"))
+
+    def test_has_unary_signs(self):
+        self.assertTrue(has_unary_signs("2/plus_minus x"))
+        self.assertTrue(has_unary_signs("x**minus_plus 2"))
+        self.assertTrue(has_unary_signs("x^ plus_minus 2"))
+        self.assertFalse(has_unary_signs("-plus_minus x*y"))
+        self.assertFalse(has_unary_signs("(x plus_minus 2)/y"))
+
+    def test_rewrite_correlated_signs(self):
+        string, names = rewrite_signs("plus_minus x - minus_plus y")
+        self.assertEqual(string, "+_pm0* x - -_pm0* y")
+        self.assertEqual(names, ["_pm0"])
+        self.assertEqual(sign_symbols(string), {"_pm0": s0})
+
+    def test_rewrite_independent_signs(self):
+        string, names = rewrite_signs("a plus_minus b minus_plus c", True)
+        self.assertEqual(string, "a +_pm0* b -_pm1* c")
+        self.assertEqual(names, ["_pm0", "_pm1"])
+        self.assertRaises(Exception, rewrite_signs, "plus_minus x" * 9, True)
+
+    def test_sign_branches(self):
+        self.assertEqual(
+            sign_branches(s0 * x - s1 * y, ["_pm0", "_pm1"]),
+            [x - y, x + y, -x - y, y - x],
+        )
+        self.assertEqual(
+            sign_branches(s0 * sqrt(2) + 1, ["_pm0"]),
+            [1 + sqrt(2), 1 - sqrt(2)],
+        )
+        # Equal branches are only kept once
+        self.assertEqual(sign_branches(s0 * 0 + x, ["_pm0"]), [x])
+        self.assertEqual(sign_branches(s0**2 * x, ["_pm0"]), [x])
+
+    def test_expand_signs(self):
+        self.assertEqual(
+            expand_signs(r"\frac{1}{2} plus_minus x"),
+            [r"\frac{1}{2} + x", r"\frac{1}{2} - x"],
+        )
+        self.assertEqual(
+            expand_signs("plus_minus x minus_plus y", True),
+            ["+ x - y", "+ x + y", "- x - y", "- x + y"],
+        )
+
+    def test_is_correct_for_criteria(self):
+        matches = {"responses": [True, True], "answers": [True, False]}
+        self.assertFalse(is_correct_for_criteria(matches, "all"))
+        self.assertTrue(is_correct_for_criteria(matches, "all_responses"))
+        self.assertFalse(is_correct_for_criteria(matches, "all_answers"))
+        self.assertRaises(
+            SyntaxWarning, is_correct_for_criteria, matches, "some"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
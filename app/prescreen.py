@@ -0,0 +1,272 @@
+"""
+Pre-screen that rejects responses that are clearly different from the
+answer before the response is compared symbolically.
+
+The response is parsed into the syntax tree of the native parser (see
+parse_tree), which follows the same implicit multiplication rules as the
+SymPy parser, and the tree is evaluated with Python complex numbers at
+sample points. The answer is evaluated the same way and its values are
+cached in the CompiledQuestion, see CompiledQuestion.prescreen_values.
+
+Every value is computed together with a bound on its rounding error, so
+that responses that are equal to the answer but evaluated in a different
+way (e.g. expanded polynomials with cancellation) are not rejected. The
+pre-screen can only reject, if it does not the comparison continues with
+the equivalence stages.
+"""
+
+import cmath
+
+from sympy import (
+    Abs,
+    acos,
+    asin,
+    atan,
+    cos,
+    cosh,
+    cot,
+    csc,
+    exp,
+    log,
+    sec,
+    sin,
+    sinh,
+    sqrt,
+    tan,
+    tanh,
+)
+
+try:
+    from .expression_parser import UnsupportedExpression
+    from .expression_utilities import parse_expression_tree
+    from .sampling import REAL_TOLERANCE
+except ImportError:
+    from expression_parser import UnsupportedExpression
+    from expression_utilities import parse_expression_tree
+    from sampling import REAL_TOLERANCE
+
+# Largest accepted relative difference in magnitude, in addition to the
+# bounds on the rounding errors
+PRESCREEN_TOLERANCE = 1e-8
+
+# Unit roundoff of Python floats and the factor that estimated errors of
+# function values are multiplied with to be on the safe side
+EPSILON = 2.0**-52
+ERROR_MARGIN = 10
+
+_FUNCTIONS = {
+    sin: cmath.sin,
+    cos: cmath.cos,
+    tan: cmath.tan,
+    cot: lambda z: 1 / cmath.tan(z),
+    sec: lambda z: 1 / cmath.cos(z),
+    csc: lambda z: 1 / cmath.sin(z),
+    asin: cmath.asin,
+    acos: cmath.acos,
+    atan: cmath.atan,
+    sinh: cmath.sinh,
+    cosh: cmath.cosh,
+    tanh: cmath.tanh,
+    exp: cmath.exp,
+    log: cmath.log,
+    sqrt: cmath.sqrt,
+    Abs: lambda z: complex(abs(z)),
+}
+
+
+class PointNotUsable(ArithmeticError):
+    """
+    Raised when the rounding error of a value cannot be bounded.
+    """
+
+
+def _number(value):
+    # Compiles a leaf of the syntax tree, values are pairs (value, error)
+    if value.is_Symbol:
+        return lambda point: (complex(point[value]), 0.0)
+    if not value.is_number:
+        raise UnsupportedExpression(str(value))
+    try:
+        number = complex(value)
+    except (TypeError, ValueError):
+        raise UnsupportedExpression(str(value))
+    error = 0.0 if value.is_Integer else abs(number) * EPSILON
+    return lambda point: (number, error)
+
+
+def _neg(a):
+    return -a[0], a[1]
+
+
+def _add(a, b):
+    value = a[0] + b[0]
+    return value, a[1] + b[1] + abs(value) * EPSILON
+
+
+def _sub(a, b):
+    return _add(a, (-b[0], b[1]))
+
+
+def _mul(a, b):
+    value = a[0] * b[0]
+    error = abs(a[0]) * b[1] + abs(b[0]) * a[1] + a[1] * b[1]
+    return value, error + abs(value) * EPSILON
+
+
+def _div(a, b):
+    if abs(b[0]) <= b[1]:
+        raise PointNotUsable()
+    value = a[0] / b[0]
+    error = (a[1] + abs(value) * b[1]) / (abs(b[0]) - b[1])
+    return value, error + abs(value) * EPSILON
+
+
+def _pow(a, b):
+    exponent = b[0]
+    if b[1] == 0 and exponent.imag == 0 and exponent.real.is_integer():
+        # Integer powers are computed by repeated multiplication
+        exponent = int(exponent.real)
+    value = a[0] ** exponent
+    if a[1] == 0 and b[1] == 0:
+        return value, abs(value) * EPSILON
+    if abs(a[0]) <= a[1]:
+        raise PointNotUsable()
+    # First order bound, |d(a**b)| = |a**b| * (|b/a| da + |log(a)| db)
+    relative = abs(b[0]) * a[1] / abs(a[0]) + abs(cmath.log(a[0])) * b[1]
+    if relative > 1e-3:
+        raise PointNotUsable()
+    return value, abs(value) * (ERROR_MARGIN * relative + 2 * EPSILON)
+
+
+def _apply(function, a):
+    value = function(a[0])
+    if a[1] == 0:
+        return value, abs(value) * 2 * EPSILON
+    # The change of the value when the argument is moved by its error
+    # bound in each direction estimates the error of the value
+    change = max(
+        abs(function(a[0] + step) - value)
+        for step in (a[1], -a[1], 1j * a[1], -1j * a[1])
+    )
+    return value, ERROR_MARGIN * change + abs(value) * 2 * EPSILON
+
+
+_OPERATORS = {"add": _add, "sub": _sub, "mul": _mul, "div": _div, "pow": _pow}
+
+
+def _compile(node, symbols):
+    kind = node[0]
+    if kind == "value":
+        if node[1].is_Symbol:
+            symbols.add(node[1])
+        return _number(node[1])
+    if kind == "call":
+        function, arguments = node[1], node[2]
+        if function is log and len(arguments) == 2:
+            # log(x, b) = log(x)/log(b)
+            return _compile(
+                (
+                    "div",
+                    ("call", log, arguments[:1]),
+                    ("call", log, arguments[1:]),
+                ),
+                symbols,
+            )
+        if function not in _FUNCTIONS or len(arguments) != 1:
+            raise UnsupportedExpression(str(function))
+        argument = _compile(arguments[0], symbols)
+        function = _FUNCTIONS[function]
+        return lambda point: _apply(function, argument(point))
+    if kind == "neg":
+        operand = _compile(node[1], symbols)
+        return lambda point: _neg(operand(point))
+    if kind == "pos":
+        return _compile(node[1], symbols)
+    if kind not in _OPERATORS:
+        raise UnsupportedExpression(kind)
+    combine = _OPERATORS[kind]
+    left = _compile(node[1], symbols)
+    right = _compile(node[2], symbols)
+    return lambda point: combine(left(point), right(point))
+
+
+class FloatExpression:
+    """
+    Expression string compiled into a function that evaluates it with
+    Python complex numbers and bounds the rounding error of the value.
+
+    Parameters
+    ----------
+    expr : string
+        Preprocessed expression, as given to parse_expression
+    parsing_params : dict
+        Parsing parameters, see parse_expression
+
+    Raises UnsupportedExpression if the expression is an equation or uses
+    syntax or functions that cannot be evaluated this way.
+    """
+
+    def __init__(self, expr, parsing_params):
+        tree = parse_expression_tree(expr, parsing_params)
+        symbols = set()
+        self._function = _compile(tree, symbols)
+        self.symbols = tuple(sorted(symbols, key=str))
+
+    def evaluate(self, point):
+        """
+        Input:
+            point : dictionary that maps (at least) the symbols of the
+                    expression to numbers
+        Output:
+            Pair (value, error bound) or None if the expression cannot
+            be evaluated at the point.
+        """
+        try:
+            value, error = self._function(point)
+        except (ArithmeticError, ValueError, TypeError, OverflowError):
+            return None
+        if not (cmath.isfinite(value) and error < float("inf")):
+            return None
+        return value, error
+
+
+def _usable(value, real):
+    if value is None:
+        return False
+    if real and abs(value[0].imag) > REAL_TOLERANCE * abs(value[0]) + value[1]:
+        return False
+    return True
+
+
+def clearly_different(res, points, answer_values, required):
+    """
+    Input:
+        res           : FloatExpression for the response
+        points        : list of sample points
+        answer_values : values of the answer at the points, see
+                        FloatExpression.evaluate
+        required      : number of usable points to compare at
+    Output:
+        True if the magnitudes of the response and the answer differ by
+        more than their error bounds and the tolerance at a usable point.
+    """
+    used = 0
+    for point, ans in zip(points, answer_values):
+        if used >= required:
+            break
+        real = all(not isinstance(x, complex) for x in point.values())
+        if not _usable(ans, real):
+            continue
+        value = res.evaluate(point)
+        if not _usable(value, real):
+            continue
+        used += 1
+        difference = abs(abs(value[0]) - abs(ans[0]))
+        bound = (
+            value[1]
+            + ans[1]
+            + PRESCREEN_TOLERANCE * max(abs(value[0]), abs(ans[0]))
+        )
+        if difference > bound:
+            return True
+    return False
@@ -0,0 +1,94 @@
+import unittest
+
+from sympy import Symbol
+
+try:
+    from .evaluation import compile_question
+    from .expression_parser import UnsupportedExpression
+    from .prescreen import FloatExpression, clearly_different
+    from .sampling import sample_points
+except ImportError:
+    from evaluation import compile_question
+    from expression_parser import UnsupportedExpression
+    from prescreen import FloatExpression, clearly_different
+    from sampling import sample_points
+
+x = Symbol("x")
+y = Symbol("y")
+
+
+def _float_expression(expr, params=None):
+    question = compile_question("x", params or {"strict_syntax": False})
+    return FloatExpression(expr, question.parsing_params)
+
+
+def _different(response, answer, n=20):
+    res = _float_expression(response)
+    ans = _float_expression(answer)
+    symbols = tuple(sorted(set(res.symbols) | set(ans.symbols), key=str))
+    points = sample_points(symbols, n)
+    values = [ans.evaluate(point) for point in points]
+    return clearly_different(res, points, values, n)
+
+
+class TestPrescreen(unittest.TestCase):
+    """
+    TestCase Class used to test the evaluation of expressions with Python
+    floats and the pre-screen of responses.
+    """
+
+    def test_evaluate(self):
+        expr = _float_expression("2x**2 + sin(y)/3 - log(8, 2)")
+        self.assertEqual(expr.symbols, (x, y))
+        value, error = expr.evaluate({x: 1.5, y: 0.0})
+        self.assertAlmostEqual(value.real, 1.5)
+        self.assertLess(error, 1e-14)
+
+    def test_error_bounds(self):
+        expanded = _float_expression(
+            "x**6-6x**5y+15x**4y**2-20x**3y**3+15x**2y**4-6xy**5+y**6"
+        )
+        value, error = expanded.evaluate({x: 1.5, y: 1.49})
+        # (x-y)**6 is 1e-12, which is lost to cancellation
+        self.assertGreater(error, abs(value - 1e-12))
+
+    def test_unusable_points(self):
+        expr = _float_expression("1/(x-1)")
+        self.assertIsNone(expr.evaluate({x: 1}))
+        self.assertIsNotNone(expr.evaluate({x: 2}))
+
+    def test_unsupported(self):
+        for expr in ["x = 1", "f(x)", "gamma(x)", "Derivative(x, x)"]:
+            with self.subTest(expr=expr):
+                self.assertRaises(
+                    UnsupportedExpression,
+                    _float_expression,
+                    expr,
+                    {"strict_syntax": True},
+                )
+
+    def test_clearly_different(self):
+        cases = [
+            ("sin(x)", "cos(x)", True),
+            ("x**2+2x", "x**2+2x+1", True),
+            ("x/y", "y/x", True),
+            ("sin(x)**2+cos(x)**2", "1", False),
+            ("2sin(x)cos(x)", "sin(2x)", False),
+            ("exp(x+y)", "exp(x)exp(y)", False),
+            ("1/(sqrt(x)+1)", "(1-sqrt(x))/(1-x)", False),
+            (
+                "(x-y)**12",
+                "x**12-12x**11y+66x**10y**2-220x**9y**3+495x**8y**4"
+                "-792x**7y**5+924x**6y**6-792x**5y**7+495x**4y**8"
+                "-220x**3y**9+66x**2y**10-12xy**11+y**12",
+                False,
+            ),
+        ]
+        for response, answer, value in cases:
+            with self.subTest(response=response, answer=answer):
+                self.assertEqual(_different(response, answer), value)
+                self.assertEqual(_different(answer, response), value)
+
+
+if __name__ == "__main__":
+    unittest.main()
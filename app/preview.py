@@ -7,6 +7,13 @@ from sympy.parsing import parse_expr
 from sympy.printing.latex import LatexPrinter
 from typing_extensions import NotRequired
 
+try:
+    from .time_budget import TimeBudget, TimeBudgetExceeded
+    from .timings import create_timings
+except ImportError:
+    from time_budget import TimeBudget, TimeBudgetExceeded
+    from timings import create_timings
+
 
 class Symbol(TypedDict):
     latex: str
@@ -23,6 +30,8 @@ class Params(TypedDict):
     is_latex: bool
     simplify: NotRequired[bool]
     symbols: NotRequired[SymbolDict]
+    time_budget_ms: NotRequired[int]
+    return_timings: NotRequired[bool]
 
 
 class Preview(TypedDict):
@@ -30,8 +39,20 @@ class Preview(TypedDict):
     sympy: str
 
 
+class Timeout(TypedDict):
+    stage: str
+    time_budget_ms: int
+
+
+class Timings(TypedDict):
+    stages: Dict[str, float]
+    counts: Dict[str, int]
+
+
 class Result(TypedDict):
     preview: Preview
+    timeout: NotRequired[Timeout]
+    timings: NotRequired[Timings]
 
 
 def sympy_symbols(symbols: SymbolDict) -> Dict[str, sympy.Symbol]:
@@ -150,27 +171,41 @@ def preview_function(response: str, params: Params) -> Result:
     split into many) is entirely up to you.
     """
     symbols: SymbolDict = params.get("symbols", {})
+    timings = create_timings(params)
+    budget = TimeBudget(params.get("time_budget_ms", None), timings)
+    timeout = None
 
     if not response:
         return Result(preview=Preview(latex="", sympy=""))
 
     try:
         if params.get("is_latex", False):
-            response = parse_latex(response, symbols)
-
-        equation = parse_expr(
-            response,
-            evaluate=False,
-            local_dict=sympy_symbols(symbols),
-            transformations="all",
-        )
+            with timings.stage("latex2sympy"):
+                response = parse_latex(response, symbols)
+
+        with timings.stage("parse"):
+            equation = parse_expr(
+                response,
+                evaluate=False,
+                local_dict=sympy_symbols(symbols),
+                transformations="all",
+            )
 
         if params.get("simplify", False):
-            equation = sympy.simplify(equation)
-
-        latex_out = LatexPrinter(
-            {"symbol_names": latex_symbols(symbols)}
-        ).doprint(equation)
+            timings.count("simplify_calls")
+            try:
+                with timings.stage("simplify"):
+                    equation = budget.run("simplify", sympy.simplify, equation)
+            except TimeBudgetExceeded as e:
+                # Preview the expression as it was written instead
+                timeout = Timeout(
+                    stage=e.stage, time_budget_ms=budget.time_budget_ms
+                )
+
+        with timings.stage("latex"):
+            latex_out = LatexPrinter(
+                {"symbol_names": latex_symbols(symbols)}
+            ).doprint(equation)
 
         sympy_out = str(equation)
 
@@ -179,4 +214,9 @@ def preview_function(response: str, params: Params) -> Result:
     except ValueError as e:
         raise ValueError("Failed to parse LaTeX expression") from e
 
-    return Result(preview=Preview(latex=latex_out, sympy=sympy_out))
+    result = Result(preview=Preview(latex=latex_out, sympy=sympy_out))
+    if timeout is not None:
+        result["timeout"] = timeout
+    if timings.enabled:
+        result["timings"] = Timings(**timings.as_dict())
+    return result
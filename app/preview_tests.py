@@ -221,6 +221,31 @@ class TestPreviewFunction(unittest.TestCase):
         with self.assertRaises(ValueError):
             preview_function(response, params)
 
+    def test_simplify_time_budget(self):
+        response = "sin(x)**2 + cos(x)**2"
+        params = Params(is_latex=False, simplify=True, time_budget_ms=10000)
+        result = preview_function(response, params)
+        self.assertEqual(result["preview"]["sympy"], "1")
+        self.assertNotIn("timeout", result)
+
+        params = Params(is_latex=False, simplify=True, time_budget_ms=0)
+        result = preview_function(response, params)
+        self.assertEqual(result["preview"]["sympy"], "sin(x)**2 + cos(x)**2")
+        self.assertEqual(result["timeout"]["stage"], "simplify")
+
+    def test_return_timings(self):
+        response = "sin(x)**2 + cos(x)**2"
+        result = preview_function(response, Params(is_latex=False))
+        self.assertNotIn("timings", result)
+
+        params = Params(is_latex=False, simplify=True, return_timings=True)
+        result = preview_function(response, params)
+        self.assertEqual(
+            set(result["timings"]["stages"].keys()),
+            {"parse", "simplify", "latex"},
+        )
+        self.assertEqual(result["timings"]["counts"]["simplify_calls"], 1)
+
     def test_extract_latex_in_delimiters(self):
         parentheses = r"\( x + 1 \)"
         dollars = r"$ x ** 2 + 1 $"
@@ -0,0 +1,183 @@
+"""
+Cache for evaluation results of repeated (response, question) pairs.
+
+Results are kept in an in-process LRU with size and TTL eviction. If a
+path is given, results are also stored in an SQLite database so that
+several worker processes on the same host can share them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Default number of results kept in memory and how long (in seconds)
+# results are kept in memory and in the shared database
+RESULT_CACHE_SIZE = 4096
+RESULT_CACHE_TTL = 24 * 60 * 60
+
+# Expired results are removed from the shared database every this many writes
+SHARED_PURGE_INTERVAL = 256
+
+
+def normalise_response(response):
+    """
+    Returns the response with leading and trailing whitespace removed and
+    all other runs of whitespace replaced by a single space.
+    """
+    return " ".join(response.split())
+
+
+class ResultCache:
+    """
+    Two-tier cache for evaluation results.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of results kept in memory
+    ttl : number
+        Time in seconds before a cached result expires
+    path : string or None
+        Path of the SQLite database shared between processes,
+        if None only the in-process tier is used
+
+    Remark
+    ------
+    Results must be JSON serialisable, copies are returned so callers can
+    modify results without affecting the cache.
+    """
+
+    def __init__(
+        self, max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, path=None
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+        self._writes_since_purge = 0
+        self._counters = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def _shared(self):
+        # Connections cannot be shared with forked processes
+        if self._connection is None or self._connection_pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=5, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, result TEXT, expires REAL)"
+            )
+            connection.commit()
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _store_in_memory(self, key, expires, serialised):
+        self._entries[key] = (expires, serialised)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _get_shared(self, key, now):
+        try:
+            row = (
+                self._shared()
+                .execute(
+                    "SELECT result, expires FROM results WHERE key = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            return None
+        if row is None or row[1] <= now:
+            return None
+        self._store_in_memory(key, row[1], row[0])
+        return row[0]
+
+    def get(self, key):
+        """
+        Returns the cached result for key or None if there is none.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self._counters["evictions"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return json.loads(entry[1])
+            if self.path is not None:
+                serialised = self._get_shared(key, now)
+                if serialised is not None:
+                    self._counters["hits"] += 1
+                    self._counters["shared_hits"] += 1
+                    return json.loads(serialised)
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, result):
+        """
+        Stores a copy of result for key.
+        """
+        serialised = json.dumps(result)
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock:
+            self._store_in_memory(key, expires, serialised)
+            if self.path is not None:
+                try:
+                    connection = self._shared()
+                    connection.execute(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                        (key, serialised, expires),
+                    )
+                    self._writes_since_purge += 1
+                    if self._writes_since_purge >= SHARED_PURGE_INTERVAL:
+                        connection.execute(
+                            "DELETE FROM results WHERE expires <= ?", (now,)
+                        )
+                        self._writes_since_purge = 0
+                    connection.commit()
+                except sqlite3.Error:
+                    pass
+
+    def clear(self):
+        """
+        Removes all results from both tiers and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            for counter in self._counters:
+                self._counters[counter] = 0
+            if self.path is not None:
+                try:
+                    connection = self._shared()
+                    connection.execute("DELETE FROM results")
+                    connection.commit()
+                except sqlite3.Error:
+                    pass
+
+    def stats(self):
+        """
+        Returns a dictionary with the hit, miss and eviction counters and
+        the number of results currently kept in memory.
+        """
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+import unittest
+
+try:
+    from .result_cache import ResultCache, normalise_response
+except ImportError:
+    from result_cache import ResultCache, normalise_response
+
+
+class TestResultCache(unittest.TestCase):
+    """
+    TestCase Class used to test the cache for evaluation results.
+    """
+
+    def test_normalise_response(self):
+        self.assertEqual(normalise_response("  x  +\t1 \n"), "x + 1")
+
+    def test_hit_and_miss(self):
+        cache = ResultCache()
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", {"is_correct": True})
+        result = cache.get("a")
+        self.assertEqual(result, {"is_correct": True})
+        result["is_correct"] = False
+        self.assertEqual(cache.get("a"), {"is_correct": True})
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_size_eviction(self):
+        cache = ResultCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_eviction(self):
+        cache = ResultCache(ttl=0.05)
+        cache.set("a", 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_shared_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.sqlite")
+            writer = ResultCache(path=path)
+            reader = ResultCache(path=path)
+            writer.set("a", {"is_correct": True})
+            self.assertEqual(reader.get("a"), {"is_correct": True})
+            self.assertEqual(reader.stats()["shared_hits"], 1)
+            reader.get("a")
+            self.assertEqual(reader.stats()["shared_hits"], 1)
+            writer.clear()
+            self.assertIsNone(ResultCache(path=path).get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
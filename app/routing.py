@@ -0,0 +1,247 @@
+"""
+Analysis of the features of expressions and routing of comparisons to a
+targeted simplification strategy.
+
+simplify tries many simplification strategies one after the other, most
+of which cannot help for a given pair of expressions. The features found
+by analyse (e.g. trigonometric functions or radicals) are used to choose
+the one strategy that is likely to show that the difference of the
+expressions is zero. If no targeted strategy fits the route is "generic"
+and only simplify is used.
+"""
+
+from functools import lru_cache
+
+from sympy import (
+    Abs,
+    Max,
+    Min,
+    Piecewise,
+    Pow,
+    S,
+    beta,
+    binomial,
+    cancel,
+    ceiling,
+    exp,
+    expand,
+    expand_log,
+    factorial,
+    factorial2,
+    floor,
+    gamma,
+    gammasimp,
+    log,
+    powsimp,
+    radsimp,
+    sign,
+    zeta,
+)
+from sympy.functions.elementary.trigonometric import (
+    InverseTrigonometricFunction,
+    TrigonometricFunction,
+)
+from sympy.simplify.fu import fu
+
+# Features of an expression, an expression without any of these is a
+# rational function of its symbols.
+FEATURES = (
+    "trig",
+    "exp_log",
+    "radical",
+    "special",
+    "piecewise",
+    "complex",
+    "other",
+)
+
+_TRIG_FUNCTIONS = (TrigonometricFunction, InverseTrigonometricFunction)
+_PIECEWISE_FUNCTIONS = (Abs, Piecewise, sign, Min, Max, floor, ceiling)
+_SPECIAL_FUNCTIONS = (gamma, beta, zeta, factorial, factorial2, binomial)
+
+
+class ExpressionFeatures:
+    """
+    Features of an expression, see analyse.
+
+    Parameters
+    ----------
+    features : frozenset
+        Names of the features found in the expression, see FEATURES
+    size : int
+        Number of nodes in the expression tree
+    depth : int
+        Depth of the expression tree, an atom has depth 1
+    """
+
+    def __init__(self, features, size, depth):
+        self.features = features
+        self.size = size
+        self.depth = depth
+
+    def __repr__(self):
+        return (
+            f"ExpressionFeatures({sorted(self.features)}, "
+            f"size={self.size}, depth={self.depth})"
+        )
+
+
+def _feature(node, special_functions, complex_numbers):
+    if isinstance(node, _TRIG_FUNCTIONS):
+        return "trig"
+    if isinstance(node, (exp, log)):
+        return "exp_log"
+    if isinstance(node, Pow):
+        exponent = node.exp
+        if exponent.is_Integer:
+            return None
+        if exponent.is_Rational:
+            return "radical"
+        return "exp_log"
+    if isinstance(node, _PIECEWISE_FUNCTIONS):
+        return "piecewise"
+    if isinstance(node, _SPECIAL_FUNCTIONS):
+        return "special" if special_functions else "other"
+    if node is S.ImaginaryUnit:
+        return "complex" if complex_numbers else "other"
+    if not (node.is_Atom or node.is_Add or node.is_Mul):
+        # e.g. hyperbolic functions, user defined functions or derivatives
+        return "other"
+    return None
+
+
+@lru_cache(maxsize=256)
+def analyse(expr, special_functions=False, complex_numbers=False):
+    """
+    Input:
+        expr              : SymPy expression
+        special_functions : True if special functions are enabled (the
+                            specialFunctions parameter)
+        complex_numbers   : True if complex numbers are enabled (the
+                            complexNumbers parameter)
+    Output:
+        ExpressionFeatures of expr, found in a single traversal.
+    Remark:
+        Special functions and the imaginary unit are only the "special"
+        and "complex" features if they are enabled, otherwise (e.g. for
+        factorial or the I in sqrt(-1)) they are "other".
+    """
+    features = set()
+    size = 0
+    depth = 0
+    stack = [(expr, 1)]
+    while len(stack) > 0:
+        node, level = stack.pop()
+        size += 1
+        depth = max(depth, level)
+        feature = _feature(node, special_functions, complex_numbers)
+        if feature is not None:
+            features.add(feature)
+        stack.extend((arg, level + 1) for arg in node.args)
+    return ExpressionFeatures(frozenset(features), size, depth)
+
+
+def _monomials(variables, degree, limit):
+    # Number of monomials of the given degree in the given number of
+    # variables, binomial(variables + degree - 1, k) with the smaller k,
+    # computed until it exceeds limit
+    k = min(degree, variables - 1)
+    n = variables + degree - 1
+    count = 1
+    for i in range(1, k + 1):
+        count = count * (n - k + i) // i
+        if count > limit:
+            return limit
+    return count
+
+
+def _expanded_terms(expr, limit):
+    # Pair (number of terms of expr when expanded, largest number of
+    # terms of any subexpression when expanded), both at most limit
+    if expr.is_Atom:
+        return 1, 1
+    inner = [_expanded_terms(arg, limit) for arg in expr.args]
+    largest = max(x[1] for x in inner)
+    if expr.is_Add:
+        terms = sum(x[0] for x in inner)
+    elif expr.is_Mul:
+        terms = 1
+        for x in inner:
+            terms = min(terms * x[0], limit)
+    elif expr.is_Pow and expr.exp.is_Integer:
+        # Number of monomials of degree |n| in the terms of the base
+        terms = _monomials(inner[0][0], min(abs(int(expr.exp)), limit), limit)
+    else:
+        # Functions are not expanded into more terms, only their arguments
+        terms = 1
+    terms = min(terms, limit)
+    return terms, min(max(largest, terms), limit)
+
+
+@lru_cache(maxsize=256)
+def expanded_terms(expr, limit=10**6):
+    """
+    Input:
+        expr  : SymPy expression
+        limit : largest estimate that is returned
+    Output:
+        Estimate of the largest number of terms of expr or any of its
+        subexpressions (e.g. function arguments) when they are expanded,
+        e.g. 5456 for (x+y+z+w)**30. Used to decide whether expand,
+        cancel or Poly can take too long to run unsupervised.
+    """
+    return _expanded_terms(expr, limit)[1]
+
+
+def _trig(expr):
+    return fu(expr)
+
+
+def _exp_log(expr):
+    return cancel(expand(powsimp(expand_log(expr))))
+
+
+def _radical(expr):
+    return cancel(radsimp(expr))
+
+
+def _special(expr):
+    return gammasimp(expr)
+
+
+# Targeted strategy for each route, each takes the difference of the
+# expressions and returns an expression that is zero if the strategy
+# shows that they are equal.
+ROUTES = {
+    "trig": _trig,
+    "exp_log": _exp_log,
+    "radical": _radical,
+    "special": _special,
+}
+
+# Routes for which no targeted strategy is used: rational functions are
+# already handled by the cheaper equivalence stages and for anything else
+# simplify is used.
+GENERIC_ROUTES = ("rational", "generic")
+
+
+def choose_route(res, ans, special_functions=False, complex_numbers=False):
+    """
+    Input:
+        res, ans          : response and answer expressions
+        special_functions : see analyse
+        complex_numbers   : see analyse
+    Output:
+        Name of the route for comparing res and ans: "rational" if both
+        are rational functions, a key of ROUTES if the expressions have
+        exactly that feature and "generic" otherwise.
+    """
+    flags = (special_functions, complex_numbers)
+    features = analyse(res, *flags).features | analyse(ans, *flags).features
+    if len(features) == 0:
+        return "rational"
+    if len(features) == 1:
+        (feature,) = features
+        if feature in ROUTES:
+            return feature
+    return "generic"
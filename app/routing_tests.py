@@ -0,0 +1,108 @@
+import unittest
+
+from sympy import (
+    Abs,
+    Function,
+    I,
+    Integer,
+    Symbol,
+    cos,
+    cosh,
+    exp,
+    gamma,
+    log,
+    sin,
+    sqrt,
+)
+
+try:
+    from .routing import ROUTES, analyse, choose_route, expanded_terms
+except ImportError:
+    from routing import ROUTES, analyse, choose_route, expanded_terms
+
+x = Symbol("x")
+y = Symbol("y")
+
+
+class TestRouting(unittest.TestCase):
+    """
+    TestCase Class used to test the analysis of expression features and
+    the choice of a targeted simplification strategy.
+    """
+
+    def test_analyse(self):
+        cases = [
+            (x**2 + 1 / x, set()),
+            (sin(x) ** 2 + cos(x), {"trig"}),
+            (exp(x) + log(y) + 2**x, {"exp_log"}),
+            (sqrt(x) + 1, {"radical"}),
+            (gamma(x), {"special"}),
+            (Abs(x), {"piecewise"}),
+            (x + I, {"complex"}),
+            (cosh(x) + Function("f")(x), {"other"}),
+            (sqrt(2) * sin(x), {"radical", "trig"}),
+        ]
+        for expr, features in cases:
+            with self.subTest(expr=expr):
+                self.assertEqual(analyse(expr, True, True).features, features)
+
+    def test_disabled_features(self):
+        # Special functions and the imaginary unit are only features if
+        # they are enabled by specialFunctions and complexNumbers
+        self.assertEqual(analyse(gamma(x)).features, {"other"})
+        self.assertEqual(analyse(x + I).features, {"other"})
+        self.assertEqual(analyse(gamma(x), True).features, {"special"})
+        self.assertEqual(
+            analyse(x + I, complex_numbers=True).features, {"complex"}
+        )
+
+    def test_size_and_depth(self):
+        features = analyse(sin(x + 1) * y)
+        self.assertEqual(features.size, 6)
+        self.assertEqual(features.depth, 4)
+
+    def test_expanded_terms(self):
+        z = Symbol("z")
+        cases = [
+            (x, 1),
+            ((x + 1) ** 2, 3),
+            ((x + y + z) ** 4 * (x + 1), 30),
+            (sin((x + y) ** 10), 11),
+            ((x + y) ** -30, 31),
+            (x**100, 1),
+        ]
+        for expr, terms in cases:
+            with self.subTest(expr=expr):
+                self.assertEqual(expanded_terms(expr), terms)
+        self.assertEqual(expanded_terms((x + y) ** (10**9), 1000), 1000)
+
+    def test_choose_route(self):
+        cases = [
+            (x + 1, (x**2 - 1) / (x - 1), "rational"),
+            (sin(x) ** 2 + cos(x) ** 2, Integer(1), "trig"),
+            (exp(x + y), exp(x) * exp(y), "exp_log"),
+            (1 / (sqrt(x) + 1), (1 - sqrt(x)) / (1 - x), "radical"),
+            (gamma(x + 1), x * gamma(x), "generic"),
+            (Abs(x), sqrt(x**2), "generic"),
+            (exp(sin(x)), x, "generic"),
+        ]
+        for res, ans, route in cases:
+            with self.subTest(res=res, ans=ans):
+                self.assertEqual(choose_route(res, ans), route)
+        route = choose_route(gamma(x + 1), x * gamma(x), True)
+        self.assertEqual(route, "special")
+
+    def test_route_strategies(self):
+        cases = [
+            ("trig", sin(2 * x) - 2 * sin(x) * cos(x)),
+            ("exp_log", log(8) - 3 * log(2)),
+            ("radical", 1 / (sqrt(2) + 1) - sqrt(2) + 1),
+            ("special", gamma(x + 1) - x * gamma(x)),
+        ]
+        for route, difference in cases:
+            with self.subTest(route=route):
+                self.assertEqual(ROUTES[route](difference), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+"""
+Numerical sampling of SymPy expressions, used to quickly find cases where
+two expressions are different before any symbolic comparison is attempted.
+
+Sample points give every symbol its own (seeded) random value from the
+domain given by the assumptions of the symbol, see sample_points. Points
+where an expression cannot be evaluated (poles) or, for real points, does
+not have a real value (beyond a branch cut) are skipped.
+"""
+
+import cmath
+import math
+import random
+
+from sympy import lambdify
+
+# Expressions with more operations than this are compiled with common
+# subexpression elimination, for smaller expressions it does not pay off
+CSE_OPERATION_THRESHOLD = 40
+
+# Seed of the random sample values, fixed so that results are reproducible
+SAMPLE_SEED = 0
+
+# Bounds of the magnitude of sampled values and of sampled integers
+SAMPLE_MAGNITUDE = (0.1, 2.0)
+SAMPLE_INTEGERS = (1, 6)
+
+# Bounds of the number of usable points required by sample_count and the
+# number of candidate points generated for each of them, the additional
+# candidates replace points that are skipped
+MIN_SAMPLE_POINTS = 6
+MAX_SAMPLE_POINTS = 24
+CANDIDATES_PER_POINT = 4
+
+# Values with a smaller magnitude are treated as zero, and values with an
+# imaginary part that is smaller relative to their magnitude as real
+ZERO_TOLERANCE = 1e-12
+REAL_TOLERANCE = 1e-12
+
+
+class CompiledExpression:
+    """
+    SymPy expression compiled (once) into a Python function of its free
+    symbols.
+
+    Points are evaluated with the math module. If that fails, e.g. because
+    the value is complex, overflows or the function is not available in
+    the math module, the point is evaluated with mpmath instead. Points
+    where neither works (typically singularities) evaluate to None.
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.symbols = tuple(sorted(expr.free_symbols, key=str))
+        self.operations = expr.count_ops()
+        self.cse = self.operations > CSE_OPERATION_THRESHOLD
+        self._functions = {}
+
+    def _function(self, module):
+        if module not in self._functions:
+            try:
+                function = lambdify(
+                    self.symbols, self.expr, modules=module, cse=self.cse
+                )
+            except Exception:
+                function = None
+            self._functions[module] = function
+        return self._functions[module]
+
+    def evaluate(self, point):
+        """
+        Input:
+            point : dictionary that maps (at least) the free symbols
+                    of the expression to numbers
+        Output:
+            value of the expression at the point as a complex number,
+            or None if the expression could not be evaluated
+        """
+        args = [point[symbol] for symbol in self.symbols]
+        for module in ("math", "mpmath"):
+            function = self._function(module)
+            if function is None:
+                continue
+            try:
+                return complex(function(*args))
+            except (ArithmeticError, ValueError, TypeError, NameError):
+                continue
+        return None
+
+    def evaluate_all(self, points):
+        """
+        Input:
+            points : list of points, see evaluate
+        Output:
+            list with the value of the expression at each point
+        """
+        return [self.evaluate(point) for point in points]
+
+
+def _sample_value(symbol, rng, complex_numbers):
+    if symbol.is_integer:
+        low, high = SAMPLE_INTEGERS
+        if symbol.is_positive:
+            return rng.randint(low, high)
+        if symbol.is_nonnegative:
+            return rng.randint(0, high)
+        if symbol.is_negative:
+            return -rng.randint(low, high)
+        if symbol.is_nonpositive:
+            return -rng.randint(0, high)
+        return rng.randint(-high, high)
+    magnitude = rng.uniform(*SAMPLE_MAGNITUDE)
+    if complex_numbers and symbol.is_real is not True:
+        return cmath.rect(magnitude, rng.uniform(-math.pi, math.pi))
+    if symbol.is_nonnegative:
+        return magnitude
+    if symbol.is_nonpositive:
+        return -magnitude
+    return magnitude if rng.random() < 0.5 else -magnitude
+
+
+def sample_points(symbols, n=10, complex_numbers=False, seed=SAMPLE_SEED):
+    """
+    Input:
+        symbols         : iterable of sympy symbols
+        n               : number of points
+        complex_numbers : if True symbols that are not known to be real
+                          are given complex values
+        seed            : seed of the random values
+    Output:
+        List of n points where each symbol is given its own random value.
+        The value respects the assumptions of the symbol: integers are
+        given integer values and positive (negative) symbols positive
+        (negative) values. Other values have a magnitude in the range
+        SAMPLE_MAGNITUDE, real values have a random sign.
+    """
+    rng = random.Random(seed)
+    symbols = sorted(symbols, key=str)
+    return [
+        {s: _sample_value(s, rng, complex_numbers) for s in symbols}
+        for _ in range(n)
+    ]
+
+
+def sample_count(*expressions):
+    """
+    Input:
+        expressions : CompiledExpression
+    Output:
+        Number of usable points to compare the expressions at, more points
+        are used for expressions with more symbols and operations.
+    """
+    symbols = set().union(*(expr.symbols for expr in expressions))
+    if len(symbols) == 0:
+        return 1
+    operations = sum(expr.operations for expr in expressions)
+    return min(
+        MAX_SAMPLE_POINTS,
+        MIN_SAMPLE_POINTS + 2 * len(symbols) + operations // 10,
+    )
+
+
+def candidate_points(symbols, count, complex_numbers=False):
+    """
+    Returns sample_points for the given symbols with enough candidates to
+    find count usable points, see sample_count.
+    """
+    return sample_points(
+        symbols, count * CANDIDATES_PER_POINT, complex_numbers
+    )
+
+
+def _is_real_point(point):
+    return all(not isinstance(value, complex) for value in point.values())
+
+
+def _usable(value, real):
+    """
+    Returns True if the value of an expression at a point can be compared:
+    it is finite and, if the point is real, has a real value.
+    """
+    if value is None or not cmath.isfinite(value):
+        return False
+    if real and abs(value.imag) > REAL_TOLERANCE * abs(value):
+        return False
+    return True
+
+
+def numerically_different(res, ans, points, tolerance=1e-10, required=None):
+    """
+    Input:
+        res, ans  : CompiledExpression
+        points    : list of points that res and ans are evaluated at
+        tolerance : largest accepted relative difference in magnitude
+        required  : number of usable points after which the comparison
+                    stops, if None all points are used
+    Output:
+        True if the magnitudes of res and ans differ by more than the
+        tolerance at any usable point, False otherwise. Points where a
+        value is not usable (see _usable) are skipped.
+    Remark:
+        This can only show that expressions are different, if it returns
+        False the expressions might still be different.
+    """
+    used = 0
+    for point in points:
+        if required is not None and used >= required:
+            break
+        real = _is_real_point(point)
+        num_res = res.evaluate(point)
+        if not _usable(num_res, real):
+            continue
+        num_ans = ans.evaluate(point)
+        if not _usable(num_ans, real):
+            continue
+        used += 1
+        num_res = abs(num_res)
+        num_ans = abs(num_ans)
+        if num_res < ZERO_TOLERANCE and num_ans < ZERO_TOLERANCE:
+            continue
+        ratio = abs(1 - min(num_res, num_ans) / max(num_res, num_ans))
+        if ratio > tolerance:
+            return True
+    return False
+
+
+def residuals(lhs, rhs, points, cancellation=1e-8):
+    """
+    Input:
+        lhs, rhs     : CompiledExpression for the two sides of an equation
+        points       : list of points that lhs and rhs are evaluated at
+        cancellation : smallest accepted magnitude of the residual
+                       relative to the magnitude of the sides
+    Output:
+        List with the value of lhs - rhs at each point. The value is None
+        if the value of a side is not usable (see _usable) or if the
+        residual is so small compared to the sides that it is dominated by
+        rounding errors.
+    """
+    values = []
+    for point, num_lhs, num_rhs in zip(
+        points, lhs.evaluate_all(points), rhs.evaluate_all(points)
+    ):
+        real = _is_real_point(point)
+        if not (_usable(num_lhs, real) and _usable(num_rhs, real)):
+            values.append(None)
+            continue
+        residual = num_lhs - num_rhs
+        scale = max(abs(num_lhs), abs(num_rhs))
+        if abs(residual) <= cancellation * scale:
+            values.append(None)
+        else:
+            values.append(residual)
+    return values
+
+
+def ratio_not_constant(res_values, ans_values, tolerance=1e-6):
+    """
+    Input:
+        res_values, ans_values : lists of values at the same points, e.g.
+                                 computed by residuals
+        tolerance              : largest accepted relative difference
+                                 between ratios
+    Output:
+        True if the ratio res/ans differs by more than the tolerance
+        between points where both values are known, False otherwise.
+    Remark:
+        As for numerically_different, only a return value of True is
+        conclusive.
+    """
+    ratios = [
+        num_res / num_ans
+        for (num_res, num_ans) in zip(res_values, ans_values)
+        if num_res is not None and num_ans is not None
+    ]
+    for ratio in ratios[1:]:
+        if abs(ratio - ratios[0]) > tolerance * max(
+            abs(ratio), abs(ratios[0])
+        ):
+            return True
+    return False
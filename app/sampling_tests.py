@@ -0,0 +1,156 @@
+import unittest
+
+from sympy import Integer, Symbol, exp, log, sqrt
+
+try:
+    from .sampling import (
+        MAX_SAMPLE_POINTS,
+        CompiledExpression,
+        numerically_different,
+        ratio_not_constant,
+        residuals,
+        sample_count,
+        sample_points,
+    )
+except ImportError:
+    from sampling import (
+        MAX_SAMPLE_POINTS,
+        CompiledExpression,
+        numerically_different,
+        ratio_not_constant,
+        residuals,
+        sample_count,
+        sample_points,
+    )
+
+x = Symbol("x")
+y = Symbol("y")
+z = Symbol("z")
+
+
+class TestSampling(unittest.TestCase):
+    """
+    TestCase Class used to test the numerical sampling used to
+    quickly detect responses that are not equal to the answer.
+    """
+
+    def test_sample_points(self):
+        points = sample_points([x, y], n=4)
+        self.assertEqual(len(points), 4)
+        self.assertEqual(points, sample_points([y, x], n=4))
+        self.assertNotEqual(points, sample_points([x, y], n=4, seed=1))
+        for point in points:
+            self.assertNotEqual(point[x], point[y])
+            for value in point.values():
+                self.assertTrue(0.1 <= abs(value) <= 2)
+
+    def test_sample_points_respect_assumptions(self):
+        symbols = [
+            Symbol("p", positive=True),
+            Symbol("q", negative=True),
+            Symbol("n", integer=True),
+            Symbol("m", integer=True, nonnegative=True),
+            Symbol("r", real=True),
+            z,
+        ]
+        points = sample_points(symbols, n=20, complex_numbers=True)
+        p, q, n, m, r = symbols[:5]
+        for point in points:
+            self.assertTrue(point[p] > 0)
+            self.assertTrue(point[q] < 0)
+            self.assertIsInstance(point[n], int)
+            self.assertTrue(isinstance(point[m], int) and point[m] >= 0)
+            self.assertIsInstance(point[r], float)
+            self.assertIsInstance(point[z], complex)
+        self.assertIsInstance(sample_points([z])[0][z], float)
+
+    def test_sample_count(self):
+        small = CompiledExpression(x + 1)
+        large = CompiledExpression(sum(x**k * y for k in range(50)))
+        self.assertEqual(sample_count(CompiledExpression(sqrt(2))), 1)
+        self.assertLess(sample_count(small), sample_count(small, large))
+        self.assertEqual(sample_count(large), MAX_SAMPLE_POINTS)
+
+    def test_poles_and_branch_cuts_are_skipped(self):
+        points = [{x: 0}, {x: -1.0}, {x: 0.5}]
+        # 1/x has a pole at 0 and sqrt(x) is not real at -1, only the last
+        # point can be used
+        res = CompiledExpression(sqrt(x) / x)
+        same = CompiledExpression(1 / sqrt(x))
+        different = CompiledExpression(2 / sqrt(x))
+        self.assertFalse(numerically_different(res, same, points))
+        self.assertTrue(numerically_different(res, different, points))
+        self.assertFalse(
+            numerically_different(res, different, points, required=0)
+        )
+        # For complex points values need not be real
+        points = [{x: -1 + 0j}]
+        self.assertTrue(numerically_different(res, different, points))
+
+    def test_independent_values_reject_more(self):
+        # With the same value for all symbols these could not be rejected
+        points = sample_points([x, y], n=4)
+        for res, ans in [(x - y, Integer(0)), (x / y, Integer(1))]:
+            with self.subTest(res=res, ans=ans):
+                self.assertTrue(
+                    numerically_different(
+                        CompiledExpression(res),
+                        CompiledExpression(ans),
+                        points,
+                    )
+                )
+
+    def test_evaluate(self):
+        expr = CompiledExpression(x**2 + y)
+        self.assertEqual(expr.symbols, (x, y))
+        self.assertEqual(expr.evaluate({x: 2, y: 1}), 5)
+
+    def test_evaluate_complex_value_falls_back_to_mpmath(self):
+        expr = CompiledExpression(sqrt(x - 1))
+        self.assertAlmostEqual(expr.evaluate({x: 0.0}), 1j)
+
+    def test_evaluate_singularity(self):
+        expr = CompiledExpression(1 / x)
+        self.assertIsNone(expr.evaluate({x: 0}))
+        self.assertEqual(expr.evaluate({x: 0.5}), 2)
+
+    def test_evaluate_large_expression_with_cse(self):
+        expr = sum(exp(k * x) * log(k + x) for k in range(1, 20))
+        compiled = CompiledExpression(expr)
+        self.assertTrue(compiled.cse)
+        self.assertAlmostEqual(
+            compiled.evaluate({x: 0.5}).real,
+            float(expr.subs(x, 0.5)),
+            places=6,
+        )
+
+    def test_numerically_different(self):
+        points = sample_points([x, y])
+        same = CompiledExpression((x + y) ** 2)
+        expanded = CompiledExpression(x**2 + 2 * x * y + y**2)
+        different = CompiledExpression(x**2 + y**2)
+        self.assertFalse(numerically_different(same, expanded, points))
+        self.assertTrue(numerically_different(same, different, points))
+
+    def test_residuals(self):
+        points = [{x: 1.0}, {x: 2.0}, {x: 1e-12}, {x: 0.0}]
+        lhs = CompiledExpression(1 + x)
+        rhs = CompiledExpression(1 / x)
+        values = residuals(lhs, rhs, points)
+        self.assertEqual(values[0], 1)
+        self.assertAlmostEqual(values[1], 2.5)
+        # Residuals dominated by rounding errors and points where a side
+        # cannot be evaluated are skipped
+        values = residuals(lhs, CompiledExpression(1 + x / 2), points)
+        self.assertIsNone(values[2])
+        self.assertIsNone(values[3])
+        self.assertIsNone(residuals(lhs, rhs, points)[3])
+
+    def test_ratio_not_constant(self):
+        self.assertFalse(ratio_not_constant([2, None, 4], [1, 1, 2]))
+        self.assertTrue(ratio_not_constant([2, 3, 4], [1, 1, 2]))
+        self.assertFalse(ratio_not_constant([2, 3], [1, None]))
+
+
+if __name__ == "__main__":
+    unittest.main()
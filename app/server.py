@@ -0,0 +1,211 @@
+"""
+Local evaluation server for on-premises deployments and load tests.
+
+Accepts the same JSON commands as the deployed function over HTTP, on a TCP
+port or a Unix socket, and dispatches them to a WorkerPool of pre-warmed
+worker processes:
+
+    POST /  with header `command: eval` or `command: preview`
+    POST /eval or POST /preview
+    GET /health
+
+The request body is the JSON body of the command, i.e. the response,
+answer (only for eval) and params. Successful requests return
+{"command": ..., "result": ...} and failed requests return
+{"command": ..., "error": {"message": ...}}.
+
+    python server.py --port 8080 --workers 4 --timeout 30 --max-requests 500
+    python server.py --unix-socket /tmp/evaluation.sock
+
+The server shuts down gracefully on SIGINT or SIGTERM: requests that are
+being handled are finished before the workers are stopped.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from .worker_pool import (
+        WorkerError,
+        WorkerPool,
+        WorkerTimeout,
+        validate_request,
+    )
+except ImportError:
+    from worker_pool import (
+        WorkerError,
+        WorkerPool,
+        WorkerTimeout,
+        validate_request,
+    )
+
+# Largest accepted request body in bytes
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles HTTP requests, the WorkerPool is taken from the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # Clients connected to a Unix socket have no address
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _reply(self, status, content):
+        data = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, command, message):
+        self._reply(
+            status, {"command": command, "error": {"message": message}}
+        )
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._reply(200, {"status": "ok", **self.server.pool.stats()})
+        else:
+            self._error(404, None, f"Unknown path: {self.path}")
+
+    def do_POST(self):
+        command = self.path.strip("/") or self.headers.get("command", "eval")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            self.close_connection = True
+            self._error(400, command, "Invalid Content-Length header.")
+            return
+        if length > MAX_BODY_SIZE:
+            self.close_connection = True
+            self._error(413, command, "The request body is too large.")
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            validate_request(command, body)
+        except ValueError as e:
+            self._error(400, command, str(e))
+            return
+        timeout = self.server.timeout_for(self.headers.get("timeout", None))
+        try:
+            result = self.server.pool.run(command, body, timeout)
+        except WorkerTimeout as e:
+            self._error(504, command, str(e))
+        except WorkerError as e:
+            self._error(500, command, str(e))
+        else:
+            self._reply(200, {"command": command, "result": result})
+
+
+class _ServerMixin:
+    daemon_threads = False
+    block_on_close = True
+    quiet = False
+    pool = None
+
+    def timeout_for(self, requested):
+        """
+        Returns the timeout for a request, requests may ask for a shorter
+        timeout than the default timeout of the pool with a timeout header.
+        """
+        try:
+            requested = float(requested)
+        except (TypeError, ValueError):
+            return self.pool.timeout
+        if self.pool.timeout is None:
+            return requested
+        return min(requested, self.pool.timeout)
+
+
+class EvaluationServer(_ServerMixin, ThreadingHTTPServer):
+    """
+    Threaded HTTP server on a TCP port.
+    """
+
+
+class UnixEvaluationServer(
+    _ServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    """
+    Threaded HTTP server on a Unix socket.
+    """
+
+
+def create_server(pool, host="127.0.0.1", port=8080, unix_socket=None):
+    """
+    Input:
+        pool        : WorkerPool that handles the requests
+        host, port  : address to listen on
+        unix_socket : path of a Unix socket to listen on instead of a
+                      TCP port
+    Output:
+        Server, requests are handled once serve_forever is called
+    """
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixEvaluationServer(unix_socket, RequestHandler)
+    else:
+        server = EvaluationServer((host, port), RequestHandler)
+    server.pool = pool
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="seconds per request"
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=None,
+        help="requests after which a worker is replaced",
+    )
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    pool = WorkerPool(args.workers, args.timeout, args.max_requests)
+    server = create_server(pool, args.host, args.port, args.unix_socket)
+    server.quiet = args.quiet
+
+    def shutdown(signum, frame):
+        # shutdown blocks until serve_forever returns, so it cannot be
+        # called from the thread that runs serve_forever
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        pool.close()
+        if args.unix_socket is not None and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+try:
+    from . import worker_pool
+    from .server import create_server
+    from .worker_pool import WorkerPool
+    from .worker_pool_tests import (
+        process_running,
+        spawning_evaluation_function,
+        wait_for_pid,
+    )
+except ImportError:
+    import worker_pool
+    from server import create_server
+    from worker_pool import WorkerPool
+    from worker_pool_tests import (
+        process_running,
+        spawning_evaluation_function,
+        wait_for_pid,
+    )
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.unix_socket = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_socket)
+
+
+class TestServer(unittest.TestCase):
+    """
+    TestCase Class used to test the local evaluation server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = WorkerPool(size=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def start_server(self, pool=None, **kwargs):
+        server = create_server(pool or self.pool, **kwargs)
+        server.quiet = True
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        self.addCleanup(stop)
+        return server
+
+    def request(self, connection, method, path, body=None, headers={}):
+        if body is not None:
+            body = json.dumps(body)
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_commands(self):
+        server = self.start_server(port=0)
+        connection = http.client.HTTPConnection(*server.server_address)
+        self.addCleanup(connection.close)
+        body = {"response": "x+1", "answer": "1+x", "params": {}}
+        status, content = self.request(connection, "POST", "/eval", body)
+        self.assertEqual(status, 200)
+        self.assertEqual(content["command"], "eval")
+        self.assertTrue(content["result"]["is_correct"])
+
+        body = {"response": "x+1", "params": {"is_latex": False}}
+        headers = {"command": "preview"}
+        status, content = self.request(connection, "POST", "/", body, headers)
+        self.assertEqual(status, 200)
+        self.assertEqual(content["result"]["preview"]["sympy"], "x + 1")
+
+        status, content = self.request(connection, "GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(content["workers"], 2)
+
+    def test_invalid_requests(self):
+        server = self.start_server(port=0)
+        connection = http.client.HTTPConnection(*server.server_address)
+        self.addCleanup(connection.close)
+        status, content = self.request(
+            connection, "POST", "/eval", {"response": "x"}
+        )
+        self.assertEqual(status, 400)
+        self.assertIn("answer", content["error"]["message"])
+        status, content = self.request(
+            connection, "POST", "/grade", {"response": "x"}
+        )
+        self.assertEqual(status, 400)
+        connection.putrequest("POST", "/eval")
+        connection.putheader("Content-Length", "ten")
+        connection.endheaders()
+        response = connection.getresponse()
+        self.assertEqual(response.status, 400)
+        self.assertIn(
+            "Content-Length", json.loads(response.read())["error"]["message"]
+        )
+
+    def test_unix_socket(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "evaluation.sock")
+        self.start_server(unix_socket=path)
+        connection = UnixHTTPConnection(path)
+        self.addCleanup(connection.close)
+        body = {"response": "x", "answer": "y"}
+        status, content = self.request(connection, "POST", "/eval", body)
+        self.assertEqual(status, 200)
+        self.assertFalse(content["result"]["is_correct"])
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(),
+        "workers only use the patched function if they are forked",
+    )
+    def test_timeout_stops_child_processes(self):
+        # Replacement workers are forked later, so the patch must stay
+        patcher = mock.patch.object(
+            worker_pool, "evaluation_function", spawning_evaluation_function
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        pool = WorkerPool(size=1)
+        self.addCleanup(pool.close)
+        server = self.start_server(pool=pool, port=0)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "pid")
+        connection = http.client.HTTPConnection(*server.server_address)
+        self.addCleanup(connection.close)
+        body = {"response": path, "answer": "x"}
+        # The replacement worker is forked while the client socket is open
+        # in this process, so the server has to close the connection
+        headers = {"Connection": "close", "timeout": "2"}
+        status, content = self.request(
+            connection, "POST", "/eval", body, headers
+        )
+        self.assertEqual(status, 504)
+        pid = wait_for_pid(path)
+        deadline = time.monotonic() + 5
+        while process_running(pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(process_running(pid))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,244 @@
+"""
+Wall-clock time budgets for expensive (SymPy) computations.
+
+Computations that run under a budget are executed in a supervised child
+process that is terminated when the budget runs out, this is the only
+reliable way to stop SymPy functions like simplify that do not check for
+interruptions themselves. Starting the child process costs more than cheap
+computations take, those are run in the calling process with
+TimeBudget.run_inline instead and the budget is only checked before and
+after them.
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import time
+
+try:
+    from .timings import NO_TIMINGS
+except ImportError:
+    from timings import NO_TIMINGS
+
+
+class TimeBudgetExceeded(Exception):
+    """
+    Raised when a stage does not finish within the time budget.
+
+    Attributes
+    ----------
+    stage : string
+        Name of the stage that was running when the budget ran out
+    """
+
+    def __init__(self, stage):
+        super().__init__(f"Time budget exceeded during stage `{stage}`.")
+        self.stage = stage
+
+
+def _multiprocessing_context():
+    # Forking avoids importing SymPy again in the child process and does
+    # not require the computation or its arguments to be picklable.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _run_in_child(connection, function, args):
+    try:
+        result = ("result", function(*args))
+    except Exception as e:
+        result = ("error", e)
+    try:
+        connection.send(result)
+    except Exception as e:
+        # The result or exception could not be pickled
+        connection.send(("error", RuntimeError(repr(e))))
+    finally:
+        connection.close()
+
+
+def run_supervised(function, args, timeout, stage):
+    """
+    Input:
+        function : function to run
+        args     : tuple of arguments for function
+        timeout  : time in seconds after which the computation is stopped
+        stage    : name of the computation, used when reporting a timeout
+    Output:
+        function(*args), computed in a child process
+    Remark:
+        Raises TimeBudgetExceeded if the computation did not finish in time,
+        exceptions raised by function are re-raised in the calling process.
+    """
+    context = _multiprocessing_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_run_in_child, args=(sender, function, args), daemon=True
+    )
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise TimeBudgetExceeded(stage)
+        try:
+            kind, value = receiver.recv()
+        except EOFError:
+            raise RuntimeError(
+                f"Stage `{stage}` stopped without returning a result."
+            )
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    if kind == "error":
+        raise value
+    return value
+
+
+def race_supervised(tasks, timeout, stage):
+    """
+    Input:
+        tasks   : list of pairs (function, args)
+        timeout : time in seconds after which the computations are
+                  stopped, or None for no limit
+        stage   : name of the computations, used when reporting a timeout
+    Output:
+        Generator of triples (index, kind, value) in the order the tasks
+        finish, index is the position of the task in tasks, kind is
+        "result" or "error" and value is the result or the exception.
+    Remark:
+        All tasks are started at once, each in its own child process.
+        Processes that are still running are terminated when the
+        generator is closed, e.g. when the caller has found a result it
+        can use, or when it raises TimeBudgetExceeded because the timeout
+        ran out before all tasks finished.
+    """
+    context = _multiprocessing_context()
+    processes = []
+    pending = {}
+    for index, (function, args) in enumerate(tasks):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_run_in_child, args=(sender, function, args), daemon=True
+        )
+        process.start()
+        sender.close()
+        processes.append(process)
+        pending[receiver] = index
+    receivers = list(pending.keys())
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while len(pending) > 0:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0, deadline - time.monotonic())
+            ready = multiprocessing.connection.wait(
+                list(pending.keys()), remaining
+            )
+            if len(ready) == 0:
+                raise TimeBudgetExceeded(stage)
+            for receiver in sorted(ready, key=pending.get):
+                index = pending.pop(receiver)
+                try:
+                    kind, value = receiver.recv()
+                except EOFError:
+                    kind, value = "error", RuntimeError(
+                        f"Stage `{stage}` stopped without returning a result."
+                    )
+                yield index, kind, value
+    finally:
+        for receiver in receivers:
+            receiver.close()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+
+class TimeBudget:
+    """
+    Time budget for one evaluation, the budget starts when it is created.
+
+    Parameters
+    ----------
+    time_budget_ms : number or None
+        Budget in milliseconds, if None there is no time limit and stages
+        are run directly in the calling process.
+    timings : Timings or None
+        Timings of the evaluation the budget is used for, stages that
+        receive the budget record their durations and counters here.
+    """
+
+    def __init__(self, time_budget_ms=None, timings=None):
+        self.time_budget_ms = time_budget_ms
+        self.timings = NO_TIMINGS if timings is None else timings
+        if time_budget_ms is None:
+            self.deadline = None
+        else:
+            self.deadline = time.monotonic() + float(time_budget_ms) / 1000
+
+    def remaining(self):
+        """
+        Returns the remaining time in seconds or None if there is no limit.
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def run(self, stage, function, *args):
+        """
+        Input:
+            stage    : name of the stage, used when reporting a timeout
+            function : function to run
+            args     : arguments for function
+        Output:
+            function(*args)
+        Remark:
+            Raises TimeBudgetExceeded if the budget runs out before
+            the stage is finished.
+        """
+        if self.deadline is None:
+            return function(*args)
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise TimeBudgetExceeded(stage)
+        return run_supervised(function, args, remaining, stage)
+
+    def run_inline(self, stage, function, *args):
+        """
+        Input:
+            stage    : name of the stage, used when reporting a timeout
+            function : function to run
+            args     : arguments for function
+        Output:
+            function(*args), computed in the calling process
+        Remark:
+            Raises TimeBudgetExceeded if the budget has run out before or
+            while the computation ran, the computation itself is not
+            stopped when the budget runs out. Only used for computations
+            that are known to be cheap, see run.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise TimeBudgetExceeded(stage)
+        result = function(*args)
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise TimeBudgetExceeded(stage)
+        return result
+
+    def race(self, stage, tasks):
+        """
+        Input:
+            stage : name of the computations, used when reporting a timeout
+            tasks : list of pairs (function, args)
+        Output:
+            Generator of the results of the tasks run in parallel, see
+            race_supervised. The tasks are stopped when the budget runs
+            out, even if there is no time limit they run in child processes.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise TimeBudgetExceeded(stage)
+        return race_supervised(tasks, remaining, stage)
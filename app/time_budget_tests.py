@@ -0,0 +1,112 @@
+import time
+import unittest
+
+from contextlib import closing
+
+try:
+    from .time_budget import (
+        TimeBudget,
+        TimeBudgetExceeded,
+        race_supervised,
+        run_supervised,
+    )
+except ImportError:
+    from time_budget import (
+        TimeBudget,
+        TimeBudgetExceeded,
+        race_supervised,
+        run_supervised,
+    )
+
+
+def _slow_square(x):
+    time.sleep(5)
+    return x**2
+
+
+def _fail(message):
+    raise ValueError(message)
+
+
+def _delayed(value, delay):
+    time.sleep(delay)
+    return value
+
+
+class TestTimeBudget(unittest.TestCase):
+    """
+    TestCase Class used to test that time budgets are enforced.
+    """
+
+    def test_run_supervised_returns_result(self):
+        self.assertEqual(run_supervised(pow, (3, 2), 5, "pow"), 9)
+
+    def test_run_supervised_reraises_exceptions(self):
+        with self.assertRaises(ValueError) as cm:
+            run_supervised(_fail, ("message",), 5, "fail")
+        self.assertEqual(str(cm.exception), "message")
+
+    def test_run_supervised_stops_computation(self):
+        start = time.monotonic()
+        with self.assertRaises(TimeBudgetExceeded) as cm:
+            run_supervised(_slow_square, (3,), 0.2, "square")
+        self.assertEqual(cm.exception.stage, "square")
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_race_yields_results_in_order_of_completion(self):
+        tasks = [(_delayed, (1, 0.5)), (_fail, ("message",)), (pow, (3, 2))]
+        outcomes = list(race_supervised(tasks, 5, "race"))
+        self.assertEqual([index for index, _, _ in outcomes][-1], 0)
+        results = {index: (kind, value) for index, kind, value in outcomes}
+        self.assertEqual(results[0], ("result", 1))
+        self.assertEqual(results[1][0], "error")
+        self.assertIsInstance(results[1][1], ValueError)
+        self.assertEqual(results[2], ("result", 9))
+
+    def test_race_stops_remaining_tasks(self):
+        start = time.monotonic()
+        tasks = [(_slow_square, (3,)), (pow, (3, 2))]
+        with closing(race_supervised(tasks, 10, "race")) as outcomes:
+            self.assertEqual(next(outcomes), (1, "result", 9))
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_race_stops_when_budget_runs_out(self):
+        start = time.monotonic()
+        budget = TimeBudget(200)
+        with self.assertRaises(TimeBudgetExceeded) as cm:
+            list(budget.race("race", [(_slow_square, (3,))]))
+        self.assertEqual(cm.exception.stage, "race")
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_unlimited_budget_runs_directly(self):
+        budget = TimeBudget()
+        self.assertIsNone(budget.remaining())
+        self.assertEqual(budget.run("pow", pow, 3, 2), 9)
+
+    def test_exhausted_budget(self):
+        budget = TimeBudget(0)
+        with self.assertRaises(TimeBudgetExceeded) as cm:
+            budget.run("pow", pow, 3, 2)
+        self.assertEqual(cm.exception.stage, "pow")
+
+    def test_run_inline(self):
+        calls = []
+        budget = TimeBudget(10000)
+        budget.run_inline("append", calls.append, 1)
+        # The function ran in this process
+        self.assertEqual(calls, [1])
+        budget = TimeBudget(0)
+        with self.assertRaises(TimeBudgetExceeded) as cm:
+            budget.run_inline("append", calls.append, 2)
+        self.assertEqual(cm.exception.stage, "append")
+        self.assertEqual(calls, [1])
+        # A computation that overruns the budget is reported as the stage
+        # that ran out of time
+        budget = TimeBudget(100)
+        with self.assertRaises(TimeBudgetExceeded) as cm:
+            budget.run_inline("sleep", time.sleep, 0.2)
+        self.assertEqual(cm.exception.stage, "sleep")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Opt-in timing of the stages of an evaluation or a preview.
+
+Timings collects the duration of named stages and counters (e.g. the number
+of sample points evaluated). If timings are not requested NO_TIMINGS is used
+instead, it has the same methods but does not record anything so that the
+instrumentation costs (almost) nothing.
+"""
+
+import time
+
+
+class _StageTimer:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class Timings:
+    """
+    Durations of named stages and counters for one evaluation or preview.
+
+    Stages can be timed more than once (e.g. when several responses are
+    compared to several answers), the durations are then added.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def stage(self, name):
+        """
+        Returns a context manager that times the stage with the given name.
+        """
+        return _StageTimer(self, name)
+
+    def add(self, name, duration):
+        """
+        Adds duration (in seconds) to the stage with the given name.
+        """
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def count(self, name, n=1):
+        """
+        Adds n to the counter with the given name.
+        """
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def as_dict(self):
+        """
+        Returns a JSON serialisable dictionary with the duration of each
+        stage in milliseconds and the counters.
+        """
+        return {
+            "stages": {
+                name: round(duration * 1000, 6)
+                for (name, duration) in self.durations.items()
+            },
+            "counts": dict(self.counts),
+        }
+
+
+class _DisabledTimings:
+    """
+    Replacement for Timings that does not record anything.
+    """
+
+    enabled = False
+    _timer = _NoTimer()
+
+    def stage(self, name):
+        return self._timer
+
+    def add(self, name, duration):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def as_dict(self):
+        return {"stages": {}, "counts": {}}
+
+
+NO_TIMINGS = _DisabledTimings()
+
+
+def create_timings(params):
+    """
+    Returns a new Timings if params["return_timings"] is true,
+    otherwise NO_TIMINGS.
+    """
+    if params.get("return_timings", False):
+        return Timings()
+    return NO_TIMINGS
@@ -0,0 +1,44 @@
+import unittest
+
+try:
+    from .timings import NO_TIMINGS, Timings, create_timings
+except ImportError:
+    from timings import NO_TIMINGS, Timings, create_timings
+
+
+class TestTimings(unittest.TestCase):
+    """
+    TestCase Class used to test the timing of evaluation stages.
+    """
+
+    def test_stages_and_counts(self):
+        timings = Timings()
+        for _ in range(2):
+            with timings.stage("parse"):
+                pass
+        timings.count("sample_points", 10)
+        timings.count("sample_points", 5)
+        result = timings.as_dict()
+        self.assertEqual(list(result["stages"].keys()), ["parse"])
+        self.assertGreaterEqual(result["stages"]["parse"], 0)
+        self.assertEqual(result["counts"], {"sample_points": 15})
+
+    def test_stage_is_recorded_when_an_exception_is_raised(self):
+        timings = Timings()
+        with self.assertRaises(ValueError):
+            with timings.stage("parse"):
+                raise ValueError()
+        self.assertIn("parse", timings.as_dict()["stages"])
+
+    def test_disabled_timings(self):
+        self.assertIs(create_timings({}), NO_TIMINGS)
+        self.assertIsInstance(
+            create_timings({"return_timings": True}), Timings
+        )
+        with NO_TIMINGS.stage("parse"):
+            NO_TIMINGS.count("sample_points")
+        self.assertEqual(NO_TIMINGS.as_dict(), {"stages": {}, "counts": {}})
+
+
+if __name__ == "__main__":
+    unittest.main()
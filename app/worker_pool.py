@@ -0,0 +1,302 @@
+"""
+Pool of pre-warmed worker processes that run evaluation and preview
+commands.
+
+Each worker is a child process that has already imported SymPy and the
+evaluation and preview functions, so requests do not pay the import cost.
+A request is sent to an idle worker over a pipe; if it does not finish
+within its timeout the worker is terminated, together with the processes it
+started for time budgets, and replaced. Workers are also
+replaced after a configurable number of requests, which bounds the memory
+used by SymPy caches in long running workers.
+"""
+
+import atexit
+import os
+import queue
+import signal
+import threading
+import time
+
+try:
+    from .evaluation import evaluation_function
+    from .preview import preview_function
+    from .time_budget import _multiprocessing_context
+except ImportError:
+    from evaluation import evaluation_function
+    from preview import preview_function
+    from time_budget import _multiprocessing_context
+
+
+class WorkerTimeout(Exception):
+    """
+    Raised when a request does not finish within its timeout.
+    """
+
+
+class WorkerError(Exception):
+    """
+    Raised when a command raises an exception or a worker stops
+    unexpectedly, the message describes the original error.
+    """
+
+
+class WorkerCancelled(Exception):
+    """
+    Raised when a request is cancelled before it finished.
+    """
+
+
+class PoolClosed(Exception):
+    """
+    Raised when a request is made to a pool that has been closed.
+    """
+
+
+def validate_request(command, body):
+    """
+    Input:
+        command : "eval" or "preview"
+        body    : dictionary with the response, answer (only for "eval")
+                  and params of the request
+    Remark:
+        Raises ValueError if the command is unknown or the body does not
+        contain the fields required by the command.
+    """
+    if command not in ("eval", "preview"):
+        raise ValueError(f"Unknown command: {command}")
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object.")
+    if "response" not in body:
+        raise ValueError("The request body must contain a response.")
+    if command == "eval" and "answer" not in body:
+        raise ValueError("The request body must contain an answer.")
+    if not isinstance(body.get("params", {}), dict):
+        raise ValueError("The params of the request must be a JSON object.")
+
+
+def run_command(command, body):
+    """
+    Input:
+        command : "eval" or "preview"
+        body    : dictionary with the response, answer (only for "eval")
+                  and params of the request
+    Output:
+        Result of evaluation_function or preview_function
+    """
+    validate_request(command, body)
+    params = body.get("params", {})
+    if command == "eval":
+        return evaluation_function(body["response"], body["answer"], params)
+    return preview_function(body["response"], params)
+
+
+def _worker_main(connection):
+    if hasattr(os, "setsid"):
+        # The worker and the processes it starts for time budgets form a
+        # process group, so that they can be stopped together, see
+        # _Worker.kill
+        os.setsid()
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        try:
+            reply = ("result", run_command(*request))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        try:
+            connection.send(reply)
+        except Exception as e:
+            # The result could not be pickled
+            connection.send(("error", repr(e)))
+    connection.close()
+
+
+# Time in seconds between checks for cancellation of a running request
+CANCEL_POLL_INTERVAL = 0.05
+
+# Placeholder for a worker that was terminated after the pool was closed
+_STOPPED = object()
+
+
+class _Worker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        # Workers are not daemonic since time budgets run computations in
+        # child processes of the worker, which daemonic processes cannot
+        # have. Workers are stopped when the pool is closed instead.
+        self.process = context.Process(
+            target=_worker_main, args=(child_connection,), daemon=False
+        )
+        self.process.start()
+        child_connection.close()
+        self.requests = 0
+
+    def stop(self, timeout=5):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        # The worker is only killed while it has not been waited for, until
+        # then its process (group) id cannot be reused by other processes
+        if self.process.exitcode is None:
+            if hasattr(os, "killpg"):
+                try:
+                    # Also stops the computations the worker started in
+                    # child processes, which would otherwise keep running
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    self.process.terminate()
+            else:
+                self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+class WorkerPool:
+    """
+    Pool of worker processes.
+
+    Parameters
+    ----------
+    size : int
+        Number of worker processes, i.e. the number of requests that are
+        handled concurrently. Further requests wait for an idle worker.
+    timeout : number or None
+        Default timeout of a request in seconds, None for no timeout
+    max_requests : int or None
+        Number of requests after which a worker is replaced by a new one,
+        None to never replace workers that work as expected
+    """
+
+    def __init__(self, size=2, timeout=None, max_requests=None):
+        self.size = size
+        self.timeout = timeout
+        self.max_requests = max_requests
+        self._context = _multiprocessing_context()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._busy = 0
+        self._stats = {"requests": 0, "timeouts": 0, "recycled": 0}
+        for _ in range(size):
+            self._idle.put(_Worker(self._context))
+        # Non-daemonic workers would otherwise keep the interpreter from
+        # exiting if the pool is not closed
+        atexit.register(self.close)
+
+    def _acquire(self):
+        with self._lock:
+            if self._closed:
+                raise PoolClosed("The worker pool is closed.")
+        worker = self._idle.get()
+        if worker is None:
+            # Wakes up the other requests waiting for a worker
+            self._idle.put(None)
+            raise PoolClosed("The worker pool is closed.")
+        with self._lock:
+            self._busy += 1
+        return worker
+
+    def _release(self, worker, replace):
+        with self._lock:
+            self._busy -= 1
+            closed = self._closed
+        if replace:
+            worker.kill()
+            worker = _STOPPED if closed else _Worker(self._context)
+        self._idle.put(worker)
+
+    def _wait(self, worker, timeout, cancel):
+        if cancel is None:
+            return worker.connection.poll(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not cancel.is_set():
+            wait = CANCEL_POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            if worker.connection.poll(max(wait, 0)):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        raise WorkerCancelled("The request was cancelled.")
+
+    def run(self, command, body, timeout=None, cancel=None):
+        """
+        Input:
+            command : "eval" or "preview"
+            body    : dictionary with the response, answer and params
+            timeout : timeout in seconds, if None the default timeout
+                      of the pool is used
+            cancel  : threading.Event or None, if the event is set while
+                      the request is running the worker is terminated
+        Output:
+            Result of the command
+        Remark:
+            Raises WorkerTimeout if the request did not finish in time,
+            WorkerCancelled if it was cancelled and WorkerError if the
+            command raised an exception.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        worker = self._acquire()
+        replace = True
+        try:
+            worker.connection.send((command, body))
+            if not self._wait(worker, timeout, cancel):
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise WorkerTimeout(
+                    f"The request did not finish within {timeout} s."
+                )
+            try:
+                kind, value = worker.connection.recv()
+            except EOFError:
+                raise WorkerError("The worker stopped unexpectedly.")
+            worker.requests += 1
+            with self._lock:
+                self._stats["requests"] += 1
+                if (
+                    self.max_requests is not None
+                    and worker.requests >= self.max_requests
+                ):
+                    self._stats["recycled"] += 1
+                else:
+                    replace = False
+        finally:
+            self._release(worker, replace)
+        if kind == "error":
+            raise WorkerError(value)
+        return value
+
+    def stats(self):
+        """
+        Returns a dictionary with the number of workers, busy workers,
+        handled requests, timeouts and recycled workers.
+        """
+        with self._lock:
+            return {"workers": self.size, "busy": self._busy, **self._stats}
+
+    def close(self):
+        """
+        Stops the workers. Requests that are being handled are finished
+        first, requests that are waiting for a worker raise PoolClosed.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        for _ in range(self.size):
+            worker = self._idle.get()
+            if worker is not _STOPPED:
+                worker.stop()
+        self._idle.put(None)
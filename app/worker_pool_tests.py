@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import time
+import unittest
+from unittest import mock
+
+try:
+    from . import equivalence, worker_pool
+    from .evaluation import evaluation_function
+    from .time_budget import run_supervised
+    from .worker_pool import (
+        PoolClosed,
+        WorkerError,
+        WorkerPool,
+        WorkerTimeout,
+    )
+except ImportError:
+    import equivalence
+    import worker_pool
+    from evaluation import evaluation_function
+    from time_budget import run_supervised
+    from worker_pool import PoolClosed, WorkerError, WorkerPool, WorkerTimeout
+
+
+def slow_evaluation_function(response, answer, params):
+    time.sleep(float(response))
+    return {"is_correct": True}
+
+
+def _record_pid_and_sleep(path):
+    with open(path, "w") as file:
+        file.write(str(os.getpid()))
+    time.sleep(60)
+
+
+def spawning_evaluation_function(response, answer, params):
+    # Runs a slow computation in a child process like a time budget does,
+    # the child writes its process id to the file named by response
+    run_supervised(_record_pid_and_sleep, (response,), 120, "sleep")
+    return {"is_correct": True}
+
+
+def process_running(pid):
+    """
+    Returns True if the process with the given id is running, i.e. exists
+    and is not a zombie that has not been waited for.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            return file.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def wait_for_pid(path, timeout=10):
+    """
+    Returns the process id written to path by _record_pid_and_sleep.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(path):
+            with open(path) as file:
+                content = file.read()
+            if len(content) > 0:
+                return int(content)
+        time.sleep(0.05)
+    raise TimeoutError(path)
+
+
+class TestWorkerPool(unittest.TestCase):
+    """
+    TestCase Class used to test the pool of worker processes.
+    """
+
+    def test_eval_and_preview(self):
+        pool = WorkerPool(size=1)
+        self.addCleanup(pool.close)
+        body = {"response": "x+1", "answer": "1+x", "params": {}}
+        self.assertEqual(
+            pool.run("eval", body), evaluation_function("x+1", "1+x", {})
+        )
+        body = {"response": "x+1", "params": {"is_latex": False}}
+        result = pool.run("preview", body)
+        self.assertEqual(result["preview"]["sympy"], "x + 1")
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(),
+        "workers only use the patched setting if they are forked",
+    )
+    def test_time_budget(self):
+        # Time budgets run stages in child processes of the worker
+        patcher = mock.patch.object(equivalence, "RACING_MIN_CPUS", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        pool = WorkerPool(size=1)
+        self.addCleanup(pool.close)
+        params = {
+            "time_budget_ms": 10000,
+            "prescreen": False,
+            "result_cache": False,
+        }
+        body = {"response": "(x+1)**2", "answer": "x**2+2x+1"}
+        body["params"] = {**params, "strict_syntax": False}
+        self.assertEqual(pool.run("eval", body)["level"], "expand")
+        body = {"response": "sin(x)", "answer": "cos(x)"}
+        body["params"] = {**params, "race_stages": ["sampling", "simplify"]}
+        self.assertEqual(pool.run("eval", body)["level"], "sampling")
+        params = {"time_budget_ms": 10000, "simplify": True}
+        body = {"response": "x+x", "params": params}
+        result = pool.run("preview", body)
+        self.assertEqual(result["preview"]["sympy"], "2*x")
+
+    def test_invalid_request(self):
+        pool = WorkerPool(size=1)
+        self.addCleanup(pool.close)
+        with self.assertRaises(WorkerError):
+            pool.run("eval", {"response": "x"})
+        with self.assertRaises(WorkerError):
+            pool.run("grade", {"response": "x", "answer": "x"})
+        # The worker is still usable
+        self.assertTrue(pool.run("eval", {"response": "x", "answer": "x"}))
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(),
+        "workers only use the patched function if they are forked",
+    )
+    def test_timeout_replaces_worker(self):
+        # Replacement workers are forked later, so the patch must stay
+        patcher = mock.patch.object(
+            worker_pool, "evaluation_function", slow_evaluation_function
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        pool = WorkerPool(size=1, timeout=0.5)
+        self.addCleanup(pool.close)
+        with self.assertRaises(WorkerTimeout):
+            pool.run("eval", {"response": "10", "answer": "x"})
+        result = pool.run("eval", {"response": "0", "answer": "x"})
+        self.assertEqual(result, {"is_correct": True})
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_workers_are_recycled(self):
+        pool = WorkerPool(size=1, max_requests=2)
+        self.addCleanup(pool.close)
+        body = {"response": "x", "answer": "x"}
+        for _ in range(5):
+            pool.run("eval", body)
+        stats = pool.stats()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["recycled"], 2)
+
+    def test_close(self):
+        pool = WorkerPool(size=2)
+        pool.close()
+        with self.assertRaises(PoolClosed):
+            pool.run("eval", {"response": "x", "answer": "x"})
+
+
+if __name__ == "__main__":
+    unittest.main()